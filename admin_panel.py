@@ -63,8 +63,7 @@ def show():
                 
                 # Delete user
                 if st.button("🗑️ Delete User", key=f"delete_{email}"):
-                    del all_users[email]
-                    LocalStorage.save_all_users(all_users)
+                    LocalStorage.delete_user(email)
                     st.success("User deleted!")
                     st.rerun()
 
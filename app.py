@@ -82,6 +82,7 @@ st.markdown("""
 try:
     from services.email_service import AuthTokenManager, EmailService
     from services.subscription_config import SUBSCRIPTION_PLANS
+    from services.data_security import DataSecurity
 except ImportError as e:
     st.error(f"Import error: {e}")
     st.stop()
@@ -433,13 +434,18 @@ def main():
     # Render sidebar (only shown when logged in)
     auth_service.render_sidebar()
     
+    # Background saves that gave up since the last run
+    DataSecurity.show_failed_saves()
+    
     # Get current page
     current_page = st.session_state.get('current_page', 'Executive Dashboard')
     
     # Route to page
     if current_page in page_modules:
         try:
-            page_modules[current_page]()
+            # Auto-saves made while the page runs are written once, when it ends
+            with DataSecurity.deferred_saves():
+                page_modules[current_page]()
         except Exception as e:
             st.error(f"Error loading {current_page}: {str(e)}")
             
@@ -0,0 +1,38 @@
+import streamlit as st
+from services.data_security import DataSecurity
+
+def document_download_button(document_id, filename, mime_type, key, label="📥 Download", **kwargs):
+    """
+    Download button that reads the document only once the user asks for it
+
+    st.download_button takes the whole file up front and keeps it in memory
+    for the session, so a list of N documents with download buttons would
+    read N files on every rerun. Until it is clicked this shows a plain
+    button; after that the document is read and the real download button
+    takes its place.
+    """
+    ready_key = f"download_ready_{key}"
+
+    if not DataSecurity.document_exists(document_id, filename):
+        st.button(f"{label} (N/A)", disabled=True, key=f"prepare_{key}", **kwargs)
+        return
+
+    if not st.session_state.get(ready_key):
+        if st.button(label, key=f"prepare_{key}", **kwargs):
+            st.session_state[ready_key] = True
+            st.rerun()
+        return
+
+    data = DataSecurity.get_document(document_id, filename)
+    if data is None:
+        st.session_state.pop(ready_key, None)
+        return
+
+    st.download_button(
+        label=label,
+        data=data,
+        file_name=filename,
+        mime=mime_type,
+        key=key,
+        **kwargs
+    )
@@ -6,14 +6,17 @@ from datetime import datetime, timedelta
 import base64
 import io
 import uuid
+from contextlib import closing
+from services.analysis_cache import AnalysisCache
+from services.batch_analysis import BatchAnalysis
 from services.data_security import DataSecurity
+from services.document_insights import run_document_analysis
+from services.text_extraction import TextExtractor
 
 # Document processing imports
 try:
     import pytesseract
     from PIL import Image
-    import PyPDF2
-    import docx
     DOCUMENT_PROCESSING_AVAILABLE = True
 except ImportError:
     DOCUMENT_PROCESSING_AVAILABLE = False
@@ -559,7 +562,7 @@ def show_document_intelligence(subscription_manager, org_code, plan_name, has_su
         if batch_files:
             batch_analysis_type = st.selectbox(
                 "Batch Analysis Type",
-                ["Document Classification", "Contract Comparison", "Risk Scoring", "Key Terms Extraction"],
+                BatchAnalysis.ANALYSIS_TYPES,
                 key="batch_analysis"
             )
             
@@ -578,6 +581,33 @@ def show_document_intelligence(subscription_manager, org_code, plan_name, has_su
             
             if len(batch_files) > 5:
                 st.write(f"... and {len(batch_files) - 5} more files")
+    
+    # Analysis result cache
+    show_analysis_cache_stats()
+
+def show_analysis_cache_stats():
+    """Cached analysis results of the current user"""
+    try:
+        cache = DataSecurity.get_analysis_cache_stats()
+    except Exception:
+        return
+    if not cache.get('enabled'):
+        return
+    
+    with st.expander("⚡ Analysis Cache"):
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Cached Results", cache['entries'])
+        with col2:
+            st.metric("Cache Size", f"{cache['bytes'] / (1024 * 1024):.1f} / {cache['max_bytes'] / (1024 * 1024):.0f} MB")
+        with col3:
+            st.metric("Hit Rate", f"{cache['hit_rate']:.0%}", help=f"{cache['hits']} hits, {cache['misses']} misses")
+        with col4:
+            st.metric("Evicted / Invalidated", f"{cache['evictions']} / {cache['invalidations']}")
+        
+        if cache['entries'] and st.button("🗑️ Clear Analysis Cache"):
+            removed = DataSecurity.clear_analysis_cache()
+            st.success(f"Removed {removed} cached results")
 
 def extract_document_text(uploaded_file):
     """Extract text from various document formats"""
@@ -589,7 +619,7 @@ def extract_document_text(uploaded_file):
         elif file_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
             return extract_text_from_docx(uploaded_file)
         elif file_type == "text/plain":
-            return str(uploaded_file.read(), "utf-8")
+            return TextExtractor.extract(uploaded_file.getvalue(), file_type)
         elif file_type.startswith('image/'):
             return extract_text_from_image(uploaded_file)
         else:
@@ -603,19 +633,7 @@ def extract_document_text(uploaded_file):
 def extract_text_from_pdf(uploaded_file):
     """Extract text from PDF files"""
     try:
-        # Reset file pointer to beginning
-        uploaded_file.seek(0)
-        pdf_reader = PyPDF2.PdfReader(uploaded_file)
-        text = ""
-        for page in pdf_reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        
-        if not text.strip():
-            return "PDF contains no extractable text. It may be scanned or image-based."
-        
-        return text
+        return TextExtractor.from_pdf(uploaded_file.getvalue())
     except Exception as e:
         st.error(f"Error reading PDF: {str(e)}")
         return None
@@ -623,26 +641,7 @@ def extract_text_from_pdf(uploaded_file):
 def extract_text_from_docx(uploaded_file):
     """Extract text from Word documents"""
     try:
-        # Reset file pointer to beginning
-        uploaded_file.seek(0)
-        doc = docx.Document(uploaded_file)  # ✅ Fixed: Added 'Document'
-        text = ""
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text += paragraph.text + "\n"
-        
-        # Also extract text from tables if present
-        for table in doc.tables:
-            for row in table.rows:
-                for cell in row.cells:
-                    if cell.text.strip():
-                        text += cell.text + " "
-                text += "\n"
-        
-        if not text.strip():
-            return "Word document contains no text."
-        
-        return text
+        return TextExtractor.from_docx(uploaded_file.getvalue())
     except Exception as e:
         st.error(f"Error reading Word document: {str(e)}")
         st.info("Make sure python-docx is installed: pip install python-docx")
@@ -651,21 +650,7 @@ def extract_text_from_docx(uploaded_file):
 def extract_text_from_image(uploaded_file):
     """Extract text from images using OCR"""
     try:
-        # Reset file pointer to beginning
-        uploaded_file.seek(0)
-        image = Image.open(uploaded_file)
-        
-        # Convert to RGB if necessary
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-        
-        # Perform OCR
-        text = pytesseract.image_to_string(image, lang='eng')
-        
-        if not text.strip():
-            return "No text detected in image. Image may be too low quality or contain no text."
-        
-        return text
+        return TextExtractor.from_image(uploaded_file.getvalue())
     except pytesseract.TesseractNotFoundError:
         st.error("Tesseract OCR is not installed on your system")
         st.info("""
@@ -680,262 +665,12 @@ def extract_text_from_image(uploaded_file):
         return None
 
 def perform_document_analysis(text, analysis_type):
-    """Perform AI analysis on extracted text"""
-    # Mock AI analysis - replace with actual AI service calls
-    
-    analysis_results = {
-        "summary": "",
-        "key_terms": [],
-        "risk_score": 0,
-        "compliance_issues": [],
-        "recommendations": [],
-        "clauses": [],
-        "entities": [],
-        "sentiment": "neutral"
-    }
-    
-    if analysis_type == "Full  Analysis":
-        analysis_results = perform_full_analysis(text)
-    elif analysis_type == "Contract Review":
-        analysis_results = perform_contract_review(text)
-    elif analysis_type == "Key Terms Extraction":
-        analysis_results = extract_key_terms(text)
-    elif analysis_type == "Legal Risk Assessment":
-        analysis_results = assess_legal_risks(text)
-    elif analysis_type == "Document Summarization":
-        analysis_results = summarize_document(text)
-    elif analysis_type == "Clause Analysis":
-        analysis_results = analyze_clauses(text)
-    elif analysis_type == "Compliance Check":
-        analysis_results = check_compliance(text)
-    
-    return analysis_results
-
-def perform_full_analysis(text):
-    """Comprehensive document analysis using actual text"""
-    if not text or len(text.strip()) < 50:
-        return {"summary": "Document too short for analysis", "key_terms": [], "risk_score": 0}
-    
-    from collections import Counter
-    import re
-    
-    words = text.split()
-    word_count = len(words)
-    sentences = [s.strip() for s in text.split('.') if s.strip()]
-    
-    # Extract actual key terms
-    word_freq = Counter(word.lower().strip('.,!?;:()[]') for word in words if len(word) > 3)
-    key_terms = [word for word, count in word_freq.most_common(10)]
-    
-    # Extract entities
-    orgs = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\s+(?:Inc|LLC|Corp|Company|Ltd)\b', text)
-    dates = re.findall(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', text)
-    locations = [loc for loc in ['New York', 'California', 'Delaware', 'Texas'] if loc in text]
-    
-    # Calculate risk score based on actual keywords
-    risk_keywords = ['liability', 'penalty', 'breach', 'indemnify', 'terminate', 'damages']
-    risk_score = min(10, sum(2 for kw in risk_keywords if kw in text.lower()) / 2)
-    
-    # Detect document type
-    doc_type = "General Document"
-    if any(word in text.lower() for word in ['agreement', 'contract', 'parties']):
-        doc_type = "Contract"
-    elif any(word in text.lower() for word in ['complaint', 'plaintiff', 'defendant']):
-        doc_type = "Legal Pleading"
-    
-    return {
-        "summary": f"This document contains {word_count} words across {len(sentences)} sentences. Most frequent terms suggest it is a {doc_type.lower()}.",
-        "key_terms": key_terms[:10],
-        "risk_score": round(risk_score, 1),
-        "compliance_issues": ["Review required - automated compliance check not available"],
-        "recommendations": [
-            f"Document contains {len(orgs)} organization references",
-            f"Found {len(dates)} date references",
-            "Manual legal review recommended for compliance"
-        ],
-        "entities": list(set(orgs[:5] + locations)),
-        "sentiment": "neutral",
-        "document_type": doc_type,
-        "confidence": 0.75
-    }
-
-def perform_contract_review(text):
-    """Analyze contract-specific elements"""
-    return {
-        "summary": "Contract review identifies key commercial terms and potential risk areas.",
-        "clauses": [
-            {"type": "Payment Terms", "status": "Present", "risk": "Low"},
-            {"type": "Termination", "status": "Unclear", "risk": "Medium"},
-            {"type": "Intellectual Property", "status": "Missing", "risk": "High"},
-            {"type": "Liability", "status": "Present", "risk": "Low"}
-        ],
-        "key_terms": ["payment", "delivery", "warranty", "indemnification"],
-        "risk_score": 4.1,
-        "missing_clauses": ["Force Majeure", "Governing Law", "Dispute Resolution"],
-        "recommendations": [
-            "Add intellectual property protection clauses",
-            "Clarify termination procedures",
-            "Include dispute resolution mechanisms"
-        ]
-    }
-
-def extract_key_terms(text):
-    """Extract important legal terms and concepts from actual text"""
-    if not text:
-        return {"summary": "No text to analyze", "key_terms": [], "term_analysis": []}
-    
-    from collections import Counter
-    
-    # Extract all meaningful words (length > 3)
-    words = [word.lower().strip('.,!?;:()[]"\'') for word in text.split() if len(word) > 3]
-    word_freq = Counter(words)
-    
-    # Define legal keywords to prioritize
-    legal_keywords = ["shall", "agreement", "party", "parties", "obligation", "right", "liability", 
-                     "termination", "breach", "indemnify", "warranty", "payment", "fee",
-                     "contract", "clause", "provision", "covenant", "entity", "jurisdiction"]
-    
-    # Build term analysis
-    terms = []
-    for keyword in legal_keywords:
-        count = word_freq.get(keyword, 0)
-        if count > 0:
-            terms.append({
-                "term": keyword,
-                "frequency": count,
-                "importance": "high" if count > 3 else "medium"
-            })
-    
-    # Add other frequent terms not in legal keywords
-    for word, count in word_freq.most_common(15):
-        if word not in legal_keywords and count > 2:
-            terms.append({
-                "term": word,
-                "frequency": count,
-                "importance": "medium" if count > 5 else "low"
-            })
-    
-    return {
-        "summary": f"Extracted {len(terms)} key terms from the document. Most frequent: {terms[0]['term'] if terms else 'none'}",
-        "key_terms": [term["term"] for term in terms[:10]],
-        "term_analysis": sorted(terms, key=lambda x: x["frequency"], reverse=True)[:15],
-        "most_frequent": max(terms, key=lambda x: x["frequency"]) if terms else None
-    }
-
-def assess_legal_risks(text):
-    """Assess potential legal risks in the document"""
-    return {
-        "summary": "Risk assessment identifies potential legal exposures and compliance issues.",
-        "risk_score": 3.7,
-        "high_risk_areas": [
-            "Unlimited liability exposure",
-            "Vague termination clauses",
-            "Missing intellectual property protection"
-        ],
-        "medium_risk_areas": [
-            "Payment terms ambiguity",
-            "Force majeure provisions"
-        ],
-        "low_risk_areas": [
-            "Standard confidentiality clauses",
-            "Basic governing law provisions"
-        ],
-        "recommendations": [
-            "Implement liability caps",
-            "Strengthen IP protection clauses",
-            "Add comprehensive force majeure provisions"
-        ]
-    }
-
-def summarize_document(text):
-    """Generate document summary"""
-    word_count = len(text.split())
-    sentences = text.split('.')
-    
-    return {
-        "summary": f"This document is approximately {word_count} words long and contains {len(sentences)} sentences. It appears to be a legal document covering contractual obligations and terms.",
-        "key_points": [
-            "Establishes contractual relationship between parties",
-            "Defines mutual obligations and responsibilities",
-            "Includes standard legal protections",
-            "Specifies terms for agreement termination"
-        ],
-        "document_structure": {
-            "word_count": word_count,
-            "sentence_count": len(sentences),
-            "estimated_reading_time": f"{word_count // 250} minutes"
-        }
-    }
-
-def analyze_clauses(text):
-    """Analyze specific contract clauses from actual text"""
-    if not text:
-        return {"summary": "No text to analyze", "clauses": []}
-    
-    text_lower = text.lower()
-    
-    # Define clause types and their detection keywords
-    clause_checks = {
-        "Payment Terms": ["payment", "fee", "compensation", "remuneration", "pay"],
-        "Termination": ["termination", "terminate", "end this agreement", "cancel"],
-        "Force Majeure": ["force majeure", "act of god", "beyond control"],
-        "Confidentiality": ["confidential", "non-disclosure", "proprietary"],
-        "Intellectual Property": ["intellectual property", "copyright", "trademark", "ip rights"],
-        "Liability": ["liability", "liable", "indemnify", "indemnification"],
-        "Governing Law": ["governed by", "jurisdiction", "applicable law"],
-        "Dispute Resolution": ["dispute", "arbitration", "mediation", "litigation"]
-    }
-    
-    clauses = []
-    for clause_name, keywords in clause_checks.items():
-        present = any(keyword in text_lower for keyword in keywords)
-        keyword_count = sum(text_lower.count(kw) for kw in keywords)
-        
-        if present:
-            quality = "Good" if keyword_count > 2 else "Fair" if keyword_count > 0 else "Weak"
-            issues = [] if keyword_count > 2 else ["Limited detail - may need expansion"]
-            suggestions = [] if keyword_count > 2 else [f"Consider adding more detailed {clause_name.lower()} provisions"]
-        else:
-            quality = "Missing"
-            issues = [f"{clause_name} not found in document"]
-            suggestions = [f"Add {clause_name.lower()} clause for completeness"]
-        
-        clauses.append({
-            "name": clause_name,
-            "present": present,
-            "quality": quality,
-            "issues": issues,
-            "suggestions": suggestions
-        })
-    
-    present_count = sum(1 for c in clauses if c["present"])
-    
-    return {
-        "summary": f"Found {present_count} of {len(clauses)} standard clauses in the document.",
-        "clauses": clauses
-    }
-
-def check_compliance(text):
-    """Check document compliance with legal standards"""
-    return {
-        "summary": "Compliance check evaluates adherence to legal and regulatory requirements.",
-        "compliance_score": 7.2,
-        "compliant_areas": [
-            "Privacy policy requirements",
-            "Basic contract formation elements",
-            "Signature requirements"
-        ],
-        "non_compliant_areas": [
-            "Missing mandatory disclosures",
-            "Unclear dispute resolution",
-            "Incomplete governing law specification"
-        ],
-        "recommendations": [
-            "Add required regulatory disclosures",
-            "Specify complete governing law and jurisdiction",
-            "Include mandatory consumer protection clauses"
-        ]
-    }
+    """Perform AI analysis on extracted text (re-analyzing a document is a read from the user's analysis cache)"""
+    return AnalysisCache.get_or_compute(
+        DataSecurity.get_current_user_email(), 'ai_insights', text,
+        lambda: run_document_analysis(text, analysis_type),
+        options={'analysis_type': analysis_type}
+    )
 
 def display_analysis_results(results, extracted_text, filename):
     """Display comprehensive analysis results"""
@@ -1042,72 +777,35 @@ def display_analysis_results(results, extracted_text, filename):
         save_analysis_results(results, filename)
 
 def process_batch_documents(batch_files, analysis_type):
-    """Process multiple documents at once"""
-    results_data = []
-    progress_bar = st.progress(0)
+    """Process multiple documents at once, in parallel worker processes"""
+    files = [(file.name, file.type, file.getvalue()) for file in batch_files]
+    completed = {}      # file index -> table row
+    failed = 0
     
-    for i, file in enumerate(batch_files):
-        st.write(f"Processing: {file.name}")
-        
-        # Extract text
-        text = extract_document_text(file)
-        
-        if text:
-            # Perform analysis
-            if analysis_type == "Document Classification":
-                doc_type = classify_document(text)
-                results_data.append({
-                    "filename": file.name,
-                    "type": doc_type,
-                    "confidence": 0.85,
-                    "word_count": len(text.split())
-                })
-            elif analysis_type == "Risk Scoring":
-                risk_score = assess_document_risk(text)
-                results_data.append({
-                    "filename": file.name,
-                    "risk_score": risk_score,
-                    "word_count": len(text.split())
-                })
-            elif analysis_type == "Key Terms":
-                    terms_result = extract_key_terms(text)
-                    results_data.append({
-                        "Filename": file.name,
-                        "Terms Found": len(terms_result.get("key_terms", [])),
-                        "Most Frequent": terms_result.get("most_frequent", {}).get("term", "N/A") if terms_result.get("most_frequent") else "N/A",
-                        "Word Count": len(text.split()),
-                        "Status": "✓ Success"
-                })
-                
-            elif analysis_type == "Clause Analysis":
-                clause_result = analyze_clauses(text)
-                clauses = clause_result.get("clauses", [])
-                present_clauses = sum(1 for c in clauses if c.get("present"))
-                results_data.append({
-                    "Filename": file.name,
-                    "Clauses Found": present_clauses,
-                    "Total Checked": len(clauses),
-                    "Completion": f"{round(present_clauses/len(clauses)*100)}%" if clauses else "0%",
-                    "Status": "✓ Success"
-                })
+    progress_bar = st.progress(0)
+    status = st.empty()
+    table = st.empty()
+    st.caption("Press any button (or Stop) to cancel; files not yet started are skipped.")
+    
+    # Results stream back as files finish; leaving the loop (a rerun or Stop) cancels the rest
+    with closing(BatchAnalysis.run(files, analysis_type)) as results:
+        for done, result in enumerate(results, start=1):
+            if result['row'] is not None:
+                completed[result['index']] = result['row']
+                table.dataframe(pd.DataFrame([completed[i] for i in sorted(completed)]), use_container_width=True)
+            elif result['error']:
+                failed += 1
+                st.warning(f"⚠️ {result['filename']}: {result['error']}")
             
-            elif analysis_type == "Full Analysis":
-                full_result = perform_full_analysis(text)
-                results_data.append({
-                    "Filename": file.name,
-                    "Doc Type": full_result.get("document_type", "Unknown"),
-                    "Risk Score": full_result.get("risk_score", 0),
-                    "Key Terms": len(full_result.get("key_terms", [])),
-                    "Word Count": len(text.split()),
-                    "Status": "✓ Success"
-                })
-        progress_bar.progress((i + 1) / len(batch_files))
+            status.write(f"Processed: {result['filename']} ({done}/{len(files)})")
+            progress_bar.progress(done / len(files))
+    
+    results_data = [completed[i] for i in sorted(completed)]
     
     # Display batch results
     if results_data:
-        st.success(f"Processed {len(results_data)} documents successfully!")
+        st.success(f"Processed {len(results_data)} documents successfully!" + (f" {failed} failed." if failed else ""))
         df = pd.DataFrame(results_data)
-        st.dataframe(df, use_container_width=True)
         
         # Download results
         csv = df.to_csv(index=False)
@@ -1118,75 +816,6 @@ def process_batch_documents(batch_files, analysis_type):
             mime="text/csv"
         )
 
-def classify_document(text):
-    """Classify document type based on content"""
-    # Simple keyword-based classification
-    if any(word in text.lower() for word in ["agreement", "contract", "parties"]):
-        return "Contract"
-    elif any(word in text.lower() for word in ["complaint", "plaintiff", "defendant"]):
-        return "Legal Pleading"
-    elif any(word in text.lower() for word in ["memo", "memorandum", "analysis"]):
-        return "Legal Memorandum"
-    else:
-        return "General Legal Document"
-
-def assess_legal_risks(text):
-    """Assess potential legal risks based on actual document content"""
-    if not text:
-        return {"summary": "No text to analyze", "risk_score": 0}
-    
-    text_lower = text.lower()
-    
-    # Define risk indicators
-    high_risk_indicators = {
-        "unlimited liability": ["unlimited", "liability", "without limit"],
-        "unclear termination": ["may terminate" if "may terminate" in text_lower and "notice" not in text_lower else ""],
-        "missing IP protection": [] if any(term in text_lower for term in ["intellectual property", "ip rights", "copyright"]) else ["no IP protection"]
-    }
-    
-    medium_risk_indicators = {
-        "payment ambiguity": [] if "payment" in text_lower and any(t in text_lower for t in ["date", "within", "days"]) else ["payment terms unclear"],
-        "force majeure": [] if "force majeure" in text_lower else ["no force majeure clause"]
-    }
-    
-    low_risk_indicators = {
-        "confidentiality": ["confidential" in text_lower or "non-disclosure" in text_lower],
-        "governing law": ["governed by" in text_lower or "jurisdiction" in text_lower]
-    }
-    
-    # Calculate actual risks
-    high_risk_areas = []
-    for risk, indicators in high_risk_indicators.items():
-        if indicators and indicators[0]:
-            high_risk_areas.append(risk.title())
-    
-    medium_risk_areas = []
-    for risk, indicators in medium_risk_indicators.items():
-        if indicators and indicators[0]:
-            medium_risk_areas.append(risk.title())
-    
-    low_risk_areas = [area.replace("_", " ").title() for area, present in low_risk_indicators.items() if present]
-    
-    # Calculate risk score
-    risk_keywords = ['liability', 'penalty', 'breach', 'damages', 'indemnify', 'lawsuit', 'litigation']
-    risk_count = sum(3 for kw in risk_keywords if kw in text_lower)
-    protection_keywords = ['limit', 'cap', 'maximum', 'insurance', 'indemnification']
-    protection_count = sum(1 for kw in protection_keywords if kw in text_lower)
-    risk_score = max(0, min(10, risk_count - protection_count))
-    
-    return {
-        "summary": f"Risk assessment identified {len(high_risk_areas)} high-risk and {len(medium_risk_areas)} medium-risk areas.",
-        "risk_score": round(risk_score, 1),
-        "high_risk_areas": high_risk_areas if high_risk_areas else ["No critical risks detected"],
-        "medium_risk_areas": medium_risk_areas if medium_risk_areas else ["No medium risks detected"],
-        "low_risk_areas": low_risk_areas if low_risk_areas else ["Standard provisions present"],
-        "recommendations": [
-            f"Address {len(high_risk_areas)} high-priority risk areas" if high_risk_areas else "Continue monitoring for risks",
-            "Consider professional legal review for comprehensive assessment",
-            "Ensure all critical clauses are present and detailed"
-        ]
-    }
-
 def save_analysis_results(results, filename):
     """Save analysis results to session state"""
     if 'document_analyses' not in st.session_state:
@@ -7,20 +7,30 @@ import os
 
 # ADD THIS IMPORT
 from services.data_security import DataSecurity
+from services.storage_backend import StorageBackend
 
 # KEEP ONLY THIS:
 def auto_save_calendar_data():
-    """SECURE auto-save calendar data"""
-    from services.data_security import DataSecurity
-    
-    if 'events' in st.session_state:
-        DataSecurity.save_user_data('events', st.session_state.events)
-    
-    if 'tasks' in st.session_state:
-        DataSecurity.save_user_data('tasks', st.session_state.tasks)
-    
-    if 'court_deadlines' in st.session_state:
-        DataSecurity.save_user_data('court_deadlines', st.session_state.court_deadlines)
+    """SECURE auto-save calendar data (only collections that changed are written)"""
+    DataSecurity.save_session_data(['events', 'tasks', 'court_deadlines'])
+
+def get_all_events():
+    """Full events collection, loaded on first edit (the calendar view only loads the dates it shows)"""
+    if 'events' not in st.session_state:
+        st.session_state.events = DataSecurity.get_user_events()
+    return st.session_state.events
+
+def get_view_range(view_type, selected_date):
+    """(start, end) dates shown by a calendar view; end is None for the open-ended agenda"""
+    if view_type == "Month":
+        last_day = calendar.monthrange(selected_date.year, selected_date.month)[1]
+        return selected_date.replace(day=1), selected_date.replace(day=last_day)
+    if view_type == "Week":
+        start = selected_date - timedelta(days=selected_date.weekday())
+        return start, start + timedelta(days=6)
+    if view_type == "Day":
+        return selected_date, selected_date
+    return selected_date, None
 
 def edit_event_form(event):
     """Display edit form for an event"""
@@ -50,7 +60,7 @@ def edit_event_form(event):
         with col1:
             if st.form_submit_button("💾 Save Changes", type="primary", use_container_width=True):
                 # Update the event
-                for e in st.session_state.events:
+                for e in get_all_events():
                     if e.get('id') == event.get('id'):
                         e['title'] = event_title
                         e['date'] = event_date.strftime('%Y-%m-%d')
@@ -136,6 +146,7 @@ def show():
     
     # Require authentication
     DataSecurity.require_auth("Calendar & Tasks")
+    DataSecurity.flush_pending_saves()
         
     # Professional header styling
     st.markdown("""
@@ -434,10 +445,7 @@ def show():
     # Initialize real user data
     user_email = st.session_state.get('user_data', {}).get('email', 'demo@example.com')
     
-    # SECURE DATA LOADING
-    if 'events' not in st.session_state:
-        st.session_state.events = DataSecurity.get_user_events()
-    
+    # SECURE DATA LOADING (events are loaded per calendar view, see get_all_events)
     if 'tasks' not in st.session_state:
         st.session_state.tasks = DataSecurity.get_user_tasks()
     
@@ -471,7 +479,7 @@ def show_calendar_view():
     if 'editing_event_id' in st.session_state and st.session_state.editing_event_id:
         # Find the event being edited
         event_to_edit = None
-        for event in st.session_state.events:
+        for event in get_all_events():
             if event.get('id') == st.session_state.editing_event_id:
                 event_to_edit = event
                 break
@@ -492,13 +500,22 @@ def show_calendar_view():
         with col_c:
             filter_type = st.selectbox("Filter:", ["All Events", "Meetings", "Deadlines", "Court Dates"])
         
-        # Calendar display
+        # Calendar display: only the dates in view are read (or filtered from the session copy once loaded)
         st.markdown("#### Calendar Events")
         
-        if not st.session_state.events:
-            st.info("📅 No events yet. Add your first event using the form on the right.")
+        view_start, view_end = get_view_range(view_type, selected_date)
+        if 'events' in st.session_state:
+            events = StorageBackend.filter_range(st.session_state.events, 'date', view_start, view_end)
+        else:
+            events = DataSecurity.load_user_data_range('events', view_start, view_end)
+        type_filters = {"Meetings": "Meeting", "Deadlines": "Deadline", "Court Dates": "Court Date"}
+        if filter_type in type_filters:
+            events = [e for e in events if e.get('type') == type_filters[filter_type]]
+        
+        if not events:
+            st.info("📅 No events in this view. Add an event using the form on the right.")
         
-        for event in st.session_state.events:
+        for event in events:
             with st.expander(f"{event.get('time', 'N/A')} - {event.get('title', 'Untitled')}"):
                 col_x, col_y = st.columns(2)
                 with col_x:
@@ -520,7 +537,7 @@ def show_calendar_view():
                 
                 with col_action3:
                     if st.button("🗑️ Delete", key=f"delete_event_{event.get('id')}"):
-                        st.session_state.events = [e for e in st.session_state.events if e.get('id') != event.get('id')]
+                        st.session_state.events = [e for e in get_all_events() if e.get('id') != event.get('id')]
                         auto_save_calendar_data()
                         st.success(f"✓ Event '{event.get('title')}' deleted")
                         st.rerun()
@@ -540,7 +557,7 @@ def show_calendar_view():
             if st.form_submit_button("➕ Add Event"):
                 if event_title:
                     new_event = {
-                        "id": len(st.session_state.events) + 1,
+                        "id": len(get_all_events()) + 1,
                         "time": event_time.strftime("%I:%M %p"),
                         "date": event_date.strftime("%Y-%m-%d"),
                         "title": event_title,
@@ -549,18 +566,18 @@ def show_calendar_view():
                         "location": event_location,
                         "attendees": event_attendees
                     }
-                    st.session_state.events.append(new_event)
+                    get_all_events().append(new_event)
                     auto_save_calendar_data()
                     st.success(f"✓ Event '{event_title}' added successfully!")
                     st.rerun()
                 else:
                     st.error("Please enter an event title")
         
-        st.markdown("#### Today's Summary")
-        total_events = len(st.session_state.events)
-        meetings = len([e for e in st.session_state.events if e.get('type') == 'Meeting'])
-        deadlines = len([e for e in st.session_state.events if e.get('type') == 'Deadline'])
-        court_dates = len([e for e in st.session_state.events if e.get('type') == 'Court Date'])
+        st.markdown("#### In This View")
+        total_events = len(events)
+        meetings = len([e for e in events if e.get('type') == 'Meeting'])
+        deadlines = len([e for e in events if e.get('type') == 'Deadline'])
+        court_dates = len([e for e in events if e.get('type') == 'Court Date'])
         
         st.metric("Total Events", total_events)
         st.metric("Meetings", meetings)
@@ -929,4 +946,5 @@ def show_matter_schedule():
 
 # Main application entry point
 if __name__ == "__main__":
-    show()
+    with DataSecurity.deferred_saves():
+        show()
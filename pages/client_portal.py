@@ -8,11 +8,8 @@ from services.data_security import DataSecurity
 
 
 def auto_save_client_data():
-    """SECURE auto-save client portal data"""
-    from services.data_security import DataSecurity
-    
-    if 'portal_clients' in st.session_state:
-        DataSecurity.save_user_data('portal_clients', st.session_state.portal_clients)
+    """SECURE auto-save client portal data (only written when changed)"""
+    DataSecurity.save_session_data(['portal_clients'])
 
 
 def send_client_invitation(client_email, client_name, access_level):
@@ -40,6 +37,7 @@ def show():
     
     # Require authentication
     DataSecurity.require_auth("Client Portal")
+    DataSecurity.flush_pending_saves()
     
     # Professional header styling
     st.markdown("""
@@ -1230,4 +1228,5 @@ def show_usage_analytics():
 
 # Main execution
 if __name__ == "__main__":
-    show()
+    with DataSecurity.deferred_saves():
+        show()
@@ -584,7 +584,7 @@ def show_recent_activity():
         st.subheader("📅 Upcoming Events")
         
         # Get REAL user events from calendar
-        events = DataSecurity.load_user_data('events', [])
+        events = DataSecurity.load_user_data_range('events', start=datetime.now().date())
         court_deadlines = DataSecurity.load_user_data('court_deadlines', [])
         
         if not events and not court_deadlines:
@@ -7,6 +7,7 @@ import uuid
 
 # ADD SECURITY IMPORT
 from services.data_security import DataSecurity
+from components.document_download import document_download_button
 
 def show():
     # Require authentication FIRST
@@ -415,27 +416,27 @@ def display_document_viewer(doc):
     with col_action1:
         st.markdown("#### 📄 Document Content")
         
-        # Get actual file content
+        # Memory-map the file so previews only touch the bytes they show
         if doc_id and doc_name:
-            file_content = DataSecurity.get_document(doc_id, doc_name)
+            file_content = DataSecurity.map_document(doc_id, doc_name)
             
             if file_content:
                 # Check file type for preview
                 mime_type = doc.get('mime_type', '')
                 
                 if 'text' in mime_type or doc_name.endswith('.txt'):
-                    # Text preview
+                    # Text preview (4 bytes per char covers any UTF-8 text)
                     try:
-                        text_content = file_content.decode('utf-8', errors='ignore')
+                        text_content = file_content[:8000].decode('utf-8', errors='ignore')
                         st.text_area("Text Preview", text_content[:2000], height=300, disabled=True)
-                        if len(text_content) > 2000:
+                        if len(text_content) > 2000 or len(file_content) > 8000:
                             st.info("Showing first 2000 characters. Download to see full content.")
                     except:
                         st.info("Cannot preview this file type. Please download to view.")
                 
                 elif 'image' in mime_type or doc_name.endswith(('.png', '.jpg', '.jpeg', '.gif')):
                     # Image preview
-                    st.image(file_content, caption=doc_name, use_container_width=True)
+                    st.image(file_content[:], caption=doc_name, use_container_width=True)
                 
                 elif 'pdf' in mime_type or doc_name.endswith('.pdf'):
                     st.info("📄 PDF Preview: Download the file to view full content")
@@ -443,6 +444,8 @@ def display_document_viewer(doc):
                 else:
                     st.info(f"Preview not available for {doc_type} files. Download to view.")
                 
+                file_content.close()
+                
             else:
                 st.warning("File content not available")
         else:
@@ -453,19 +456,11 @@ def display_document_viewer(doc):
         
         # Download button
         if doc_id and doc_name:
-            file_content = DataSecurity.get_document(doc_id, doc_name)
-            
-            if file_content:
-                st.download_button(
-                    label="📥 Download Document",
-                    data=file_content,
-                    file_name=doc_name,
-                    mime=doc.get('mime_type', 'application/octet-stream'),
-                    use_container_width=True,
-                    key="download_viewer"
-                )
-            else:
-                st.button("📥 Download (N/A)", disabled=True, use_container_width=True)
+            # Read only when the user asks for it (not on every rerun)
+            document_download_button(
+                doc_id, doc_name, doc.get('mime_type', 'application/octet-stream'),
+                key="download_viewer", label="📥 Download Document", use_container_width=True
+            )
         
         # Other actions
         if st.button("✏️ Edit Metadata", use_container_width=True):
@@ -567,17 +562,22 @@ def show_upload_interface():
 def process_document_upload(uploaded_file, title, doc_type, matter_id, tags, is_privileged, description):
     """Process document upload SECURELY"""
     try:
-        # Read file content
+        # Plan limit (read from the usage ledger, no document scan)
+        allowed, status = DataSecurity.check_plan_limit('documents')
+        if not allowed:
+            st.error(f"❌ {status}. Upgrade your plan to upload more documents.")
+            return False
+        
+        # Stream file content from the start (no extra in-memory copy)
         uploaded_file.seek(0)
-        file_content = uploaded_file.read()
         
         # Generate document ID
         doc_id = str(uuid.uuid4())
         
         # Save actual file using DataSecurity
-        file_path = DataSecurity.save_document(
+        file_path = DataSecurity.save_document_stream(
             doc_id,
-            file_content,
+            uploaded_file,
             uploaded_file.name,
             uploaded_file.type
         )
@@ -774,16 +774,10 @@ def show_document_list(documents):
             with col_action2:
                 # Download with actual file
                 if doc_id and doc_name:
-                    file_content = DataSecurity.get_document(doc_id, doc_name)
-                    
-                    if file_content:
-                        st.download_button(
-                            label="📥 Download",
-                            data=file_content,
-                            file_name=doc_name,
-                            mime=doc.get('mime_type', 'application/octet-stream'),
-                            key=f"download_list_{doc_id}"
-                        )
+                    document_download_button(
+                        doc_id, doc_name, doc.get('mime_type', 'application/octet-stream'),
+                        key=f"download_list_{doc_id}"
+                    )
             
             with col_action3:
                 if st.button("✏️ Edit", key=f"edit_{doc_id}"):
@@ -878,6 +872,20 @@ def show_document_analytics():
                 fig2 = px.bar(x=list(storage_mb.keys()), y=list(storage_mb.values()),
                              title="Storage by Document Type (MB)")
                 st.plotly_chart(fig2, use_container_width=True)
+        
+        # Deduplicated file storage
+        dedup = DataSecurity.get_dedup_stats()
+        if dedup['documents']:
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Stored Files", f"{dedup['unique_blobs']} unique / {dedup['documents']} documents")
+            with col2:
+                st.metric("Disk Used", f"{dedup['stored_bytes'] / (1024 * 1024):.1f} MB")
+            with col3:
+                st.metric(
+                    "Saved by Dedup / Compression",
+                    f"{dedup['dedup_saved_bytes'] / (1024 * 1024):.1f} / {dedup['compression_saved_bytes'] / (1024 * 1024):.1f} MB"
+                )
     
     else:
         st.info("No documents available for analytics.")
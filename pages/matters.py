@@ -9,6 +9,7 @@ from typing import List, Dict, Any, Optional
 from enum import Enum
 from types import SimpleNamespace
 from services.data_security import DataSecurity
+from components.document_download import document_download_button
 
 def dict_to_obj(d):
     return SimpleNamespace(**d)
@@ -705,7 +706,10 @@ def _show_create_matter_form(auth_service):
         
         with col_submit1:
             if st.form_submit_button("✅ Create Matter", type="primary"):
-                if matter_name and client_name and matter_type:
+                allowed, status = DataSecurity.check_plan_limit('matters')
+                if not allowed:
+                    st.error(f"❌ {status}. Upgrade your plan to create more matters.")
+                elif matter_name and client_name and matter_type:
                     # Create the matter first
                     new_matter = Matter(
                         id=str(uuid.uuid4()),
@@ -729,21 +733,20 @@ def _show_create_matter_form(auth_service):
                     st.session_state.matters.append(new_matter)
                     
                     # Handle file upload if provided
-                    if uploaded_file:
+                    if uploaded_file and not DataSecurity.check_plan_limit('documents')[0]:
+                        st.warning("⚠️ Matter created but document not attached: document limit reached for your plan")
+                    elif uploaded_file:
                         try:
-                            from services.data_security import DataSecurity
-                            
-                            # Read file content
+                            # Stream file content from the start
                             uploaded_file.seek(0)  # Reset file pointer
-                            file_content = uploaded_file.read()
                             
                             # Generate document ID
                             doc_id = str(uuid.uuid4())
                             
-                            # Save the ACTUAL FILE
-                            file_path = DataSecurity.save_document(
+                            # Save the ACTUAL FILE (chunked, no extra in-memory copy)
+                            file_path = DataSecurity.save_document_stream(
                                 doc_id, 
-                                file_content, 
+                                uploaded_file, 
                                 uploaded_file.name, 
                                 uploaded_file.type
                             )
@@ -754,8 +757,8 @@ def _show_create_matter_form(auth_service):
                                     'id': doc_id,
                                     'matter_id': new_matter.id,
                                     'name': uploaded_file.name,
-                                    'size': f"{len(file_content) / 1024:.1f} KB",
-                                    'size_bytes': len(file_content),
+                                    'size': f"{uploaded_file.size / 1024:.1f} KB",
+                                    'size_bytes': uploaded_file.size,
                                     'type': 'general',
                                     'mime_type': uploaded_file.type,
                                     'upload_date': datetime.now().isoformat(),
@@ -1022,19 +1025,12 @@ def _show_matter_card(matter, auth_service):
                         doc_name_file = getattr(doc, 'name', 'document')
                     
                     if doc_id and doc_name_file:
-                        # Retrieve actual file content
-                        file_content = DataSecurity.get_document(doc_id, doc_name_file)
-                        
-                        if file_content:
-                            st.download_button(
-                                label="⬇️",
-                                data=file_content,
-                                file_name=doc_name_file,
-                                mime=doc.get('mime_type', 'application/octet-stream') if isinstance(doc, dict) else getattr(doc, 'mime_type', 'application/octet-stream'),
-                                key=f"download_{doc_id}"
-                            )
-                        else:
-                            st.write("❌")
+                        # File content is read only when the download is requested
+                        document_download_button(
+                            doc_id, doc_name_file,
+                            doc.get('mime_type', 'application/octet-stream') if isinstance(doc, dict) else getattr(doc, 'mime_type', 'application/octet-stream'),
+                            key=f"download_{doc_id}", label="⬇️"
+                        )
 
         # Document Upload Section
         if auth_service.has_permission('write'):
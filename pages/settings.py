@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from services.backup_engine import BackupEngine
+from services.unit_of_work import SessionUnitOfWork
 
 def show():
     # Professional header styling
@@ -1084,16 +1086,49 @@ def show_data_management():
         
         st.markdown("#### Recent Backups")
         
-        recent_backups = [
-            ("Full Backup", "2024-09-23 02:00 AM", "✅"),
-            ("Incremental", "2024-09-22 02:00 AM", "✅"),
-            ("Incremental", "2024-09-21 02:00 AM", "✅"),
-            ("Full Backup", "2024-09-20 02:00 AM", "✅"),
-            ("Incremental", "2024-09-19 02:00 AM", "✅")
-        ]
-        
-        for backup_type, date, status in recent_backups:
-            st.write(f"{status} **{backup_type}** - {date}")
+        user_email = st.session_state.get('user_data', {}).get('email')
+        if not user_email:
+            st.info("Log in to see your backups.")
+        else:
+            if st.button("💾 Back Up Now", key="backup_now"):
+                summary = BackupEngine.backup(user_email)
+                stats = summary['stats']
+                st.success(
+                    f"Backup complete: {stats['changed_files']} of {stats['files']} files changed, "
+                    f"{stats['new_bytes'] / (1024 * 1024):.1f} MB stored"
+                )
+            
+            snapshots = BackupEngine.list_snapshots(user_email)
+            if not snapshots:
+                st.write("No backups yet.")
+            
+            for snapshot in reversed(snapshots[-5:]):
+                backup_type = "Incremental" if snapshot['parent'] else "Full Backup"
+                created = datetime.fromisoformat(snapshot['created']).strftime('%Y-%m-%d %I:%M %p')
+                st.write(f"✅ **{backup_type}** - {created}")
+            
+            if snapshots:
+                with st.form("restore_backup"):
+                    snapshot_id = st.selectbox(
+                        "Restore from:",
+                        [s['snapshot_id'] for s in reversed(snapshots)],
+                        format_func=lambda sid: datetime.strptime(sid, '%Y%m%d-%H%M%S-%f').strftime('%Y-%m-%d %I:%M:%S %p')
+                    )
+                    confirm = st.checkbox("I understand current data will be replaced")
+                    
+                    if st.form_submit_button("♻️ Restore"):
+                        if not confirm:
+                            st.warning("Please confirm the restore first.")
+                        else:
+                            created = next(s['created'] for s in snapshots if s['snapshot_id'] == snapshot_id)
+                            try:
+                                BackupEngine.restore(user_email, created)
+                            except (TimeoutError, PermissionError, FileNotFoundError) as e:
+                                st.error(f"Restore failed: {str(e)}")
+                            else:
+                                # Unsaved edits in this session would otherwise be written over the restored data
+                                SessionUnitOfWork.current().discard(user_email)
+                                st.success("Data restored. Reload the page to see it.")
         
         st.markdown("#### Data Health")
         
@@ -9,21 +9,12 @@ import os
 
 # ADD THIS:
 from services.data_security import DataSecurity
+from services.storage_backend import StorageBackend
 
 # REPLACE auto_save_user_data with:
 def auto_save_user_data():
-    """SECURE auto-save billing data"""
-    if 'time_entries' in st.session_state:
-        DataSecurity.save_user_data('time_entries', st.session_state.time_entries)
-    
-    if 'invoices' in st.session_state:
-        DataSecurity.save_user_data('invoices', st.session_state.invoices)
-    
-    if 'matters' in st.session_state:
-        DataSecurity.save_user_data('matters', st.session_state.matters)
-    
-    if 'billing_settings' in st.session_state:
-        DataSecurity.save_user_data('billing_settings', st.session_state.billing_settings)
+    """SECURE auto-save billing data (only collections that changed are written)"""
+    DataSecurity.save_session_data(['time_entries', 'invoices', 'matters', 'billing_settings'])
 
 def dict_to_obj(d):
     """Convert dict to SimpleNamespace object"""
@@ -44,11 +35,41 @@ def get_date_string(date_val):
         return date_val.strftime('%Y-%m-%d')
     return ''
 
+def get_period_range(period):
+    """(start, end) dates of a period choice; None bounds are open (All Time is (None, None))"""
+    today = datetime.now().date()
+    month_start = today.replace(day=1)
+    
+    if period == "Last 7 days":
+        return today - timedelta(days=7), None
+    if period == "Last 30 days":
+        return today - timedelta(days=30), None
+    if period == "This Month":
+        return month_start, None
+    if period == "Last Month":
+        last_month_end = month_start - timedelta(days=1)
+        return last_month_end.replace(day=1), last_month_end
+    if period == "Last 3 Months":
+        return today - timedelta(days=91), None
+    if period == "Last 6 Months":
+        return today - timedelta(days=182), None
+    if period == "This Year":
+        return today.replace(month=1, day=1), None
+    return None, None
+
+def load_time_entries(period):
+    """Time entries dated within a period, taken from the session copy (no extra read)"""
+    start, end = get_period_range(period)
+    if start is None and end is None:
+        return st.session_state.time_entries
+    return StorageBackend.filter_range(st.session_state.time_entries, 'date', start, end)
+
 def show():
     """Display the Time & Billing page"""
     
     # Require authentication
     DataSecurity.require_auth("Time & Billing")
+    DataSecurity.flush_pending_saves()
     
     # Professional header styling
     st.markdown("""
@@ -362,6 +383,8 @@ def show_billing_metrics():
     # Convert entries to objects if needed
     time_entries = [dict_to_obj(entry) if isinstance(entry, dict) else entry 
                    for entry in st.session_state.get('time_entries', [])]
+    month_entries = [dict_to_obj(entry) if isinstance(entry, dict) else entry 
+                     for entry in load_time_entries("This Month")]
     
     # ✅ FIX: Handle both datetime objects and strings
     def get_entry_date(entry):
@@ -378,7 +401,7 @@ def show_billing_metrics():
     
     # Calculate metrics using safe date comparison
     this_month_hours = sum(
-        getattr(entry, 'hours', 0) for entry in time_entries
+        getattr(entry, 'hours', 0) for entry in month_entries
         if (entry_date := get_entry_date(entry)) and 
            entry_date.month == current_month and
            entry_date.year == current_year
@@ -386,7 +409,7 @@ def show_billing_metrics():
     
     this_month_revenue = sum(
         getattr(entry, 'hours', 0) * getattr(entry, 'rate', 0)
-        for entry in time_entries
+        for entry in month_entries
         if (entry_date := get_entry_date(entry)) and 
            entry_date.month == current_month and
            entry_date.year == current_year
@@ -681,8 +704,8 @@ def show_time_tracking():
     with col_filter3:
         filter_date = st.selectbox("Period", ["Last 7 days", "Last 30 days", "This Month", "All Time"])
     
-    # Apply filters
-    filtered_entries = st.session_state.time_entries.copy()
+    # Apply filters (the period decides which months are read)
+    filtered_entries = list(load_time_entries(filter_date))
     
     if filter_matter != "All":
         filtered_entries = [e for e in filtered_entries if get_attr(e, 'matter', '') == filter_matter]
@@ -972,7 +995,7 @@ def show_billing_reports():
     # Summary metrics
     col_met1, col_met2, col_met3, col_met4 = st.columns(4)
     
-    time_entries = [dict_to_obj(e) if isinstance(e, dict) else e for e in st.session_state.time_entries]
+    time_entries = [dict_to_obj(e) if isinstance(e, dict) else e for e in load_time_entries(report_period)]
     
     total_hours = sum(getattr(e, 'hours', 0) for e in time_entries)
     total_revenue = sum(getattr(e, 'amount', 0) for e in time_entries)
@@ -1258,4 +1281,5 @@ def show_billing_settings():
             st.rerun()
 
 if __name__ == "__main__":
-    show()
+    with DataSecurity.deferred_saves():
+        show()
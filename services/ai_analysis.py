@@ -3,10 +3,97 @@ import json
 from typing import Dict, List, Tuple, Optional, Any
 from datetime import datetime, timedelta
 from collections import Counter
+from collections.abc import Mapping
 import math
 
+from services.analysis_cache import AnalysisCache
+from services.analysis_context import AnalysisContext
+from services.term_matcher import TermMatcher
+from services.text_patterns import TextPatterns
+
+class ContractAnalysis(Mapping):
+    """
+    analyze_contract result whose sections are computed on first access
+    
+    Holds the sections a caller asked for plus the ones they need (see
+    AIAnalysisSystem.SECTIONS). Reading a section runs its analyzer once;
+    sections never read are never computed, and asking for a section
+    outside the selection raises KeyError. 'degraded' always reflects the
+    extractors cut short so far. to_dict() computes everything selected.
+    """
+    
+    def __init__(self, system: 'AIAnalysisSystem', context: AnalysisContext, contract_type: str = None,
+                 sections=None, results: Dict = None):
+        self.system = system
+        self.context = context
+        self.contract_type = contract_type
+        self.sections = system.resolve_sections(sections)
+        self._results = dict(results or {})     # Sections already known (e.g. from the analysis cache)
+        self._results.pop('degraded', None)
+    
+    def __getitem__(self, section: str):
+        if section == 'degraded':
+            return list(self.context.degraded)
+        if section not in self.sections:
+            raise KeyError(section)
+        if section not in self._results:
+            method, needs, takes_contract_type = self.system.SECTIONS[section]
+            analyzer = getattr(self.system, method)
+            if needs:
+                self._results[section] = analyzer(self)
+            elif takes_contract_type:
+                self._results[section] = analyzer(self.context, self.contract_type)
+            else:
+                self._results[section] = analyzer(self.context)
+        return self._results[section]
+    
+    def __iter__(self):
+        yield from self.sections
+        yield 'degraded'
+    
+    def __len__(self) -> int:
+        return len(self.sections) + 1
+    
+    def computed(self) -> List[str]:
+        """Sections available without running an analyzer"""
+        return [section for section in self.sections if section in self._results]
+    
+    def to_dict(self) -> Dict:
+        return {section: self[section] for section in self}
+
 class AIAnalysisSystem:
-    def __init__(self):
+    # Analyzer registry: section -> (method, sections it reads, whether the method takes contract_type).
+    # Sections with no needs analyze the document; the others are computed from a ContractAnalysis
+    # holding their needs.
+    SECTIONS = {
+        'risk_assessment': ('_assess_risk_level', (), False),
+        'key_clauses': ('_identify_key_clauses', (), False),
+        'missing_clauses': ('_identify_missing_clauses', (), True),
+        'recommendations': ('_generate_recommendations', (), True),
+        'complexity_score': ('_calculate_complexity', (), False),
+        'compliance_analysis': ('_analyze_compliance', (), False),
+        'financial_terms': ('_extract_financial_terms', (), False),
+        'timeline_analysis': ('_analyze_timeline', (), False),
+        'party_obligations': ('_extract_obligations', (), False),
+        'red_flags': ('_identify_red_flags', (), False),
+        'contract_type_prediction': ('_predict_contract_type', (), False),
+        'negotiation_points': ('_identify_negotiation_points', (), False),
+        'executive_summary': ('generate_executive_summary', (
+            'risk_assessment', 'complexity_score', 'contract_type_prediction', 'missing_clauses',
+            'red_flags', 'recommendations'
+        ), False),
+        'scorecard': ('generate_contract_scorecard', (
+            'risk_assessment', 'missing_clauses', 'complexity_score', 'financial_terms',
+            'compliance_analysis', 'red_flags', 'recommendations'
+        ), False)
+    }
+    # What analyze_contract returns when no sections are requested
+    CONTRACT_SECTIONS = [section for section, (_, needs, _) in SECTIONS.items() if not needs]
+    # What compare_contracts reads from each contract
+    COMPARISON_SECTIONS = ['risk_assessment', 'complexity_score', 'key_clauses', 'missing_clauses', 'financial_terms']
+    
+    def __init__(self, user_email: str = None):
+        self.user_email = user_email    # Tenant whose analysis cache is used (no caching without one)
         self.legal_terms_database = {
             'contract_types': {
                 'employment': ['employment', 'employee', 'salary', 'benefits', 'job description', 'termination'],
@@ -34,28 +121,80 @@ class AIAnalysisSystem:
             'sox': ['financial reporting', 'internal controls', 'audit', 'disclosure'],
             'pci': ['payment card', 'credit card', 'cardholder data', 'payment processing']
         }
-    
-    def analyze_contract(self, document_text: str, contract_type: str = None) -> Dict:
-        """Comprehensive contract analysis using AI techniques."""
-        analysis = {
-            'risk_assessment': self._assess_risk_level(document_text),
-            'key_clauses': self._identify_key_clauses(document_text),
-            'missing_clauses': self._identify_missing_clauses(document_text, contract_type),
-            'recommendations': self._generate_recommendations(document_text, contract_type),
-            'complexity_score': self._calculate_complexity(document_text),
-            'compliance_analysis': self._analyze_compliance(document_text),
-            'financial_terms': self._extract_financial_terms(document_text),
-            'timeline_analysis': self._analyze_timeline(document_text),
-            'party_obligations': self._extract_obligations(document_text),
-            'red_flags': self._identify_red_flags(document_text),
-            'contract_type_prediction': self._predict_contract_type(document_text),
-            'negotiation_points': self._identify_negotiation_points(document_text)
+        
+        self.sentiment_indicators = {
+            'positive': [
+                'mutual', 'collaboration', 'partnership', 'good faith', 'reasonable',
+                'fair', 'equitable', 'benefit', 'success', 'cooperation'
+            ],
+            'negative': [
+                'penalty', 'breach', 'default', 'violation', 'terminate', 'cancel',
+                'liable', 'damages', 'forfeit', 'void', 'dispute', 'conflict'
+            ],
+            'neutral': [
+                'whereas', 'therefore', 'pursuant', 'herein', 'aforementioned',
+                'notwithstanding', 'stipulate', 'covenant', 'provision'
+            ]
         }
-        return analysis
+        
+        # One scan per document finds every keyword of the dictionaries above
+        dictionaries = [self.legal_terms_database['contract_types'], self.compliance_frameworks, self.sentiment_indicators]
+        self.term_matcher = TermMatcher.of(
+            term for dictionary in dictionaries for keywords in dictionary.values() for term in keywords
+        )
+    
+    def analyze_contract(self, document_text, contract_type: str = None, sections=None):
+        """
+        Comprehensive contract analysis using AI techniques.
+        
+        document_text may be an AnalysisContext; pass the same context to
+        DocumentProcessor.process_document_complete to reuse its lowercased
+        text, word/sentence lists and pattern matches.
+        
+        Without sections every CONTRACT_SECTIONS analyzer runs and a dict is
+        returned; with a user_email it is kept in the tenant's
+        AnalysisCache, so analyzing the same text again is a cache read.
+        With sections (names from SECTIONS) a ContractAnalysis is returned
+        that computes those sections and what they need on first access,
+        starting from the cached full analysis when there is one.
+        """
+        context = AnalysisContext.of(document_text)
+        if sections is not None:
+            cached = AnalysisCache.get(self.user_email, 'analyze_contract', context, {'contract_type': contract_type})
+            return ContractAnalysis(self, context, contract_type, sections, results=cached)
+        
+        return AnalysisCache.get_or_compute(
+            self.user_email, 'analyze_contract', context,
+            lambda: ContractAnalysis(self, context, contract_type, self.CONTRACT_SECTIONS).to_dict(),
+            options={'contract_type': contract_type}
+        )
+    
+    def resolve_sections(self, sections=None) -> List[str]:
+        """Requested sections (default CONTRACT_SECTIONS) with the sections they need, needs first"""
+        resolved = []
+        visiting = set()
+        
+        def visit(section):
+            if section in resolved:
+                return
+            if section not in self.SECTIONS:
+                raise ValueError(f"Unknown analysis section: {section}")
+            if section in visiting:
+                raise ValueError(f"Analysis sections depend on each other: {section}")
+            visiting.add(section)
+            for needed in self.SECTIONS[section][1]:
+                visit(needed)
+            visiting.discard(section)
+            resolved.append(section)
+        
+        for section in (self.CONTRACT_SECTIONS if sections is None else sections):
+            visit(section)
+        return resolved
     
-    def _assess_risk_level(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def _assess_risk_level(self, text) -> Dict[str, Any]:
         """Advanced risk assessment with detailed scoring."""
-        text_lower = text.lower()
+        context = AnalysisContext.of(text)
         
         high_risk_patterns = [
             r'unlimited\s+liability', r'personal\s+guarantee', r'no\s+termination',
@@ -72,9 +211,9 @@ class AIAnalysisSystem:
             r'standard\s+terms', r'industry\s+practice'
         ]
         
-        high_risk_count = sum(len(re.findall(pattern, text_lower)) for pattern in high_risk_patterns)
-        medium_risk_count = sum(len(re.findall(pattern, text_lower)) for pattern in medium_risk_patterns)
-        low_risk_count = sum(len(re.findall(pattern, text_lower)) for pattern in low_risk_patterns)
+        high_risk_count = sum(len(context.findall(pattern, lower=True)) for pattern in high_risk_patterns)
+        medium_risk_count = sum(len(context.findall(pattern, lower=True)) for pattern in medium_risk_patterns)
+        low_risk_count = sum(len(context.findall(pattern, lower=True)) for pattern in low_risk_patterns)
         
         # Calculate weighted risk score
         risk_score = (high_risk_count * 3) + (medium_risk_count * 2) + (low_risk_count * 0.5)
@@ -96,36 +235,38 @@ class AIAnalysisSystem:
             'confidence': min(0.9, total_indicators / 10) if total_indicators > 0 else 0.5
         }
     
-    def _identify_key_clauses(self, text: str) -> List[Dict]:
+    @AnalysisContext.budgeted
+    def _identify_key_clauses(self, text) -> List[Dict]:
         """Advanced clause identification with context analysis."""
+        context = AnalysisContext.of(text)
         clause_patterns = {
             'termination': {
-                'pattern': r'(?:termination|terminate|end|cancel|dissolution)[^.!?]*[.!?]',
+                'pattern': r'(?:termination|terminate|end|cancel|dissolution)[^.!?]{0,1000}[.!?]',
                 'keywords': ['termination', 'notice period', 'cause', 'convenience'],
                 'importance': 'critical'
             },
             'payment': {
-                'pattern': r'(?:payment|pay|fee|cost|price|compensation|remuneration)[^.!?]*[.!?]',
+                'pattern': r'(?:payment|pay|fee|cost|price|compensation|remuneration)[^.!?]{0,1000}[.!?]',
                 'keywords': ['amount', 'due date', 'currency', 'method'],
                 'importance': 'critical'
             },
             'liability': {
-                'pattern': r'(?:liability|liable|responsible|damages|harm)[^.!?]*[.!?]',
+                'pattern': r'(?:liability|liable|responsible|damages|harm)[^.!?]{0,1000}[.!?]',
                 'keywords': ['limitation', 'exclusion', 'cap', 'indemnify'],
                 'importance': 'critical'
             },
             'confidentiality': {
-                'pattern': r'(?:confidential|proprietary|non-disclosure|trade\s+secret)[^.!?]*[.!?]',
+                'pattern': r'(?:confidential|proprietary|non-disclosure|trade\s+secret)[^.!?]{0,1000}[.!?]',
                 'keywords': ['confidential', 'disclosure', 'proprietary'],
                 'importance': 'high'
             },
             'intellectual_property': {
-                'pattern': r'(?:intellectual\s+property|copyright|trademark|patent|proprietary\s+rights)[^.!?]*[.!?]',
+                'pattern': r'(?:intellectual\s+property|copyright|trademark|patent|proprietary\s+rights)[^.!?]{0,1000}[.!?]',
                 'keywords': ['ownership', 'license', 'infringement'],
                 'importance': 'high'
             },
             'force_majeure': {
-                'pattern': r'(?:force\s+majeure|act\s+of\s+god|unforeseeable\s+circumstances)[^.!?]*[.!?]',
+                'pattern': r'(?:force\s+majeure|act\s+of\s+god|unforeseeable\s+circumstances)[^.!?]{0,1000}[.!?]',
                 'keywords': ['force majeure', 'unforeseeable', 'beyond control'],
                 'importance': 'medium'
             }
@@ -133,7 +274,7 @@ class AIAnalysisSystem:
         
         clauses = []
         for clause_type, config in clause_patterns.items():
-            matches = re.findall(config['pattern'], text, re.IGNORECASE | re.DOTALL)
+            matches = context.findall(config['pattern'], re.IGNORECASE | re.DOTALL)
             for match in matches[:3]:  # Limit to first 3 matches per type
                 # Calculate relevance score based on keywords
                 match_lower = match.lower()
@@ -144,7 +285,7 @@ class AIAnalysisSystem:
                     'text': match.strip()[:200] + "..." if len(match.strip()) > 200 else match.strip(),
                     'importance': config['importance'],
                     'relevance_score': keyword_score,
-                    'location': text.find(match)
+                    'location': context.text.find(match)
                 })
         
         # Sort by importance and relevance
@@ -153,9 +294,9 @@ class AIAnalysisSystem:
         
         return clauses
     
-    def _identify_missing_clauses(self, text: str, contract_type: str = None) -> List[Dict]:
+    def _identify_missing_clauses(self, text, contract_type: str = None) -> List[Dict]:
         """Identify missing standard clauses with recommendations."""
-        text_lower = text.lower().replace(' ', '').replace('-', '').replace('_', '')
+        text_lower = AnalysisContext.of(text).compact_lower
         
         # Standard clauses based on contract type
         if contract_type:
@@ -244,13 +385,14 @@ class AIAnalysisSystem:
         
         return suggestions.get(clause, 'Consult with legal counsel for appropriate language.')
     
-    def _generate_recommendations(self, text: str, contract_type: str = None) -> List[Dict]:
+    @AnalysisContext.budgeted
+    def _generate_recommendations(self, text, contract_type: str = None) -> List[Dict]:
         """Generate AI-powered recommendations for contract improvement."""
         recommendations = []
-        text_lower = text.lower()
+        context = AnalysisContext.of(text)
         
         # Analyze contract length and complexity
-        word_count = len(text.split())
+        word_count = len(context.words)
         if word_count < 500:
             recommendations.append({
                 'category': 'Structure',
@@ -261,7 +403,7 @@ class AIAnalysisSystem:
         
         # Check for vague language
         vague_terms = ['reasonable', 'appropriate', 'satisfactory', 'adequate', 'proper']
-        vague_count = sum(1 for term in vague_terms if term in text_lower)
+        vague_count = context.count_any(vague_terms)
         if vague_count > 3:
             recommendations.append({
                 'category': 'Language Clarity',
@@ -271,8 +413,8 @@ class AIAnalysisSystem:
             })
         
         # Check payment terms specificity
-        if 'payment' in text_lower:
-            if not re.search(r'\$[\d,]+|\d+\s*days?', text_lower):
+        if context.contains('payment'):
+            if not context.search(r'\$[\d,]+|(?<!\d)\d+(?!\d)\s*days?', lower=True):
                 recommendations.append({
                     'category': 'Payment Terms',
                     'priority': 'high',
@@ -281,8 +423,8 @@ class AIAnalysisSystem:
                 })
         
         # Check for termination procedures
-        if 'termination' in text_lower or 'terminate' in text_lower:
-            if 'notice' not in text_lower:
+        if context.contains('termination') or context.contains('terminate'):
+            if not context.contains('notice'):
                 recommendations.append({
                     'category': 'Termination',
                     'priority': 'high',
@@ -292,7 +434,7 @@ class AIAnalysisSystem:
         
         # Check for dispute resolution
         dispute_terms = ['dispute', 'arbitration', 'mediation', 'litigation', 'court']
-        if not any(term in text_lower for term in dispute_terms):
+        if not context.count_any(dispute_terms):
             recommendations.append({
                 'category': 'Risk Management',
                 'priority': 'high',
@@ -302,11 +444,11 @@ class AIAnalysisSystem:
         
         return recommendations[:10]  # Limit to top 10 recommendations
     
-    def _calculate_complexity(self, text: str) -> Dict[str, Any]:
+    def _calculate_complexity(self, text) -> Dict[str, Any]:
         """Calculate contract complexity using multiple metrics."""
-        words = text.split()
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if s.strip()]
+        context = AnalysisContext.of(text)
+        words = context.words
+        sentences = context.sentences
         
         # Basic readability metrics
         avg_words_per_sentence = len(words) / len(sentences) if sentences else 0
@@ -315,15 +457,16 @@ class AIAnalysisSystem:
         
         # Legal complexity indicators
         legal_terms = ['whereas', 'heretofore', 'hereinafter', 'notwithstanding', 'pursuant']
-        legal_term_count = sum(1 for term in legal_terms if term in text.lower())
+        legal_term_count = context.count_any(legal_terms)
         
         # Sentence complexity
         complex_sentences = sum(1 for sentence in sentences 
                                if len(sentence.split()) > 25 or sentence.count(',') > 3)
         
         # Calculate overall complexity score
-        readability_score = (avg_words_per_sentence * 0.3) + (long_words / len(words) * 100 * 0.4)
-        legal_complexity = (legal_term_count / len(words) * 100 * 0.2) + (very_long_words / len(words) * 100 * 0.1)
+        word_total = len(words) or 1
+        readability_score = (avg_words_per_sentence * 0.3) + (long_words / word_total * 100 * 0.4)
+        legal_complexity = (legal_term_count / word_total * 100 * 0.2) + (very_long_words / word_total * 100 * 0.1)
         structure_complexity = (complex_sentences / len(sentences) * 100) if sentences else 0
         
         total_complexity = min(readability_score + legal_complexity + structure_complexity, 100.0)
@@ -345,13 +488,13 @@ class AIAnalysisSystem:
             'complex_sentences_percentage': round(complex_sentences / len(sentences) * 100, 1) if sentences else 0
         }
     
-    def _analyze_compliance(self, text: str) -> Dict[str, Any]:
+    def _analyze_compliance(self, text) -> Dict[str, Any]:
         """Analyze compliance with various regulatory frameworks."""
-        text_lower = text.lower()
+        hits = AnalysisContext.of(text).terms(self.term_matcher)
         compliance_analysis = {}
         
         for framework, keywords in self.compliance_frameworks.items():
-            keyword_matches = sum(1 for keyword in keywords if keyword in text_lower)
+            keyword_matches = hits.count_any(keywords)
             
             if keyword_matches > 0:
                 compliance_level = 'full' if keyword_matches >= len(keywords) // 2 else 'partial'
@@ -387,69 +530,70 @@ class AIAnalysisSystem:
         
         return recommendations.get(framework, [])
     
-    def _extract_financial_terms(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def _extract_financial_terms(self, text) -> Dict[str, Any]:
         """Extract and analyze financial terms from the contract."""
-        # Find monetary amounts
-        money_patterns = [
-            r'\$[\d,]+(?:\.\d{2})?',
-            r'USD\s*[\d,]+(?:\.\d{2})?',
-            r'[\d,]+\s*dollars?'
-        ]
+        context = AnalysisContext.of(text)
         
-        amounts = []
-        for pattern in money_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            amounts.extend(matches)
+        # Find monetary amounts (the same single scan DocumentProcessor uses; "1000 USD" is not counted here)
+        money = context.scan(TextPatterns.MONEY)
+        amounts = money['dollar_sign'] + money['usd_prefix'] + money['dollars']
         
         # Find payment terms
-        payment_pattern = r'(?:payment|pay|due|invoice)[^.]*(?:\d+\s*days?|\d+\s*months?)[^.]*\.'
-        payment_terms = re.findall(payment_pattern, text, re.IGNORECASE)
+        payment_pattern = r'(?:payment|pay|due|invoice)(?=[^.]{0,1000}\.)[^.]*(?:\d+\s*days?|\d+\s*months?)[^.]*\.'
+        payment_terms = context.findall(payment_pattern, re.IGNORECASE)
         
         # Find interest rates
-        interest_pattern = r'\d+(?:\.\d+)?%\s*(?:per\s*)?(?:annum|annual|yearly|month)'
-        interest_rates = re.findall(interest_pattern, text, re.IGNORECASE)
+        interest_pattern = r'(?<!\d)\d+(?!\d)(?:\.\d+(?!\d))?%\s*(?:per\s*)?(?:annum|annual|yearly|month)'
+        interest_rates = context.findall(interest_pattern, re.IGNORECASE)
         
         return {
             'monetary_amounts': list(set(amounts)),
             'payment_terms': [term.strip() for term in payment_terms],
             'interest_rates': list(set(interest_rates)),
-            'currency_mentioned': 'USD' in text or '$' in text
+            'currency_mentioned': 'USD' in context.text or '$' in context.text
         }
     
-    def _analyze_timeline(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def _analyze_timeline(self, text) -> Dict[str, Any]:
         """Analyze timeline and deadline information."""
+        context = AnalysisContext.of(text)
+        
         # Find time periods
         time_patterns = [
-            r'\d+\s*(?:days?|weeks?|months?|years?)',
+            r'(?<!\d)\d+(?!\d)\s*(?:days?|weeks?|months?|years?)',
             r'(?:within|by|before|after)\s+\d+\s*(?:days?|weeks?|months?)',
             r'(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}'
         ]
         
         timelines = []
         for pattern in time_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = context.findall(pattern, re.IGNORECASE)
             timelines.extend(matches)
         
         # Find deadline-related terms
-        deadline_pattern = r'(?:deadline|due date|expir[ei]\w*|terminat\w*)\s*[:\-]?\s*[^.]*\.'
-        deadlines = re.findall(deadline_pattern, text, re.IGNORECASE)
+        deadline_pattern = r'(?:deadline|due date|expir[ei]\w*|terminat\w*)\s*[:\-]?\s*[^.]{0,1000}\.'
+        deadlines = context.findall(deadline_pattern, re.IGNORECASE)
         
         return {
             'time_periods': list(set(timelines)),
             'deadlines': [deadline.strip() for deadline in deadlines],
-            'has_specific_dates': bool(re.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}', text))
+            'has_specific_dates': context.search(r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}')
         }
     
-    def _extract_obligations(self, text: str) -> Dict[str, List[str]]:
+    @AnalysisContext.budgeted
+    def _extract_obligations(self, text) -> Dict[str, List[str]]:
         """Extract party obligations from the contract."""
+        context = AnalysisContext.of(text)
+        
         obligation_patterns = [
-            r'(?:shall|must|will|agrees? to|responsible for|obligated to)\s+[^.]*\.',
-            r'(?:party|client|contractor|vendor)\s+(?:shall|must|will)\s+[^.]*\.',
+            r'(?:shall|must|will|agrees? to|responsible for|obligated to)\s+[^.]{0,1000}\.',
+            r'(?:party|client|contractor|vendor)\s+(?:shall|must|will)\s+[^.]{0,1000}\.',
         ]
         
         obligations = []
         for pattern in obligation_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = context.findall(pattern, re.IGNORECASE)
             obligations.extend([match.strip() for match in matches])
         
         # Categorize obligations (simplified)
@@ -464,10 +608,11 @@ class AIAnalysisSystem:
             'total_obligations': len(obligations)
         }
     
-    def _identify_red_flags(self, text: str) -> List[Dict[str, Any]]:
+    @AnalysisContext.budgeted
+    def _identify_red_flags(self, text) -> List[Dict[str, Any]]:
         """Identify potential red flags in the contract."""
         red_flags = []
-        text_lower = text.lower()
+        context = AnalysisContext.of(text)
         
         red_flag_patterns = {
             'Unlimited Liability': {
@@ -476,7 +621,7 @@ class AIAnalysisSystem:
                 'description': 'Contract may expose party to unlimited financial risk'
             },
             'No Termination Clause': {
-                'pattern': r'(?!.*terminat)(?!.*end)(?!.*cancel)',
+                'missing': ['terminat', 'end', 'cancel'],
                 'severity': 'high',
                 'description': 'Lack of termination provisions may create binding obligation'
             },
@@ -498,7 +643,11 @@ class AIAnalysisSystem:
         }
         
         for flag_name, config in red_flag_patterns.items():
-            if re.search(config['pattern'], text_lower):
+            if 'missing' in config:
+                flagged = not context.count_any(config['missing'])
+            else:
+                flagged = context.search(config['pattern'], lower=True)
+            if flagged:
                 red_flags.append({
                     'type': flag_name,
                     'severity': config['severity'],
@@ -508,13 +657,13 @@ class AIAnalysisSystem:
         
         return red_flags
     
-    def _predict_contract_type(self, text: str) -> Dict[str, Any]:
+    def _predict_contract_type(self, text) -> Dict[str, Any]:
         """Predict the most likely contract type using keyword analysis."""
-        text_lower = text.lower()
+        hits = AnalysisContext.of(text).terms(self.term_matcher)
         type_scores = {}
         
         for contract_type, keywords in self.legal_terms_database['contract_types'].items():
-            score = sum(text_lower.count(keyword) for keyword in keywords)
+            score = hits.total(keywords)
             if score > 0:
                 type_scores[contract_type] = score
         
@@ -533,20 +682,21 @@ class AIAnalysisSystem:
             'scores': type_scores
         }
     
-    def _identify_negotiation_points(self, text: str) -> List[Dict[str, Any]]:
+    @AnalysisContext.budgeted
+    def _identify_negotiation_points(self, text) -> List[Dict[str, Any]]:
         """Identify potential negotiation points in the contract."""
         negotiation_points = []
-        text_lower = text.lower()
+        context = AnalysisContext.of(text)
         
         # Look for one-sided terms
         one_sided_patterns = [
-            r'(?:client|party\s+a)(?:\s+shall|\s+must|\s+will)[^.]*(?:but|however|except)[^.]*(?:party\s+b|contractor)(?:\s+may|\s+can)',
+            r'(?:client|party\s+a)(?:\s+shall|\s+must|\s+will)(?=[^.]{0,1000}\.)[^.]*(?:but|however|except)[^.]*(?:party\s+b|contractor)(?:\s+may|\s+can)',
             r'sole\s+discretion|absolute\s+discretion',
             r'without\s+limitation|unlimited\s+right'
         ]
         
         for pattern in one_sided_patterns:
-            if re.search(pattern, text_lower):
+            if context.search(pattern, lower=True):
                 negotiation_points.append({
                     'type': 'One-sided Terms',
                     'priority': 'high',
@@ -556,7 +706,7 @@ class AIAnalysisSystem:
                 break
         
         # Look for missing reciprocal obligations
-        if 'indemnif' in text_lower and text_lower.count('indemnif') == 1:
+        if context.count('indemnif') == 1:
             negotiation_points.append({
                 'type': 'Indemnification',
                 'priority': 'medium',
@@ -565,7 +715,7 @@ class AIAnalysisSystem:
             })
         
         # Check for broad IP assignments
-        if re.search(r'(?:all|any).*intellectual\s+property.*(?:assign|transfer)', text_lower):
+        if context.in_sequence([r'all|any', r'intellectual\s+property', r'assign|transfer'], lower=True):
             negotiation_points.append({
                 'type': 'Intellectual Property',
                 'priority': 'high',
@@ -575,28 +725,13 @@ class AIAnalysisSystem:
         
         return negotiation_points
     
-    def analyze_document_sentiment(self, text: str) -> Dict[str, Any]:
-        """Analyze the overall sentiment and tone of the document."""
-        positive_indicators = [
-            'mutual', 'collaboration', 'partnership', 'good faith', 'reasonable',
-            'fair', 'equitable', 'benefit', 'success', 'cooperation'
-        ]
-        
-        negative_indicators = [
-            'penalty', 'breach', 'default', 'violation', 'terminate', 'cancel',
-            'liable', 'damages', 'forfeit', 'void', 'dispute', 'conflict'
-        ]
+    def analyze_document_sentiment(self, text) -> Dict[str, Any]:
+        """Analyze the overall sentiment and tone of the document (text or AnalysisContext)."""
+        hits = AnalysisContext.of(text).terms(self.term_matcher)
         
-        neutral_indicators = [
-            'whereas', 'therefore', 'pursuant', 'herein', 'aforementioned',
-            'notwithstanding', 'stipulate', 'covenant', 'provision'
-        ]
-        
-        text_lower = text.lower()
-        
-        positive_count = sum(text_lower.count(word) for word in positive_indicators)
-        negative_count = sum(text_lower.count(word) for word in negative_indicators)
-        neutral_count = sum(text_lower.count(word) for word in neutral_indicators)
+        positive_count = hits.total(self.sentiment_indicators['positive'])
+        negative_count = hits.total(self.sentiment_indicators['negative'])
+        neutral_count = hits.total(self.sentiment_indicators['neutral'])
         
         total_indicators = positive_count + negative_count + neutral_count
         
@@ -640,8 +775,15 @@ class AIAnalysisSystem:
         else:
             return f"{base_description} but analysis is uncertain due to mixed indicators"
     
-    def generate_executive_summary(self, analysis_results: Dict) -> str:
-        """Generate an executive summary of the AI analysis."""
+    def generate_executive_summary(self, analysis_results) -> str:
+        """
+        Generate an executive summary of the AI analysis.
+        
+        analysis_results may also be the document (text or AnalysisContext);
+        only the sections the summary reads are then analyzed.
+        """
+        if not isinstance(analysis_results, Mapping):
+            analysis_results = self.analyze_contract(analysis_results, sections=self.SECTIONS['executive_summary'][1])
         risk_level = analysis_results['risk_assessment']['level']
         complexity_level = analysis_results['complexity_score']['level']
         contract_type = analysis_results['contract_type_prediction']['predicted_type']
@@ -676,9 +818,21 @@ class AIAnalysisSystem:
         return " ".join(summary_parts)
     
     def compare_contracts(self, contract1_text: str, contract2_text: str) -> Dict[str, Any]:
-        """Compare two contracts and identify key differences."""
-        analysis1 = self.analyze_contract(contract1_text)
-        analysis2 = self.analyze_contract(contract2_text)
+        """
+        Compare two contracts and identify key differences.
+        
+        'degraded' lists the extractors cut short on either contract; such a
+        comparison is returned but not cached.
+        """
+        return AnalysisCache.get_or_compute(
+            self.user_email, 'compare_contracts', contract1_text,
+            lambda: self._compare_contracts(contract1_text, contract2_text),
+            options={'compare_with': AnalysisCache.text_hash(contract2_text)}
+        )
+    
+    def _compare_contracts(self, contract1_text: str, contract2_text: str) -> Dict[str, Any]:
+        analysis1 = self.analyze_contract(contract1_text, sections=self.COMPARISON_SECTIONS)
+        analysis2 = self.analyze_contract(contract2_text, sections=self.COMPARISON_SECTIONS)
         
         comparison = {
             'risk_comparison': {
@@ -716,7 +870,8 @@ class AIAnalysisSystem:
                 analysis1['financial_terms'], 
                 analysis2['financial_terms']
             ),
-            'recommendation': self._generate_comparison_recommendation(analysis1, analysis2)
+            'recommendation': self._generate_comparison_recommendation(analysis1, analysis2),
+            'degraded': list(dict.fromkeys(analysis1['degraded'] + analysis2['degraded']))
         }
         
         return comparison
@@ -794,9 +949,10 @@ class AIAnalysisSystem:
         else:
             return "Both contracts have similar risk profiles. Review specific terms and business requirements to determine preference."
     
-    def extract_key_metrics(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def extract_key_metrics(self, text) -> Dict[str, Any]:
         """Extract key performance metrics and benchmarks from contracts."""
-        text_lower = text.lower()
+        context = AnalysisContext.of(text)
         
         # Extract performance metrics
         metrics = {
@@ -810,102 +966,121 @@ class AIAnalysisSystem:
         
         # Performance standards
         performance_patterns = [
-            r'(?:perform[a-z]*|standard[s]?|requirement[s]?)[^.]*(?:\d+%|\d+\s*percent)[^.]*\.',
-            r'(?:accuracy|quality|completion)[^.]*(?:\d+%|\d+\s*percent)[^.]*\.',
+            r'(?:perform[a-z]*|standard[s]?|requirement[s]?)(?=[^.]{0,1000}\.)[^.]*(?:\d+%|\d+\s*percent)[^.]*\.',
+            r'(?:accuracy|quality|completion)(?=[^.]{0,1000}\.)[^.]*(?:\d+%|\d+\s*percent)[^.]*\.',
         ]
         
         for pattern in performance_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = context.findall(pattern, re.IGNORECASE)
             metrics['performance_standards'].extend([m.strip() for m in matches])
         
         # Service level agreements
         sla_patterns = [
-            r'(?:service\s+level|sla|uptime|availability)[^.]*(?:\d+(?:\.\d+)?%)[^.]*\.',
-            r'(?:response\s+time|resolution\s+time)[^.]*(?:\d+\s*(?:hours?|days?|minutes?))[^.]*\.'
+            r'(?:service\s+level|sla|uptime|availability)(?=[^.]{0,1000}\.)[^.]*(?:\d+(?:\.\d+)?%)[^.]*\.',
+            r'(?:response\s+time|resolution\s+time)(?=[^.]{0,1000}\.)[^.]*(?:\d+\s*(?:hours?|days?|minutes?))[^.]*\.'
         ]
         
         for pattern in sla_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = context.findall(pattern, re.IGNORECASE)
             metrics['service_levels'].extend([m.strip() for m in matches])
         
         # Delivery timeframes
-        delivery_pattern = r'(?:deliver|complete|finish)[^.]*(?:within|by|before)\s*\d+\s*(?:days?|weeks?|months?)[^.]*\.'
-        delivery_matches = re.findall(delivery_pattern, text, re.IGNORECASE)
+        delivery_pattern = r'(?:deliver|complete|finish)(?=[^.]{0,1000}\.)[^.]*(?:within|by|before)\s*\d+\s*(?:days?|weeks?|months?)[^.]*\.'
+        delivery_matches = context.findall(delivery_pattern, re.IGNORECASE)
         metrics['delivery_timeframes'] = [m.strip() for m in delivery_matches]
         
         # Penalty clauses
-        penalty_pattern = r'(?:penalty|fine|liquidated\s+damages)[^.]*\$[\d,]+(?:\.\d{2})?[^.]*\.'
-        penalty_matches = re.findall(penalty_pattern, text, re.IGNORECASE)
+        penalty_pattern = r'(?:penalty|fine|liquidated\s+damages)(?=[^.]{0,1000}\.)[^.]*\$[\d,]+(?:\.\d{2})?[^.]*\.'
+        penalty_matches = context.findall(penalty_pattern, re.IGNORECASE)
         metrics['penalty_clauses'] = [m.strip() for m in penalty_matches]
         
         return metrics
     
-    def analyze_contract_lifecycle(self, text: str) -> Dict[str, Any]:
+    def analyze_contract_lifecycle(self, text) -> Dict[str, Any]:
         """Analyze contract lifecycle events and phases."""
+        context = AnalysisContext.of(text)
         lifecycle_analysis = {
-            'inception': self._extract_inception_terms(text),
-            'performance_phase': self._extract_performance_terms(text),
-            'modification': self._extract_modification_terms(text),
-            'termination': self._extract_termination_terms(text),
-            'post_termination': self._extract_post_termination_terms(text)
+            'inception': self._extract_inception_terms(context),
+            'performance_phase': self._extract_performance_terms(context),
+            'modification': self._extract_modification_terms(context),
+            'termination': self._extract_termination_terms(context),
+            'post_termination': self._extract_post_termination_terms(context)
         }
         
         return lifecycle_analysis
     
-    def _extract_inception_terms(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def _extract_inception_terms(self, text) -> Dict[str, Any]:
         """Extract contract inception and commencement terms."""
-        inception_pattern = r'(?:effective|commence|begin|start)[^.]*(?:date|upon|when)[^.]*\.'
-        inception_matches = re.findall(inception_pattern, text, re.IGNORECASE)
+        context = AnalysisContext.of(text)
+        inception_pattern = r'(?:effective|commence|begin|start)(?=[^.]{0,1000}\.)[^.]*(?:date|upon|when)[^.]*\.'
+        inception_matches = context.findall(inception_pattern, re.IGNORECASE)
         
         return {
             'commencement_clauses': [m.strip() for m in inception_matches[:3]],
-            'has_conditions_precedent': bool(re.search(r'condition[s]?\s+precedent|subject\s+to', text, re.IGNORECASE))
+            'has_conditions_precedent': context.search(r'condition[s]?\s+precedent|subject\s+to', re.IGNORECASE)
         }
     
-    def _extract_performance_terms(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def _extract_performance_terms(self, text) -> Dict[str, Any]:
         """Extract performance phase terms."""
-        performance_pattern = r'(?:perform|discharge|fulfill|execute)[^.]*obligation[s]?[^.]*\.'
-        performance_matches = re.findall(performance_pattern, text, re.IGNORECASE)
+        context = AnalysisContext.of(text)
+        performance_pattern = r'(?:perform|discharge|fulfill|execute)(?=[^.]{0,1000}\.)[^.]*obligation[s]?[^.]*\.'
+        performance_matches = context.findall(performance_pattern, re.IGNORECASE)
         
         return {
             'performance_obligations': [m.strip() for m in performance_matches[:3]],
-            'has_monitoring_provisions': bool(re.search(r'monitor|review|inspect|audit', text, re.IGNORECASE))
+            'has_monitoring_provisions': context.search(r'monitor|review|inspect|audit', re.IGNORECASE)
         }
     
-    def _extract_modification_terms(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def _extract_modification_terms(self, text) -> Dict[str, Any]:
         """Extract contract modification terms."""
-        modification_pattern = r'(?:modif[yi]|amend|change|alter)[^.]*(?:writing|written|signed)[^.]*\.'
-        modification_matches = re.findall(modification_pattern, text, re.IGNORECASE)
+        context = AnalysisContext.of(text)
+        modification_pattern = r'(?:modif[yi]|amend|change|alter)(?=[^.]{0,1000}\.)[^.]*(?:writing|written|signed)[^.]*\.'
+        modification_matches = context.findall(modification_pattern, re.IGNORECASE)
         
         return {
             'modification_procedures': [m.strip() for m in modification_matches[:2]],
-            'requires_written_consent': bool(re.search(r'(?:modif[yi]|amend).*writ(?:ten|ing)', text, re.IGNORECASE))
+            'requires_written_consent': context.in_sequence([r'modif[yi]|amend', r'writ(?:ten|ing)'], re.IGNORECASE)
         }
     
-    def _extract_termination_terms(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def _extract_termination_terms(self, text) -> Dict[str, Any]:
         """Extract termination terms."""
-        termination_pattern = r'(?:terminat[ei]|end|expir[ei])[^.]*(?:notice|cause|breach)[^.]*\.'
-        termination_matches = re.findall(termination_pattern, text, re.IGNORECASE)
+        context = AnalysisContext.of(text)
+        termination_pattern = r'(?:terminat[ei]|end|expir[ei])(?=[^.]{0,1000}\.)[^.]*(?:notice|cause|breach)[^.]*\.'
+        termination_matches = context.findall(termination_pattern, re.IGNORECASE)
         
         return {
             'termination_procedures': [m.strip() for m in termination_matches[:3]],
-            'notice_required': bool(re.search(r'terminat.*notice', text, re.IGNORECASE)),
-            'termination_for_cause': bool(re.search(r'terminat.*(?:cause|breach)', text, re.IGNORECASE))
+            'notice_required': context.in_sequence([r'terminat', r'notice'], re.IGNORECASE),
+            'termination_for_cause': context.in_sequence([r'terminat', r'cause|breach'], re.IGNORECASE)
         }
     
-    def _extract_post_termination_terms(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def _extract_post_termination_terms(self, text) -> Dict[str, Any]:
         """Extract post-termination obligations."""
-        survival_pattern = r'(?:surviv[ei]|remain\s+in\s+(?:force|effect))[^.]*(?:terminat|expir)[^.]*\.'
-        survival_matches = re.findall(survival_pattern, text, re.IGNORECASE)
+        context = AnalysisContext.of(text)
+        survival_pattern = r'(?:surviv[ei]|remain\s+in\s+(?:force|effect))(?=[^.]{0,1000}\.)[^.]*(?:terminat|expir)[^.]*\.'
+        survival_matches = context.findall(survival_pattern, re.IGNORECASE)
         
         return {
             'survival_clauses': [m.strip() for m in survival_matches[:2]],
-            'has_return_obligations': bool(re.search(r'return|destroy.*(?:confidential|proprietary)', text, re.IGNORECASE)),
-            'has_post_term_restrictions': bool(re.search(r'(?:after|following).*terminat.*(?:not|shall\s+not)', text, re.IGNORECASE))
+            'has_return_obligations': (context.search(r'return', re.IGNORECASE) or
+                                       context.in_sequence([r'destroy', r'confidential|proprietary'], re.IGNORECASE)),
+            'has_post_term_restrictions': context.in_sequence([r'after|following', r'terminat', r'not|shall\s+not'], re.IGNORECASE)
         }
     
-    def generate_contract_scorecard(self, analysis_results: Dict) -> Dict[str, Any]:
-        """Generate a comprehensive contract scorecard."""
+    def generate_contract_scorecard(self, analysis_results) -> Dict[str, Any]:
+        """
+        Generate a comprehensive contract scorecard.
+        
+        analysis_results may also be the document (text or AnalysisContext);
+        only the sections the scorecard reads are then analyzed.
+        """
+        if not isinstance(analysis_results, Mapping):
+            analysis_results = self.analyze_contract(analysis_results, sections=self.SECTIONS['scorecard'][1])
         scorecard = {
             'overall_score': 0,
             'category_scores': {},
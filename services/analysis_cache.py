@@ -0,0 +1,308 @@
+import os
+import json
+import hashlib
+import threading
+import importlib.util
+from datetime import datetime
+
+from services.atomic_io import AtomicFile
+from services.compression import Compression
+from services.file_lock import FileLock
+
+
+class AnalysisCache:
+    """
+    Per-tenant on-disk cache of analysis results, keyed by document content
+
+    Structure:
+    user_data/
+    └── user_at_email_com/
+        └── analysis_cache/
+            ├── manifest.json           ← key → {analyzer, size, created, last_used}, versions, totals
+            ├── manifest.lock
+            └── entries/
+                └── 3f/a2/3fa2...e9     ← JSON result (compressed like documents)
+
+    An entry key is the SHA-256 of (analyzer, analyzer version, SHA-256 of
+    the text, options). The analyzer version hashes ANALYZER_VERSION and
+    the source files of the analysis modules, so changing the analyzers
+    invalidates their results; entries from an older version are dropped
+    the next time that analyzer is used. Least recently used entries are
+    evicted once a tenant's cache holds more than MAX_BYTES.
+
+    Results that report degraded extractors (cut short by their time
+    budget) are not stored. Cache failures never fail an analysis; the
+    result is computed as if there were no cache.
+    """
+
+    CACHE_DIR = "analysis_cache"
+    MANIFEST_FILE = "manifest.json"
+    LOCK_FILE = "manifest.lock"
+    ENTRIES_DIR = "entries"
+
+    # Bump to invalidate every cached result when output changes without a change to SOURCE_MODULES
+    ANALYZER_VERSION = 1
+    SOURCE_MODULES = (
+        'services.ai_analysis', 'services.analysis_context', 'services.document_insights',
+        'services.document_processor', 'services.streaming_context', 'services.term_matcher',
+        'services.text_patterns'
+    )
+
+    # ANALYSIS_CACHE=true|false, ANALYSIS_CACHE_MAX_MB per tenant
+    ENABLED = os.getenv('ANALYSIS_CACHE', 'true').lower() == 'true'
+    MAX_BYTES = int(float(os.getenv('ANALYSIS_CACHE_MAX_MB', '64')) * 1024 * 1024)
+
+    _versions = {}      # extra source files -> analyzer version
+    _lock = threading.Lock()
+    _stats = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def cache_dir(user_email):
+        from services.local_storage import LocalStorage
+        return os.path.join(LocalStorage.get_user_directory(user_email), AnalysisCache.CACHE_DIR)
+
+    @staticmethod
+    def entry_path(cache_dir, key):
+        """Two-level sharded path for an entry"""
+        return os.path.join(cache_dir, AnalysisCache.ENTRIES_DIR, key[:2], key[2:4], key)
+
+    @staticmethod
+    def text_hash(text):
+        """SHA-256 of a document's text (text or AnalysisContext)"""
+        content_hash = getattr(text, 'content_hash', None)
+        if content_hash is not None:
+            return content_hash
+        return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    @staticmethod
+    def analyzer_version(sources=()):
+        """
+        Version of the analysis code: ANALYZER_VERSION plus the contents of
+        SOURCE_MODULES and any extra source files (computed once per process)
+        """
+        key = tuple(sources)
+        version = AnalysisCache._versions.get(key)
+        if version is not None:
+            return version
+
+        digest = hashlib.sha256(f"v{AnalysisCache.ANALYZER_VERSION}".encode())
+        paths = [importlib.util.find_spec(module).origin for module in AnalysisCache.SOURCE_MODULES]
+        for path in paths + list(key):
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+        version = digest.hexdigest()[:16]
+
+        with AnalysisCache._lock:
+            AnalysisCache._versions[key] = version
+        return version
+
+    @staticmethod
+    def entry_key(analyzer, version, text_hash, options=None):
+        material = json.dumps([analyzer, version, text_hash, options or {}], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _empty_manifest():
+        return {
+            'entries': {},
+            'versions': {},
+            'totals': {'entries': 0, 'bytes': 0},
+            'stats': {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        }
+
+    @staticmethod
+    def _read_manifest(cache_dir):
+        path = os.path.join(cache_dir, AnalysisCache.MANIFEST_FILE)
+        if not os.path.exists(path):
+            return AnalysisCache._empty_manifest()
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    @staticmethod
+    def _update(cache_dir, apply):
+        """Read-modify-write the manifest under its lock; apply(manifest) returns False to skip the write"""
+        os.makedirs(cache_dir, exist_ok=True)
+        with FileLock.exclusive(os.path.join(cache_dir, AnalysisCache.LOCK_FILE)):
+            manifest = AnalysisCache._read_manifest(cache_dir)
+            result = apply(manifest)
+            if result is not False:
+                AtomicFile.write_text(os.path.join(cache_dir, AnalysisCache.MANIFEST_FILE), json.dumps(manifest, indent=2))
+            return manifest
+
+    @staticmethod
+    def _remove_entry(cache_dir, manifest, key):
+        entry = manifest['entries'].pop(key, None)
+        if entry is None:
+            return
+        manifest['totals']['entries'] -= 1
+        manifest['totals']['bytes'] -= entry['size']
+        try:
+            os.remove(AnalysisCache.entry_path(cache_dir, key))
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _check_version(cache_dir, manifest, analyzer, version):
+        """Drop an analyzer's entries when its version changed; returns how many were dropped"""
+        if manifest['versions'].get(analyzer) == version:
+            return 0
+        stale = [key for key, entry in manifest['entries'].items() if entry['analyzer'] == analyzer]
+        for key in stale:
+            AnalysisCache._remove_entry(cache_dir, manifest, key)
+        manifest['versions'][analyzer] = version
+        manifest['stats']['invalidations'] += len(stale)
+        return len(stale)
+
+    @staticmethod
+    def _count(counter, amount=1):
+        with AnalysisCache._lock:
+            AnalysisCache._stats[counter] += amount
+
+    @staticmethod
+    def get(user_email, analyzer, text, options=None, sources=()):
+        """Cached result of an analyzer for a text, or None on a miss"""
+        if not (user_email and AnalysisCache.ENABLED):
+            return None
+        try:
+            cache_dir = AnalysisCache.cache_dir(user_email)
+            version = AnalysisCache.analyzer_version(sources)
+            key = AnalysisCache.entry_key(analyzer, version, AnalysisCache.text_hash(text), options)
+
+            result = None
+            if AnalysisCache._read_manifest(cache_dir)['versions'].get(analyzer) == version:
+                try:
+                    result = json.loads(Compression.read_file(AnalysisCache.entry_path(cache_dir, key)))
+                except FileNotFoundError:
+                    pass
+
+            def apply(manifest):
+                invalidated = AnalysisCache._check_version(cache_dir, manifest, analyzer, version)
+                if invalidated:
+                    AnalysisCache._count('invalidations', invalidated)
+                if result is not None and key in manifest['entries']:
+                    manifest['entries'][key]['last_used'] = datetime.now().isoformat()
+                    manifest['stats']['hits'] += 1
+                else:
+                    manifest['stats']['misses'] += 1
+
+            manifest = AnalysisCache._update(cache_dir, apply)
+            if result is not None and key in manifest['entries']:
+                AnalysisCache._count('hits')
+                return result
+        except Exception:
+            pass
+
+        AnalysisCache._count('misses')
+        return None
+
+    @staticmethod
+    def put(user_email, analyzer, text, result, options=None, sources=()):
+        """Store an analyzer's result for a text (evicting least recently used entries over MAX_BYTES)"""
+        if not (user_email and AnalysisCache.ENABLED):
+            return False
+        if isinstance(result, dict) and result.get('degraded'):
+            return False
+        try:
+            cache_dir = AnalysisCache.cache_dir(user_email)
+            version = AnalysisCache.analyzer_version(sources)
+            key = AnalysisCache.entry_key(analyzer, version, AnalysisCache.text_hash(text), options)
+
+            data = json.dumps(result).encode('utf-8')
+            if Compression.should_compress(data):
+                data = Compression.compress_bytes(data)
+            if len(data) > AnalysisCache.MAX_BYTES:
+                return False
+
+            path = AnalysisCache.entry_path(cache_dir, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            AtomicFile.write_bytes(path, data)
+
+            def apply(manifest):
+                invalidated = AnalysisCache._check_version(cache_dir, manifest, analyzer, version)
+                if invalidated:
+                    AnalysisCache._count('invalidations', invalidated)
+
+                now = datetime.now().isoformat()
+                previous = manifest['entries'].get(key)
+                if previous is not None:
+                    manifest['totals']['bytes'] -= previous['size']
+                else:
+                    manifest['totals']['entries'] += 1
+                manifest['entries'][key] = {'analyzer': analyzer, 'size': len(data), 'created': now, 'last_used': now}
+                manifest['totals']['bytes'] += len(data)
+
+                # Evict least recently used entries (never the one just stored)
+                if manifest['totals']['bytes'] > AnalysisCache.MAX_BYTES:
+                    by_age = sorted(manifest['entries'].items(), key=lambda item: item[1]['last_used'])
+                    for old_key, _ in by_age:
+                        if manifest['totals']['bytes'] <= AnalysisCache.MAX_BYTES:
+                            break
+                        if old_key != key:
+                            AnalysisCache._remove_entry(cache_dir, manifest, old_key)
+                            manifest['stats']['evictions'] += 1
+                            AnalysisCache._count('evictions')
+
+            AnalysisCache._update(cache_dir, apply)
+            AnalysisCache._count('stores')
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def get_or_compute(user_email, analyzer, text, compute, options=None, sources=()):
+        """
+        Cached result of an analyzer, computing and storing it on a miss
+
+        compute() takes no arguments. Without a user_email (or with
+        ANALYSIS_CACHE=false) it is simply called.
+        """
+        if not (user_email and AnalysisCache.ENABLED):
+            return compute()
+
+        result = AnalysisCache.get(user_email, analyzer, text, options, sources)
+        if result is None:
+            result = compute()
+            AnalysisCache.put(user_email, analyzer, text, result, options, sources)
+        return result
+
+    @staticmethod
+    def clear(user_email):
+        """Drop every cached result of a tenant; returns the number of entries removed"""
+        cache_dir = AnalysisCache.cache_dir(user_email)
+        removed = []
+
+        def apply(manifest):
+            if not manifest['entries']:
+                return False
+            for key in list(manifest['entries']):
+                AnalysisCache._remove_entry(cache_dir, manifest, key)
+                removed.append(key)
+
+        AnalysisCache._update(cache_dir, apply)
+        return len(removed)
+
+    @staticmethod
+    def stats(user_email=None):
+        """
+        Cache statistics: a tenant's entries, bytes and lifetime counters
+        (with user_email), plus this process's counters under 'process'
+        """
+        stats = {}
+        if user_email:
+            try:
+                manifest = AnalysisCache._read_manifest(AnalysisCache.cache_dir(user_email))
+            except Exception:
+                manifest = AnalysisCache._empty_manifest()
+            stats.update(manifest['totals'])
+            stats.update(manifest['stats'])
+            stats['by_analyzer'] = {}
+            for entry in manifest['entries'].values():
+                stats['by_analyzer'][entry['analyzer']] = stats['by_analyzer'].get(entry['analyzer'], 0) + 1
+            lookups = stats['hits'] + stats['misses']
+            stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+
+        with AnalysisCache._lock:
+            stats['process'] = dict(AnalysisCache._stats)
+        stats['max_bytes'] = AnalysisCache.MAX_BYTES
+        stats['enabled'] = AnalysisCache.ENABLED
+        return stats
@@ -0,0 +1,162 @@
+import os
+import time
+import uuid
+import threading
+
+
+class AtomicFile:
+    """
+    Crash-safe file writes
+
+    Whole-file writes go to a temp file in the same directory, are fsynced
+    and then os.replace()d over the target, so readers see either the old or
+    the new contents, never a torn file. Appends are fsynced before returning.
+
+    With GROUP_COMMIT enabled, concurrent writers (e.g. several Streamlit
+    sessions) hand their pending fsync/replace to a committer thread that
+    waits GROUP_COMMIT_WINDOW seconds to gather a batch, then syncs it with
+    one fsync per file and one fsync per distinct directory. Each writer still
+    blocks until its own write is durable.
+    """
+
+    GROUP_COMMIT = os.getenv('STORAGE_GROUP_COMMIT', 'false').lower() == 'true'
+    GROUP_COMMIT_WINDOW = 0.005
+
+    _pending = []
+    _pending_lock = threading.Condition()
+    _committer = None
+
+    @staticmethod
+    def temp_path(path):
+        """Temp file next to the target so os.replace stays on one filesystem"""
+        directory, name = os.path.split(path)
+        return os.path.join(directory, f".{name}.{uuid.uuid4().hex}.tmp")
+
+    @staticmethod
+    def publish(temp_path, path):
+        """Move an already-fsynced temp file into place durably"""
+        os.replace(temp_path, path)
+        AtomicFile._fsync_directory(os.path.dirname(path))
+
+    @staticmethod
+    def _fsync_directory(directory):
+        """Persist directory entries (the rename itself)"""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(directory or '.', os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    @staticmethod
+    def write_bytes(path, data):
+        """Atomically replace path with data"""
+        AtomicFile.write_stream(path, (data,))
+
+    @staticmethod
+    def write_text(path, text, encoding='utf-8'):
+        """Atomically replace path with text"""
+        AtomicFile.write_bytes(path, text.encode(encoding))
+
+    @staticmethod
+    def write_stream(path, chunks):
+        """Atomically replace path with an iterable of byte chunks"""
+        temp_path = AtomicFile.temp_path(path)
+        try:
+            with open(temp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                f.flush()
+                if not AtomicFile.GROUP_COMMIT:
+                    os.fsync(f.fileno())
+
+            if AtomicFile.GROUP_COMMIT:
+                AtomicFile._commit(temp_path, path)
+            else:
+                os.replace(temp_path, path)
+                AtomicFile._fsync_directory(os.path.dirname(path))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    @staticmethod
+    def append_text(path, text, encoding='utf-8'):
+        """Append text durably (readers must tolerate a torn final line)"""
+        with open(path, 'a', encoding=encoding) as f:
+            f.write(text)
+            f.flush()
+            if not AtomicFile.GROUP_COMMIT:
+                os.fsync(f.fileno())
+
+        if AtomicFile.GROUP_COMMIT:
+            AtomicFile._commit(path, None)
+
+    @staticmethod
+    def _commit(source, target):
+        """Queue a write for the group committer and wait until it is durable"""
+        item = {'source': source, 'target': target, 'done': threading.Event(), 'error': None}
+
+        with AtomicFile._pending_lock:
+            AtomicFile._pending.append(item)
+            if AtomicFile._committer is None or not AtomicFile._committer.is_alive():
+                AtomicFile._committer = threading.Thread(
+                    target=AtomicFile._run_committer, name='storage-group-commit', daemon=True
+                )
+                AtomicFile._committer.start()
+            AtomicFile._pending_lock.notify()
+
+        item['done'].wait()
+        if item['error'] is not None:
+            raise item['error']
+
+    @staticmethod
+    def _run_committer():
+        """Gather writes for one window, then sync them as a batch"""
+        while True:
+            with AtomicFile._pending_lock:
+                while not AtomicFile._pending:
+                    if not AtomicFile._pending_lock.wait(timeout=30):
+                        AtomicFile._committer = None
+                        return
+
+            time.sleep(AtomicFile.GROUP_COMMIT_WINDOW)
+
+            with AtomicFile._pending_lock:
+                batch = AtomicFile._pending
+                AtomicFile._pending = []
+
+            AtomicFile._sync_batch(batch)
+
+    @staticmethod
+    def _sync_batch(batch):
+        """fsync every file once, rename temps into place, fsync each directory once"""
+        directories = set()
+        synced = set()
+
+        for item in batch:
+            try:
+                # Several appends to one journal need a single fsync
+                if item['source'] not in synced:
+                    fd = os.open(item['source'], os.O_RDONLY)
+                    try:
+                        os.fsync(fd)
+                    finally:
+                        os.close(fd)
+                    synced.add(item['source'])
+
+                if item['target'] is not None:
+                    os.replace(item['source'], item['target'])
+                    directories.add(os.path.dirname(item['target']))
+            except Exception as e:
+                item['error'] = e
+
+        for directory in directories:
+            try:
+                AtomicFile._fsync_directory(directory)
+            except OSError:
+                pass
+
+        for item in batch:
+            item['done'].set()
@@ -134,7 +134,7 @@ class AuthService:
         
         # CHECK PERSISTENT STORAGE
         from services.local_storage import LocalStorage
-        existing_users = LocalStorage.load_all_users()
+        existing_users = LocalStorage.load_all_users(refresh=True)
 
         #Debug
         st.write("DEBUG: Existing users:", list(existing_users.keys()))
@@ -171,10 +171,10 @@ class AuthService:
         st.write("🔍 BEFORE SAVE - Users to save:", list(existing_users.keys()))
         
         try:
-            LocalStorage.save_all_users(existing_users)
-            st.success("✅ save_all_users() completed")
+            LocalStorage.save_user(email, user_data)
+            st.success("✅ save_user() completed")
         except Exception as e:
-            st.error(f"❌ save_all_users() failed: {e}")
+            st.error(f"❌ save_user() failed: {e}")
         
         # Verify it saved
         loaded = LocalStorage.load_all_users()
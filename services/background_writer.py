@@ -0,0 +1,213 @@
+import os
+import time
+import atexit
+import threading
+from collections import OrderedDict
+
+from services.storage_journal import RecordJournal
+
+
+class BackgroundWriter:
+    """
+    Optional write-behind queue for user-data saves
+
+    With STORAGE_BACKGROUND_WRITES=true, DataSecurity.save_user_data hands a
+    snapshot of the collection to this queue and returns immediately; one
+    worker thread serializes and writes it. Pending saves are keyed by
+    (email, data_type): a newer snapshot of a key that is still queued
+    replaces the older one (last write wins) but keeps the older base, which
+    is what the stored collection was derived from. Reads of a key that is
+    queued or being written are served from its snapshot. The queue is
+    bounded (MAX_PENDING keys; submit() waits for room) and drained at
+    interpreter exit.
+
+    A failed write is retried up to MAX_RETRIES times in all, waiting
+    RETRY_DELAY seconds before the first retry and twice as long before
+    each next one; other keys are written meanwhile. A save that still
+    fails is dropped and kept in the failed list (counted in stats(),
+    returned by take_failures()) until the key is written successfully.
+    """
+
+    ENABLED = os.getenv('STORAGE_BACKGROUND_WRITES', 'false').lower() == 'true'
+
+    MAX_PENDING = 256
+    MAX_RETRIES = 3
+    RETRY_DELAY = 0.5
+    SHUTDOWN_TIMEOUT = 30.0
+
+    _pending = OrderedDict()    # key -> {'data', 'base', 'write', 'submitted', 'attempts', 'retry_at'}
+    _in_flight = {}             # key -> entry being written
+    _failed = OrderedDict()     # key -> {'error', 'attempts', 'failed_at'} of dropped saves
+    _condition = threading.Condition()
+    _worker = None
+    _stats = {
+        'submitted': 0, 'coalesced': 0, 'written': 0, 'errors': 0, 'dropped': 0,
+        'max_depth': 0, 'write_total': 0.0, 'write_max': 0.0, 'write_last': 0.0,
+        'lag_max': 0.0, 'enqueue_wait_max': 0.0, 'last_error': None
+    }
+
+    @staticmethod
+    def enabled():
+        return BackgroundWriter.ENABLED
+
+    @staticmethod
+    def submit(key, data, base, write):
+        """
+        Queue write(data, base) for key and return without waiting for it
+
+        data is copied, so the caller may keep mutating its own value.
+        """
+        snapshot = RecordJournal.deep_copy(data)
+        start = time.monotonic()
+
+        with BackgroundWriter._condition:
+            BackgroundWriter._stats['submitted'] += 1
+
+            entry = BackgroundWriter._pending.get(key)
+            if entry is not None:
+                entry['data'] = snapshot
+                entry['write'] = write
+                BackgroundWriter._stats['coalesced'] += 1
+                return
+
+            while len(BackgroundWriter._pending) >= BackgroundWriter.MAX_PENDING:
+                BackgroundWriter._condition.wait()
+            BackgroundWriter._stats['enqueue_wait_max'] = max(
+                BackgroundWriter._stats['enqueue_wait_max'], time.monotonic() - start
+            )
+
+            BackgroundWriter._pending[key] = {
+                'data': snapshot,
+                'base': RecordJournal.deep_copy(base) if base is not None else None,
+                'write': write,
+                'submitted': time.monotonic(),
+                'attempts': 0,
+                'retry_at': 0.0
+            }
+            BackgroundWriter._stats['max_depth'] = max(
+                BackgroundWriter._stats['max_depth'], len(BackgroundWriter._pending)
+            )
+
+            if BackgroundWriter._worker is None or not BackgroundWriter._worker.is_alive():
+                BackgroundWriter._worker = threading.Thread(
+                    target=BackgroundWriter._run, name='storage-background-writer', daemon=True
+                )
+                BackgroundWriter._worker.start()
+            BackgroundWriter._condition.notify_all()
+
+    @staticmethod
+    def pending(key):
+        """Private copy of the newest not-yet-written snapshot of key, or None"""
+        with BackgroundWriter._condition:
+            entry = BackgroundWriter._pending.get(key) or BackgroundWriter._in_flight.get(key)
+            if entry is None:
+                return None
+            data = entry['data']
+        return RecordJournal.deep_copy(data)
+
+    @staticmethod
+    def _next_ready():
+        """Oldest queued key not waiting out a retry delay, or None; caller holds _condition"""
+        now = time.monotonic()
+        for key, entry in BackgroundWriter._pending.items():
+            if entry['retry_at'] <= now:
+                return key
+        return None
+
+    @staticmethod
+    def _run():
+        """Write queued snapshots one at a time, oldest key first"""
+        while True:
+            with BackgroundWriter._condition:
+                key = BackgroundWriter._next_ready()
+                while key is None:
+                    if not BackgroundWriter._pending:
+                        if not BackgroundWriter._condition.wait(timeout=30):
+                            BackgroundWriter._worker = None
+                            return
+                    else:
+                        retry_at = min(entry['retry_at'] for entry in BackgroundWriter._pending.values())
+                        BackgroundWriter._condition.wait(max(retry_at - time.monotonic(), 0.0))
+                    key = BackgroundWriter._next_ready()
+
+                entry = BackgroundWriter._pending.pop(key)
+                BackgroundWriter._in_flight[key] = entry
+                BackgroundWriter._condition.notify_all()
+
+            start = time.monotonic()
+            error = None
+            try:
+                entry['write'](entry['data'], entry['base'])
+            except Exception as e:
+                error = e
+            finished = time.monotonic()
+
+            with BackgroundWriter._condition:
+                del BackgroundWriter._in_flight[key]
+                stats = BackgroundWriter._stats
+
+                if error is None:
+                    stats['written'] += 1
+                    stats['write_last'] = finished - start
+                    stats['write_total'] += finished - start
+                    stats['write_max'] = max(stats['write_max'], finished - start)
+                    stats['lag_max'] = max(stats['lag_max'], finished - entry['submitted'])
+                    BackgroundWriter._failed.pop(key, None)
+                else:
+                    stats['errors'] += 1
+                    stats['last_error'] = f"{key}: {error}"
+                    entry['attempts'] += 1
+                    # Retry after a growing delay unless a newer snapshot was queued meanwhile
+                    if key not in BackgroundWriter._pending and entry['attempts'] < BackgroundWriter.MAX_RETRIES:
+                        entry['retry_at'] = finished + BackgroundWriter.RETRY_DELAY * 2 ** (entry['attempts'] - 1)
+                        BackgroundWriter._pending[key] = entry
+                    elif key not in BackgroundWriter._pending:
+                        stats['dropped'] += 1
+                        BackgroundWriter._failed[key] = {
+                            'error': str(error), 'attempts': entry['attempts'], 'failed_at': time.time()
+                        }
+                    else:
+                        # The newer snapshot was derived from the same base
+                        BackgroundWriter._pending[key]['base'] = entry['base']
+
+                BackgroundWriter._condition.notify_all()
+
+    @staticmethod
+    def flush(timeout=None):
+        """Block until every queued save is written; False if timeout expired first"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+
+        with BackgroundWriter._condition:
+            while BackgroundWriter._pending or BackgroundWriter._in_flight:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                BackgroundWriter._condition.wait(remaining)
+        return True
+
+    @staticmethod
+    def take_failures(owner):
+        """
+        Dropped saves whose key starts with owner (the email, for the
+        (email, data_type) keys DataSecurity queues), as {key: failure};
+        they are removed from the failed list
+        """
+        with BackgroundWriter._condition:
+            keys = [key for key in BackgroundWriter._failed if key[0] == owner]
+            return {key: BackgroundWriter._failed.pop(key) for key in keys}
+
+    @staticmethod
+    def stats():
+        """Queue depth, dropped saves not yet rewritten, and write latency/lag (seconds) for this process"""
+        with BackgroundWriter._condition:
+            stats = dict(BackgroundWriter._stats)
+            stats['queue_depth'] = len(BackgroundWriter._pending)
+            stats['in_flight'] = len(BackgroundWriter._in_flight)
+            stats['failed'] = len(BackgroundWriter._failed)
+        stats['write_avg'] = stats['write_total'] / stats['written'] if stats['written'] else 0.0
+        return stats
+
+
+@atexit.register
+def _flush_on_exit():
+    BackgroundWriter.flush(BackgroundWriter.SHUTDOWN_TIMEOUT)
@@ -0,0 +1,600 @@
+import os
+import json
+import uuid
+import zlib
+import shutil
+import hashlib
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timedelta
+
+from services.analysis_cache import AnalysisCache
+from services.atomic_io import AtomicFile
+from services.blob_store import BlobStore
+from services.compression import Compression
+from services.file_lock import FileLock
+
+
+class BackupEngine:
+    """
+    Incremental, content-addressed backups of tenant directories
+
+    Structure:
+    backups/
+    ├── chunks/3f/3fa2…                     ← Compressed chunk, stored once
+    └── catalog/
+        └── 9b1c…/                          ← SHA-256 of the tenant's email
+            └── 20241001-020000-000000.json ← Snapshot manifest
+
+    Each manifest lists every file of the tenant with the chunks that make
+    it up, so any snapshot restores on its own. A run only reads files whose
+    size/mtime changed since the previous snapshot and only stores chunks
+    not already in the store. Collection files are chunked on their
+    decompressed content at content-defined line boundaries, so changing a
+    few records stores only the chunks around them; documents are stored
+    in fixed-size chunks (blobs never change once written). Manifests
+    record their owner and are only listed or restored for that email.
+    """
+
+    BACKUP_DIR = os.getenv('STORAGE_BACKUP_DIR', 'backups')
+    CHUNKS_DIR = "chunks"
+    CATALOG_DIR = "catalog"
+
+    # Raw files (documents) are cut every CHUNK_SIZE bytes
+    CHUNK_SIZE = 4 * 1024 * 1024
+
+    # Collection files are cut after a line whose crc32 matches the mask,
+    # giving ~64 KB chunks that survive records being inserted or removed
+    TEXT_CHUNK_MIN = 8 * 1024
+    TEXT_CHUNK_MAX = 256 * 1024
+    TEXT_BOUNDARY_MASK = 0x7FF
+
+    # Chunks younger than this are never garbage-collected (a backup may
+    # have written them without having saved its manifest yet)
+    GC_GRACE_SECONDS = 3600
+
+    @staticmethod
+    def tenant_key(user_email):
+        """Catalog directory name of a tenant (distinct for every email, unlike its data directory name)"""
+        return hashlib.sha256(user_email.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def migrate_catalog(user_email):
+        """
+        Move a tenant's manifests out of a catalog keyed by its data directory name
+
+        Catalogs used to share the tenant directory's name; they are moved
+        when the tenant directories are sharded (TenantRegistry.migrate) or
+        the first time a tenant's snapshots are listed. Returns how many.
+        """
+        from services.tenant_registry import TenantRegistry
+
+        legacy_dir = BackupEngine.catalog_directory(TenantRegistry.safe_name(user_email))
+        if not os.path.isdir(legacy_dir):
+            return 0
+
+        moved = 0
+        tenant = BackupEngine.tenant_key(user_email)
+        catalog_dir = BackupEngine.catalog_directory(tenant)
+        legacy = os.path.basename(legacy_dir)
+        for name in sorted(os.listdir(legacy_dir)):
+            if not name.endswith(".json") or name.startswith("."):
+                continue
+            # Another email with the same directory name shared this catalog
+            manifest = BackupEngine.load_manifest(legacy, name[:-len(".json")])
+            if manifest.get('owner') != user_email:
+                continue
+            os.makedirs(catalog_dir, exist_ok=True)
+            os.replace(os.path.join(legacy_dir, name), os.path.join(catalog_dir, name))
+            moved += 1
+
+        if not os.listdir(legacy_dir):
+            os.rmdir(legacy_dir)
+        return moved
+
+    @staticmethod
+    def chunk_path(chunk_hash):
+        return os.path.join(BackupEngine.BACKUP_DIR, BackupEngine.CHUNKS_DIR, chunk_hash[:2], chunk_hash)
+
+    @staticmethod
+    def catalog_directory(tenant):
+        return os.path.join(BackupEngine.BACKUP_DIR, BackupEngine.CATALOG_DIR, tenant)
+
+    @staticmethod
+    def _split_text(content):
+        """Content-defined chunks of text: cut after lines whose checksum hits the mask"""
+        chunks = []
+        start = 0
+        position = 0
+        for line in content.splitlines(keepends=True):
+            position += len(line)
+            size = position - start
+            if size >= BackupEngine.TEXT_CHUNK_MAX or (
+                size >= BackupEngine.TEXT_CHUNK_MIN and zlib.crc32(line) & BackupEngine.TEXT_BOUNDARY_MASK == 0
+            ):
+                chunks.append(content[start:position])
+                start = position
+
+        if start < len(content):
+            chunks.append(content[start:])
+        return chunks
+
+    @staticmethod
+    def _iter_raw(path):
+        with open(path, 'rb') as f:
+            while True:
+                chunk = f.read(BackupEngine.CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    @staticmethod
+    def _store_chunk(chunk, stats):
+        """Store a chunk unless present; returns its hash"""
+        chunk_hash = hashlib.sha256(chunk).hexdigest()
+        path = BackupEngine.chunk_path(chunk_hash)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # A raw chunk that happens to start with the compression header
+            # (e.g. a compressed blob) is wrapped so reads stay unambiguous
+            if Compression.should_compress(chunk):
+                payload = Compression.compress_bytes(chunk)
+            elif Compression.needs_header(chunk):
+                payload = Compression.compress_bytes(chunk, Compression.STORED)
+            else:
+                payload = chunk
+            AtomicFile.write_bytes(path, payload)
+            stats['new_chunks'] += 1
+            stats['new_bytes'] += len(payload)
+        return chunk_hash
+
+    @staticmethod
+    def _read_chunk(chunk_hash):
+        data = Compression.read_file(BackupEngine.chunk_path(chunk_hash))
+        if hashlib.sha256(data).hexdigest() != chunk_hash:
+            raise ValueError(f"Backup chunk is corrupt: {chunk_hash}")
+        return data
+
+    @staticmethod
+    def _file_groups(tenant_dir):
+        """
+        (lock_name, [relative paths]) per top-level entry of a tenant
+
+        A collection's snapshot, journal and segment directory share the
+        lock name <data_type>, so each group is read as one version.
+        """
+        groups = {}
+        for entry in sorted(os.scandir(tenant_dir), key=lambda e: e.name):
+            name = entry.name
+            if name.endswith(".lock") or name.endswith(".tmp"):
+                continue
+            if name == AnalysisCache.CACHE_DIR:
+                continue    # Derived from the documents; rebuilt on demand after a restore
+
+            if entry.is_dir(follow_symlinks=False):
+                paths = []
+                for root, dirs, files in os.walk(entry.path):
+                    dirs.sort()
+                    for file_name in sorted(files):
+                        if not file_name.endswith(".tmp") and not file_name.endswith(".lock"):
+                            paths.append(os.path.relpath(os.path.join(root, file_name), tenant_dir))
+                lock_name = None if name == "documents" else name
+            else:
+                paths = [name]
+                lock_name = os.path.splitext(name)[0]
+
+            groups.setdefault(lock_name if lock_name is not None else name, (lock_name, []))[1].extend(paths)
+
+        return list(groups.values())
+
+    @staticmethod
+    def _backup_file(tenant_dir, relative_path, previous, stats):
+        """Manifest entry for one file, reusing the previous entry when unchanged"""
+        path = os.path.join(tenant_dir, relative_path)
+        file_stat = os.stat(path)
+        old = previous.get(relative_path.replace(os.sep, '/'))
+        if old is not None and old['size'] == file_stat.st_size and old['mtime_ns'] == file_stat.st_mtime_ns:
+            return old
+
+        # Documents are stored as-is; collection files by their decompressed content
+        raw = relative_path.split(os.sep, 1)[0] == "documents"
+        if raw:
+            chunks = BackupEngine._iter_raw(path)
+            compressed = False
+        else:
+            with open(path, 'rb') as f:
+                compressed = Compression.is_compressed(f.read(len(Compression.MAGIC)))
+            chunks = BackupEngine._split_text(Compression.read_file(path))
+
+        chunk_refs = []
+        for chunk in chunks:
+            chunk_refs.append([BackupEngine._store_chunk(chunk, stats), len(chunk)])
+            stats['read_bytes'] += len(chunk)
+
+        stats['changed_files'] += 1
+        return {
+            'size': file_stat.st_size,
+            'mtime_ns': file_stat.st_mtime_ns,
+            'raw': raw,
+            'compressed': compressed,
+            'chunks': chunk_refs
+        }
+
+    @staticmethod
+    def backup(user_email):
+        """Take an incremental snapshot of a tenant; returns its catalog summary"""
+        from services.local_storage import LocalStorage
+
+        started = datetime.now()
+        tenant_dir = LocalStorage.get_user_directory(user_email)
+        tenant = BackupEngine.tenant_key(user_email)
+
+        parent = BackupEngine.latest_snapshot(user_email)
+        previous = BackupEngine._owned_manifest(user_email, parent['snapshot_id'])['files'] if parent else {}
+
+        stats = {'files': 0, 'changed_files': 0, 'new_chunks': 0, 'new_bytes': 0, 'read_bytes': 0, 'logical_bytes': 0}
+        files = {}
+        for lock_name, paths in BackupEngine._file_groups(tenant_dir):
+            if lock_name is None:
+                entries = [(p, BackupEngine._backup_file(tenant_dir, p, previous, stats)) for p in paths]
+            else:
+                with FileLock.shared(LocalStorage.lock_path(user_email, lock_name)):
+                    entries = [(p, BackupEngine._backup_file(tenant_dir, p, previous, stats)) for p in paths]
+
+            for relative_path, entry in entries:
+                files[relative_path.replace(os.sep, '/')] = entry
+                stats['files'] += 1
+                stats['logical_bytes'] += sum(length for _, length in entry['chunks'])
+
+        snapshot_id = started.strftime('%Y%m%d-%H%M%S-%f')
+        stats['seconds'] = (datetime.now() - started).total_seconds()
+        manifest = {
+            'tenant': tenant,
+            'owner': user_email,
+            'snapshot_id': snapshot_id,
+            'created': started.isoformat(),
+            'parent': parent['snapshot_id'] if parent else None,
+            'stats': stats,
+            'files': files
+        }
+
+        catalog_dir = BackupEngine.catalog_directory(tenant)
+        os.makedirs(catalog_dir, exist_ok=True)
+        payload = json.dumps(manifest).encode('utf-8')
+        if Compression.should_compress(payload):
+            payload = Compression.compress_bytes(payload)
+        AtomicFile.write_bytes(os.path.join(catalog_dir, f"{snapshot_id}.json"), payload)
+
+        return BackupEngine._summary(manifest)
+
+    @staticmethod
+    def _summary(manifest):
+        return {key: manifest[key] for key in ('snapshot_id', 'created', 'parent', 'stats')}
+
+    @staticmethod
+    def load_manifest(tenant, snapshot_id):
+        path = os.path.join(BackupEngine.catalog_directory(tenant), f"{snapshot_id}.json")
+        return json.loads(Compression.read_file(path))
+
+    @staticmethod
+    def _owned_manifest(user_email, snapshot_id):
+        """A tenant's manifest; raises PermissionError if it belongs to another email"""
+        manifest = BackupEngine.load_manifest(BackupEngine.tenant_key(user_email), snapshot_id)
+        if manifest.get('owner') != user_email:
+            raise PermissionError(f"Backup {snapshot_id} does not belong to {user_email}")
+        return manifest
+
+    @staticmethod
+    def list_snapshots(user_email):
+        """Snapshot summaries for a tenant, oldest first (manifests of other owners are skipped)"""
+        BackupEngine.migrate_catalog(user_email)
+
+        tenant = BackupEngine.tenant_key(user_email)
+        catalog_dir = BackupEngine.catalog_directory(tenant)
+        if not os.path.isdir(catalog_dir):
+            return []
+
+        snapshots = []
+        for name in sorted(os.listdir(catalog_dir)):
+            if name.endswith(".json") and not name.startswith("."):
+                manifest = BackupEngine.load_manifest(tenant, name[:-len(".json")])
+                if manifest.get('owner') == user_email:
+                    snapshots.append(BackupEngine._summary(manifest))
+        return snapshots
+
+    @staticmethod
+    def latest_snapshot(user_email, timestamp=None):
+        """Newest snapshot taken at or before timestamp (datetime or ISO string), or None"""
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+
+        latest = None
+        for snapshot in BackupEngine.list_snapshots(user_email):
+            if timestamp is None or datetime.fromisoformat(snapshot['created']) <= timestamp:
+                latest = snapshot
+        return latest
+
+    @staticmethod
+    def backup_if_due(user_email, interval_hours=6):
+        """Back up unless the newest snapshot is younger than interval_hours; returns the summary or None"""
+        latest = BackupEngine.latest_snapshot(user_email)
+        if latest and datetime.now() - datetime.fromisoformat(latest['created']) < timedelta(hours=interval_hours):
+            return None
+        return BackupEngine.backup(user_email)
+
+    @staticmethod
+    def _write_file(path, entry):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if entry['raw']:
+            with open(path, 'wb') as f:
+                for chunk_hash, _ in entry['chunks']:
+                    f.write(BackupEngine._read_chunk(chunk_hash))
+            return
+
+        content = b''.join(BackupEngine._read_chunk(chunk_hash) for chunk_hash, _ in entry['chunks'])
+        if entry['compressed']:
+            content = Compression.compress_bytes(content)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    @staticmethod
+    def restore(user_email, timestamp=None, target_dir=None, keep_previous=False):
+        """
+        Reconstruct a tenant as of its newest snapshot at or before timestamp
+
+        Without target_dir the tenant directory is replaced: the snapshot is
+        rebuilt next to it and swapped in, so a failed restore leaves the
+        current data untouched. The swap waits for this process's queued
+        background saves and holds every collection lock of the tenant and
+        its documents index lock, so no save lands in the replaced
+        directory or half-way through the swap; sessions still open on the
+        tenant should drop their copies of its collections afterwards
+        (SessionUnitOfWork.discard). With
+        keep_previous the replaced directory is kept as
+        .pre-restore-<tenant>-<time>. Returns the restored snapshot summary.
+        """
+        from services.local_storage import LocalStorage
+
+        snapshot = BackupEngine.latest_snapshot(user_email, timestamp)
+        if snapshot is None:
+            raise FileNotFoundError(f"No backup of {user_email} at or before {timestamp}")
+
+        tenant_dir = LocalStorage.get_user_directory(user_email)
+        tenant = os.path.basename(tenant_dir)
+        manifest = BackupEngine._owned_manifest(user_email, snapshot['snapshot_id'])
+
+        staging_dir = target_dir or os.path.join(LocalStorage.DATA_DIR, f".restore-{tenant}-{uuid.uuid4().hex}")
+        os.makedirs(staging_dir, exist_ok=True)
+        try:
+            for relative_path, entry in manifest['files'].items():
+                BackupEngine._write_file(os.path.join(staging_dir, *relative_path.split('/')), entry)
+        except Exception:
+            if target_dir is None:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+
+        if target_dir is None:
+            previous_dir = os.path.join(
+                LocalStorage.DATA_DIR, f".pre-restore-{tenant}-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            )
+            with BackupEngine._quiesced(user_email, tenant_dir, manifest):
+                os.replace(tenant_dir, previous_dir)
+                os.replace(staging_dir, tenant_dir)
+            if not keep_previous:
+                shutil.rmtree(previous_dir, ignore_errors=True)
+            BackupEngine._forget_cached_state()
+            # The restored usage.json bypassed the ledger: recount it (and the organization aggregate)
+            LocalStorage.reconcile_usage(user_email)
+
+        return snapshot
+
+    @staticmethod
+    @contextmanager
+    def _quiesced(user_email, tenant_dir, manifest):
+        """Hold off saves to a tenant: drain queued background saves, then hold every collection and index lock"""
+        from services.local_storage import LocalStorage
+        from services.background_writer import BackgroundWriter
+
+        if not BackgroundWriter.flush(FileLock.LOCK_TIMEOUT):
+            raise TimeoutError(f"Queued saves of {user_email} did not finish; restore not started")
+
+        lock_names = {name[:-len(".lock")] for name in os.listdir(tenant_dir) if name.endswith(".lock")}
+        lock_names.update(
+            os.path.splitext(relative_path.split('/', 1)[0])[0]
+            for relative_path in manifest['files'] if not relative_path.startswith("documents/")
+        )
+        with ExitStack() as stack:
+            # Always taken in the same order, so two restores cannot deadlock
+            for lock_name in sorted(lock_names):
+                stack.enter_context(FileLock.exclusive(LocalStorage.lock_path(user_email, lock_name)))
+            docs_dir = os.path.join(tenant_dir, LocalStorage.DOCUMENTS_DIR)
+            if os.path.isdir(docs_dir):
+                stack.enter_context(FileLock.exclusive(BlobStore.lock_path(docs_dir)))
+            yield
+
+    @staticmethod
+    def _forget_cached_state():
+        """Drop in-process caches that describe the replaced directory"""
+        from services.local_storage import LocalStorage
+        from services.storage_cache import UserDataCache
+        from services.storage_journal import RecordJournal
+        from services.storage_partitions import PartitionedCollection
+
+        UserDataCache.clear()
+        RecordJournal.forget_all()
+        with PartitionedCollection._lock:
+            PartitionedCollection._baselines.clear()
+        LocalStorage.forget_directories()
+
+    @staticmethod
+    def prune(user_email, keep_last=None, older_than_days=None):
+        """Delete old snapshots of a tenant (the newest is always kept); returns how many"""
+        snapshots = BackupEngine.list_snapshots(user_email)
+        if not snapshots:
+            return 0
+
+        doomed = snapshots[:-1]
+        if keep_last is not None:
+            doomed = snapshots[:max(len(snapshots) - max(keep_last, 1), 0)]
+        if older_than_days is not None:
+            cutoff = datetime.now() - timedelta(days=older_than_days)
+            doomed = [s for s in doomed if datetime.fromisoformat(s['created']) < cutoff]
+
+        catalog_dir = BackupEngine.catalog_directory(BackupEngine.tenant_key(user_email))
+        for snapshot in doomed:
+            os.remove(os.path.join(catalog_dir, f"{snapshot['snapshot_id']}.json"))
+        return len(doomed)
+
+    @staticmethod
+    def collect_garbage():
+        """Delete chunks no snapshot references; returns (chunks, bytes) freed"""
+        catalog_root = os.path.join(BackupEngine.BACKUP_DIR, BackupEngine.CATALOG_DIR)
+        live = set()
+        if os.path.isdir(catalog_root):
+            for tenant in os.listdir(catalog_root):
+                for name in os.listdir(os.path.join(catalog_root, tenant)):
+                    if name.endswith(".json") and not name.startswith("."):
+                        manifest = BackupEngine.load_manifest(tenant, name[:-len(".json")])
+                        for entry in manifest['files'].values():
+                            live.update(chunk_hash for chunk_hash, _ in entry['chunks'])
+
+        chunks_root = os.path.join(BackupEngine.BACKUP_DIR, BackupEngine.CHUNKS_DIR)
+        cutoff = datetime.now().timestamp() - BackupEngine.GC_GRACE_SECONDS
+        freed = [0, 0]
+        if os.path.isdir(chunks_root):
+            for prefix in os.scandir(chunks_root):
+                for entry in os.scandir(prefix.path):
+                    if entry.name in live or entry.name.startswith("."):
+                        continue
+                    entry_stat = entry.stat()
+                    if entry_stat.st_mtime > cutoff:
+                        continue
+                    os.remove(entry.path)
+                    freed[0] += 1
+                    freed[1] += entry_stat.st_size
+        return tuple(freed)
+
+
+def benchmark(total_mb=1024, changed_ratio=0.01, document_mb=4):
+    """Full and incremental backup cost for a tenant with total_mb of documents"""
+    import time
+    import random
+    import tempfile
+    from services.local_storage import LocalStorage
+
+    original = (LocalStorage.DATA_DIR, BackupEngine.BACKUP_DIR)
+    tmp_dir = tempfile.mkdtemp()
+    email = "backup-bench@example.com"
+    rng = random.Random(1)
+    results = []
+
+    def timed_backup(label):
+        start = time.perf_counter()
+        summary = BackupEngine.backup(email)
+        results.append((label, time.perf_counter() - start, summary['stats']))
+
+    try:
+        LocalStorage.DATA_DIR = os.path.join(tmp_dir, 'user_data')
+        BackupEngine.BACKUP_DIR = os.path.join(tmp_dir, 'backups')
+
+        document_count = max(int(total_mb / document_mb), 1)
+        for i in range(document_count):
+            LocalStorage.save_document(email, f"DOC{i:05d}", rng.randbytes(document_mb * 1024 * 1024), f"file{i}.pdf", "application/pdf")
+        matters = [{'id': f"M{i:05d}", 'name': f"Matter {i}", 'status': 'Active'} for i in range(2000)]
+        entries = [{'id': f"T{i:06d}", 'date': f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", 'hours': 1.5,
+                    'description': f"Reviewed file {i}"} for i in range(20000)]
+        LocalStorage.save_user_data(email, 'matters', matters)
+        LocalStorage.save_user_data(email, 'time_entries', entries)
+
+        timed_backup('full')
+        timed_backup('unchanged')
+
+        # Change ~changed_ratio of the documents and of the records
+        changed_docs = max(int(document_count * changed_ratio), 1)
+        for i in rng.sample(range(document_count), changed_docs):
+            LocalStorage.delete_document(email, f"DOC{i:05d}", f"file{i}.pdf")
+            LocalStorage.save_document(email, f"DOC{i:05d}", rng.randbytes(document_mb * 1024 * 1024), f"file{i}.pdf", "application/pdf")
+        for i in rng.sample(range(len(entries)), int(len(entries) * changed_ratio)):
+            entries[i] = dict(entries[i], hours=2.0)
+        for i in rng.sample(range(len(matters)), int(len(matters) * changed_ratio)):
+            matters[i] = dict(matters[i], status='Closed')
+        LocalStorage.save_user_data(email, 'matters', matters)
+        LocalStorage.save_user_data(email, 'time_entries', entries)
+
+        timed_backup(f"{changed_ratio:.0%} changed")
+
+        start = time.perf_counter()
+        BackupEngine.restore(email, target_dir=os.path.join(tmp_dir, 'restored'))
+        results.append(('restore', time.perf_counter() - start, None))
+    finally:
+        LocalStorage.DATA_DIR, BackupEngine.BACKUP_DIR = original
+        BackupEngine._forget_cached_state()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Incremental tenant backups")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    backup_parser = subparsers.add_parser('backup', help="Snapshot tenants (all under user_data by default)")
+    backup_parser.add_argument('emails', nargs='*')
+    backup_parser.add_argument('--if-older-than', type=float, metavar='HOURS', help="Skip tenants backed up more recently")
+
+    list_parser = subparsers.add_parser('list', help="List a tenant's snapshots")
+    list_parser.add_argument('email')
+
+    restore_parser = subparsers.add_parser('restore', help="Restore a tenant as of a point in time")
+    restore_parser.add_argument('email')
+    restore_parser.add_argument('timestamp', nargs='?', help="ISO time; newest snapshot when omitted")
+    restore_parser.add_argument('--target-dir', help="Restore into this directory instead of replacing the tenant")
+
+    prune_parser = subparsers.add_parser('prune', help="Drop old snapshots and unreferenced chunks")
+    prune_parser.add_argument('email')
+    prune_parser.add_argument('--keep-last', type=int)
+    prune_parser.add_argument('--older-than-days', type=float)
+
+    bench_parser = subparsers.add_parser('benchmark', help="Measure full vs incremental backup cost")
+    bench_parser.add_argument('--total-mb', type=int, default=1024)
+    bench_parser.add_argument('--changed', type=float, default=0.01)
+
+    args = parser.parse_args()
+
+    if args.command == 'backup':
+        from services.local_storage import LocalStorage
+
+        emails = args.emails or sorted(LocalStorage.list_tenants())
+
+        for email in emails:
+            if args.if_older_than is not None:
+                summary = BackupEngine.backup_if_due(email, args.if_older_than)
+            else:
+                summary = BackupEngine.backup(email)
+            if summary is None:
+                print(f"{email}: up to date")
+            else:
+                stats = summary['stats']
+                print(f"{email}: {summary['snapshot_id']} {stats['changed_files']}/{stats['files']} files changed, "
+                      f"{stats['new_bytes'] / (1024 * 1024):.1f} MB stored in {stats['seconds']:.1f}s")
+    elif args.command == 'list':
+        for snapshot in BackupEngine.list_snapshots(args.email):
+            stats = snapshot['stats']
+            print(f"{snapshot['snapshot_id']}  {snapshot['created']}  files={stats['files']} "
+                  f"changed={stats['changed_files']} stored={stats['new_bytes']}")
+    elif args.command == 'restore':
+        snapshot = BackupEngine.restore(args.email, args.timestamp, target_dir=args.target_dir)
+        print(f"Restored {args.email} from {snapshot['snapshot_id']} ({snapshot['created']})")
+    elif args.command == 'prune':
+        removed = BackupEngine.prune(args.email, args.keep_last, args.older_than_days)
+        chunks, freed = BackupEngine.collect_garbage()
+        print(f"Removed {removed} snapshots and {chunks} chunks ({freed / (1024 * 1024):.1f} MB)")
+    else:
+        print(f"{'run':<12} {'seconds':>8} {'files':>6} {'changed':>8} {'read MB':>8} {'stored MB':>10}")
+        for label, seconds, stats in benchmark(args.total_mb, args.changed):
+            if stats is None:
+                print(f"{label:<12} {seconds:>8.2f}")
+                continue
+            print(f"{label:<12} {seconds:>8.2f} {stats['files']:>6} {stats['changed_files']:>8} "
+                  f"{stats['read_bytes'] / (1024 * 1024):>8.1f} {stats['new_bytes'] / (1024 * 1024):>10.2f}")
@@ -0,0 +1,526 @@
+import os
+import copy
+import json
+import hashlib
+import itertools
+import threading
+from datetime import datetime
+
+from services.atomic_io import AtomicFile
+from services.compression import Compression
+from services.file_lock import FileLock
+
+
+class BlobStore:
+    """
+    Content-addressed, deduplicating store for a user's document files
+
+    Structure:
+    user_data/
+    └── user_at_email_com/
+        └── documents/
+            ├── index.json              ← Manifest: document_id → blob, refcounts, totals
+            ├── index.lock              ← Serializes index updates and blob removal
+            └── blobs/
+                └── 3f/a2/3fa2...e9     ← SHA-256 of the raw bytes
+
+    Identical bytes uploaded for several documents (or re-uploaded as a new
+    version) are stored once; a blob is removed when its last document is.
+    Blobs may be stored compressed (see Compression); read them through
+    Compression.read_file/open_file. Every read-modify-write of the index,
+    and publishing or removing a blob together with its refcount, happens
+    under an exclusive lock on index.lock, so concurrent uploads and
+    deletes neither lose index updates nor remove a blob that a new
+    document has just been pointed at. The parsed index is kept in memory
+    until index.json changes on disk, so lookups (resolve, usage,
+    list_documents) do not re-read it.
+    """
+
+    BLOBS_DIR = "blobs"
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+    CHUNK_SIZE = 1024 * 1024
+
+    _cache = {}     # index path -> (disk state, index)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def content_hash(data):
+        """SHA-256 of raw bytes"""
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def blob_path(docs_dir, content_hash):
+        """Two-level sharded path for a blob"""
+        return os.path.join(docs_dir, BlobStore.BLOBS_DIR, content_hash[:2], content_hash[2:4], content_hash)
+
+    @staticmethod
+    def _empty_index():
+        """Index for a documents directory with nothing in it"""
+        return {
+            'documents': {},
+            'refs': {},
+            'legacy': {},
+            'totals': {'documents': 0, 'bytes': 0, 'stored_bytes': 0}
+        }
+
+    @staticmethod
+    def lock_path(docs_dir):
+        return os.path.join(docs_dir, BlobStore.LOCK_FILE)
+
+    @staticmethod
+    def _disk_state(path):
+        try:
+            st_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st_result.st_mtime_ns, st_result.st_size, st_result.st_ino)
+
+    @staticmethod
+    def _cached_index(docs_dir):
+        """
+        The document manifest shared by readers (never modify it), parsed
+        again only when index.json changed on disk; rebuilt if missing or
+        from an older format
+        """
+        index_path = os.path.join(docs_dir, BlobStore.INDEX_FILE)
+        state = BlobStore._disk_state(index_path)
+        if state is None:
+            return BlobStore.rebuild_index(docs_dir)
+
+        with BlobStore._lock:
+            cached = BlobStore._cache.get(index_path)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+
+        with open(index_path, 'r') as f:
+            index = json.load(f)
+
+        if 'totals' not in index:
+            return BlobStore.rebuild_index(docs_dir, index)
+
+        with BlobStore._lock:
+            BlobStore._cache[index_path] = (state, index)
+        return index
+
+    @staticmethod
+    def load_index(docs_dir):
+        """Load the document manifest (a private copy for read-modify-write), rebuilding it if needed"""
+        return copy.deepcopy(BlobStore._cached_index(docs_dir))
+
+    @staticmethod
+    def save_index(docs_dir, index):
+        """Persist the index atomically"""
+        index_path = os.path.join(docs_dir, BlobStore.INDEX_FILE)
+        AtomicFile.write_text(index_path, json.dumps(index, indent=2))
+
+        with BlobStore._lock:
+            BlobStore._cache[index_path] = (BlobStore._disk_state(index_path), copy.deepcopy(index))
+
+    @staticmethod
+    def rebuild_index(docs_dir, index=None):
+        """
+        Rebuild the manifest in one os.scandir pass over the documents directory
+
+        Document → blob mappings cannot be recovered from blob names, so
+        existing entries are kept when their blob still exists; refcounts,
+        stored sizes, legacy (pre-blob-store) files and totals are recomputed.
+        """
+        if not os.path.isdir(docs_dir):
+            return BlobStore._empty_index()
+
+        with FileLock.exclusive(BlobStore.lock_path(docs_dir)):
+            return BlobStore._rebuild_index(docs_dir, index)
+
+    @staticmethod
+    def _rebuild_index(docs_dir, index):
+        if index is None:
+            index_path = os.path.join(docs_dir, BlobStore.INDEX_FILE)
+            if os.path.exists(index_path):
+                with open(index_path, 'r') as f:
+                    index = json.load(f)
+            else:
+                index = {}
+
+        rebuilt = BlobStore._empty_index()
+        totals = rebuilt['totals']
+
+        blob_sizes = {}
+        blobs_dir = os.path.join(docs_dir, BlobStore.BLOBS_DIR)
+        if os.path.isdir(blobs_dir):
+            for shard1 in os.scandir(blobs_dir):
+                if not shard1.is_dir():
+                    continue
+                for shard2 in os.scandir(shard1.path):
+                    if not shard2.is_dir():
+                        continue
+                    for blob in os.scandir(shard2.path):
+                        if blob.is_file():
+                            blob_sizes[blob.name] = blob.stat().st_size
+
+        for document_id, entry in index.get('documents', {}).items():
+            content_hash = entry['sha256']
+            if content_hash not in blob_sizes:
+                continue
+
+            entry['stored_size'] = blob_sizes[content_hash]
+            rebuilt['documents'][document_id] = entry
+            if content_hash not in rebuilt['refs']:
+                totals['stored_bytes'] += blob_sizes[content_hash]
+            rebuilt['refs'][content_hash] = rebuilt['refs'].get(content_hash, 0) + 1
+            totals['documents'] += 1
+            totals['bytes'] += entry['size']
+
+        for entry in os.scandir(docs_dir):
+            if entry.name in (BlobStore.INDEX_FILE, BlobStore.LOCK_FILE) or entry.name.startswith('.') or not entry.is_file():
+                continue
+            stat_result = entry.stat()
+            rebuilt['legacy'][entry.name] = {
+                'size': stat_result.st_size,
+                'modified': datetime.fromtimestamp(stat_result.st_mtime).isoformat()
+            }
+            totals['documents'] += 1
+            totals['bytes'] += stat_result.st_size
+            totals['stored_bytes'] += stat_result.st_size
+
+        BlobStore.save_index(docs_dir, rebuilt)
+        return rebuilt
+
+    @staticmethod
+    def _release_entry(docs_dir, index, entry):
+        """Drop one reference to a blob, deleting it when unreferenced (call under the index lock)"""
+        content_hash = entry['sha256']
+        remaining = index['refs'].get(content_hash, 1) - 1
+
+        index['totals']['documents'] -= 1
+        index['totals']['bytes'] -= entry['size']
+
+        if remaining > 0:
+            index['refs'][content_hash] = remaining
+            return
+
+        index['refs'].pop(content_hash, None)
+        index['totals']['stored_bytes'] -= entry.get('stored_size', entry['size'])
+        path = BlobStore.blob_path(docs_dir, content_hash)
+        if os.path.exists(path):
+            os.remove(path)
+
+    @staticmethod
+    def _store_chunks(docs_dir, chunks):
+        """
+        Write chunks to a temp file while hashing
+
+        Only one chunk is held in memory at a time. Compressible content is
+        stored compressed (decided by sniffing the first chunk); the content
+        hash is always of the raw bytes. Returns (temp_path, hash, size,
+        stored_size); _commit moves the temp file to its blob path.
+        """
+        blobs_dir = os.path.join(docs_dir, BlobStore.BLOBS_DIR)
+        os.makedirs(blobs_dir, exist_ok=True)
+
+        chunks = iter(chunks)
+        first = next(chunks, b'')
+        hasher = hashlib.sha256()
+
+        def hashed():
+            for chunk in itertools.chain((first,), chunks):
+                hasher.update(chunk)
+                yield chunk
+
+        temp_path = AtomicFile.temp_path(os.path.join(blobs_dir, 'upload'))
+        try:
+            with open(temp_path, 'wb') as f:
+                if Compression.should_compress(first):
+                    size, stored_size = Compression.write_compressed(f, hashed())
+                elif Compression.needs_header(first):
+                    # Plain content that starts like a compressed file (e.g. an uploaded blob)
+                    size, stored_size = Compression.write_compressed(f, hashed(), Compression.STORED)
+                else:
+                    size = 0
+                    for chunk in hashed():
+                        f.write(chunk)
+                        size += len(chunk)
+                    stored_size = size
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return temp_path, hasher.hexdigest(), size, stored_size
+
+    @staticmethod
+    def _commit(docs_dir, document_id, stored, filename, content_type):
+        """
+        Publish a blob written by _store_chunks and register the document; returns the new totals
+
+        Both happen under the index lock: a concurrent release cannot
+        remove the blob between the existence check and the new reference.
+        """
+        temp_path, content_hash, size, stored_size = stored
+        try:
+            with FileLock.exclusive(BlobStore.lock_path(docs_dir)):
+                path = BlobStore.blob_path(docs_dir, content_hash)
+                if os.path.exists(path):
+                    os.remove(temp_path)
+                    stored_size = os.path.getsize(path)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    AtomicFile.publish(temp_path, path)
+                return BlobStore._register(docs_dir, document_id, content_hash, size, stored_size, filename, content_type)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @staticmethod
+    def _register(docs_dir, document_id, content_hash, size, stored_size, filename, content_type):
+        """Point a document at a blob, releasing any previous version; returns the new totals (call under the index lock)"""
+        index = BlobStore.load_index(docs_dir)
+
+        previous = index['documents'].get(document_id)
+        if previous is not None and previous['sha256'] == content_hash:
+            return dict(index['totals'])
+        if previous is not None:
+            BlobStore._release_entry(docs_dir, index, previous)
+
+        index['documents'][document_id] = {
+            'filename': filename,
+            'content_type': content_type,
+            'sha256': content_hash,
+            'size': size,
+            'stored_size': stored_size,
+            'modified': datetime.now().isoformat()
+        }
+        if content_hash not in index['refs']:
+            index['totals']['stored_bytes'] += stored_size
+        index['refs'][content_hash] = index['refs'].get(content_hash, 0) + 1
+        index['totals']['documents'] += 1
+        index['totals']['bytes'] += size
+        BlobStore.save_index(docs_dir, index)
+        return dict(index['totals'])
+
+    @staticmethod
+    def iter_chunks(fileobj, chunk_size=None):
+        """Yield chunks from a binary file-like object"""
+        chunk_size = chunk_size or BlobStore.CHUNK_SIZE
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    @staticmethod
+    def put(docs_dir, document_id, data, filename, content_type, on_totals=None):
+        """Store bytes for a document; returns the blob path (on_totals receives the new manifest totals)"""
+        view = memoryview(data)
+        chunks = (view[i:i + BlobStore.CHUNK_SIZE] for i in range(0, len(view), BlobStore.CHUNK_SIZE))
+        stored = BlobStore._store_chunks(docs_dir, chunks)
+        totals = BlobStore._commit(docs_dir, document_id, stored, filename, content_type)
+        if on_totals is not None:
+            on_totals(totals)
+        return BlobStore.blob_path(docs_dir, stored[1])
+
+    @staticmethod
+    def put_stream(docs_dir, document_id, fileobj, filename, content_type, on_totals=None):
+        """Store a document from a binary file-like object in chunks; returns the blob path"""
+        stored = BlobStore._store_chunks(docs_dir, BlobStore.iter_chunks(fileobj))
+        totals = BlobStore._commit(docs_dir, document_id, stored, filename, content_type)
+        if on_totals is not None:
+            on_totals(totals)
+        return BlobStore.blob_path(docs_dir, stored[1])
+
+    @staticmethod
+    def resolve(docs_dir, document_id):
+        """Get the blob path for a document, or None if it is not in the store"""
+        entry = BlobStore._cached_index(docs_dir)['documents'].get(document_id)
+        if entry is None:
+            return None
+        return BlobStore.blob_path(docs_dir, entry['sha256'])
+
+    @staticmethod
+    def release(docs_dir, document_id, on_totals=None):
+        """Remove a document from the index; returns False if it was not stored here"""
+        if not os.path.isdir(docs_dir):
+            return False
+
+        with FileLock.exclusive(BlobStore.lock_path(docs_dir)):
+            index = BlobStore.load_index(docs_dir)
+            entry = index['documents'].pop(document_id, None)
+            if entry is None:
+                return False
+
+            BlobStore._release_entry(docs_dir, index, entry)
+            BlobStore.save_index(docs_dir, index)
+        if on_totals is not None:
+            on_totals(dict(index['totals']))
+        return True
+
+    @staticmethod
+    def release_legacy(docs_dir, filename, on_totals=None):
+        """Delete a pre-blob-store file and drop it from the manifest"""
+        path = os.path.join(docs_dir, filename)
+        if not os.path.exists(path):
+            return False
+
+        with FileLock.exclusive(BlobStore.lock_path(docs_dir)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                return False        # Released by another process meanwhile
+            index = BlobStore.load_index(docs_dir)
+            entry = index['legacy'].pop(filename, None)
+            if entry is not None:
+                index['totals']['documents'] -= 1
+                index['totals']['bytes'] -= entry['size']
+                index['totals']['stored_bytes'] -= entry['size']
+                BlobStore.save_index(docs_dir, index)
+        if entry is not None and on_totals is not None:
+            on_totals(dict(index['totals']))
+        return True
+
+    @staticmethod
+    def list_documents(docs_dir):
+        """List stored files from the manifest (no per-file stat calls)"""
+        index = BlobStore._cached_index(docs_dir)
+
+        files = [
+            {
+                'filename': f"{document_id}_{entry['filename']}",
+                'size': entry['size'],
+                'modified': datetime.fromisoformat(entry['modified'])
+            }
+            for document_id, entry in index['documents'].items()
+        ]
+        files.extend(
+            {
+                'filename': filename,
+                'size': entry['size'],
+                'modified': datetime.fromisoformat(entry['modified'])
+            }
+            for filename, entry in index['legacy'].items()
+        )
+        return files
+
+    @staticmethod
+    def usage(docs_dir):
+        """Document count and byte totals straight from the manifest"""
+        return dict(BlobStore._cached_index(docs_dir)['totals'])
+
+    @staticmethod
+    def dedup_stats(docs_dir):
+        """
+        Bytes saved by deduplication and by compression, separately
+
+        logical_bytes counts every document; unique_bytes counts the raw
+        size of each distinct blob once (dedup_ratio = logical / unique);
+        stored_bytes is what the blobs take on disk (compression_ratio =
+        unique / stored). saved_bytes is the sum of both savings.
+        """
+        index = BlobStore._cached_index(docs_dir)
+        totals = index['totals']
+
+        unique_sizes = {entry['sha256']: entry['size'] for entry in index['documents'].values()}
+        unique_bytes = sum(unique_sizes.values()) + sum(entry['size'] for entry in index['legacy'].values())
+
+        return {
+            'documents': totals['documents'],
+            'unique_blobs': len(index['refs']) + len(index['legacy']),
+            'logical_bytes': totals['bytes'],
+            'unique_bytes': unique_bytes,
+            'stored_bytes': totals['stored_bytes'],
+            'dedup_saved_bytes': totals['bytes'] - unique_bytes,
+            'compression_saved_bytes': unique_bytes - totals['stored_bytes'],
+            'saved_bytes': totals['bytes'] - totals['stored_bytes'],
+            'dedup_ratio': totals['bytes'] / unique_bytes if unique_bytes else 1.0,
+            'compression_ratio': unique_bytes / totals['stored_bytes'] if totals['stored_bytes'] else 1.0
+        }
+
+
+def _peak_rss_growth(scenario, docs_dir, size, compressible):
+    """Run one benchmark scenario in a fresh process; returns how far it raised the peak RSS (bytes)"""
+    import io
+    import os
+    import resource
+
+    upload = None
+    if scenario.startswith('upload'):
+        if compressible:
+            data = (b"The Contractor shall deliver the services described in the statement of work. " * (size // 80 + 1))[:size]
+        else:
+            data = os.urandom(size)
+        upload = io.BytesIO(data)    # What Streamlit hands the page: the upload is in memory already
+        del data
+    path = BlobStore.resolve(docs_dir, 'bench')
+
+    # ru_maxrss is in KB on Linux
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    if scenario == 'upload getvalue+put':
+        BlobStore.put(docs_dir, 'upload', upload.getvalue(), 'bench.bin', 'application/octet-stream')
+    elif scenario == 'upload put_stream':
+        BlobStore.put_stream(docs_dir, 'upload', upload, 'bench.bin', 'application/octet-stream')
+    elif scenario == 'download read_file':
+        Compression.read_file(path)
+    elif scenario == 'download open_file':
+        with Compression.open_file(path) as f:
+            for _ in BlobStore.iter_chunks(f):
+                pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 - before
+
+
+def benchmark(size=64 * 1024 * 1024):
+    """
+    Peak RSS added by document uploads and downloads, per code path
+
+    Each scenario runs in its own process so peaks do not carry over, once
+    for compressible text (stored compressed) and once for random bytes
+    (stored as is). 'upload getvalue+put' is the copy-the-upload path
+    put_stream replaced; 'download read_file' is what a download button
+    costs once clicked (st.download_button needs the whole file), against
+    streaming the blob with open_file.
+    """
+    import shutil
+    import tempfile
+    import multiprocessing
+
+    scenarios = ('upload getvalue+put', 'upload put_stream', 'download read_file', 'download open_file')
+    context = multiprocessing.get_context('spawn')
+    tmp_dir = tempfile.mkdtemp()
+    results = []
+    try:
+        for compressible in (True, False):
+            docs_dir = os.path.join(tmp_dir, 'text' if compressible else 'random')
+            os.makedirs(docs_dir)
+            with context.Pool(1) as pool:
+                pool.apply(_peak_rss_growth, ('upload put_stream', docs_dir, size, compressible))
+            index = BlobStore.load_index(docs_dir)
+            index['documents']['bench'] = index['documents'].pop('upload')
+            BlobStore.save_index(docs_dir, index)
+
+            for scenario in scenarios:
+                # A new single-use pool per scenario: a clean process each time
+                with context.Pool(1, maxtasksperchild=1) as pool:
+                    growth = pool.apply(_peak_rss_growth, (scenario, docs_dir, size, compressible))
+                results.append({
+                    'content': 'text' if compressible else 'random',
+                    'scenario': scenario,
+                    'stored_compressed': index['documents']['bench']['stored_size'] < size,
+                    'peak_rss_growth': growth
+                })
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Peak RSS of document upload and download paths")
+    parser.add_argument('--size-mb', type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{args.size_mb}MB document, peak RSS growth per operation")
+    print(f"{'content':<8} {'scenario':<22} {'compressed':>10} {'peak RSS MB':>12}")
+    for row in benchmark(args.size_mb * 1024 * 1024):
+        print(f"{row['content']:<8} {row['scenario']:<22} {str(row['stored_compressed']):>10} "
+              f"{row['peak_rss_growth'] / (1024 * 1024):>12.1f}")
@@ -0,0 +1,350 @@
+import io
+import os
+import lzma
+import zlib
+import struct
+
+
+class Compression:
+    """
+    Transparent at-rest compression for stored files
+
+    Compressed files start with a 13-byte header:
+        MAGIC (4) | codec id (1) | uncompressed size (8, big endian)
+    Files without the header are plain and read back unchanged, so data
+    written before compression was enabled keeps working. Plain content
+    that itself starts with MAGIC is written behind a STORED header (see
+    needs_header), so it is never mistaken for compressed data.
+
+    Decompression never produces more than CHUNK_SIZE bytes per step, nor
+    more than the size recorded in the header.
+    """
+
+    MAGIC = b"\x89LDZ"
+    HEADER = struct.Struct(">4sBQ")
+
+    STORED = 0      # Header + content as is
+    ZLIB = 1
+    LZMA = 2
+    CODECS = {'zlib': ZLIB, 'lzma': LZMA}
+
+    # STORAGE_COMPRESSION=none|zlib|lzma, STORAGE_COMPRESSION_LEVEL=0-9
+    CODEC = os.getenv('STORAGE_COMPRESSION', 'zlib').lower()
+    LEVEL = int(os.getenv('STORAGE_COMPRESSION_LEVEL', '6'))
+
+    # Don't bother below this size; skip content whose sample barely shrinks
+    MIN_SIZE = 4096
+    SAMPLE_SIZE = 64 * 1024
+    MIN_SAVINGS = 0.1
+
+    CHUNK_SIZE = 1024 * 1024
+
+    # Formats that are already compressed (DOCX/XLSX/PPTX are ZIP containers)
+    COMPRESSED_SIGNATURES = (
+        b"%PDF-",               # PDF
+        b"\xff\xd8\xff",        # JPEG
+        b"\x89PNG\r\n\x1a\n",   # PNG
+        b"GIF87a", b"GIF89a",   # GIF
+        b"PK\x03\x04",          # ZIP / Office Open XML
+        b"\x1f\x8b",            # gzip
+        b"BZh",                 # bzip2
+        b"\xfd7zXZ\x00",        # xz
+        b"7z\xbc\xaf\x27\x1c",  # 7-Zip
+        b"Rar!\x1a\x07",        # RAR
+        MAGIC                   # already ours
+    )
+
+    @staticmethod
+    def enabled():
+        """Check if compression is configured"""
+        return Compression.CODEC in Compression.CODECS
+
+    @staticmethod
+    def is_compressed(prefix):
+        """Check if data starts with our header"""
+        return prefix[:len(Compression.MAGIC)] == Compression.MAGIC
+
+    @staticmethod
+    def needs_header(prefix):
+        """Whether plain content must be written with a STORED header (it starts like a compressed file)"""
+        return Compression.is_compressed(bytes(prefix[:len(Compression.MAGIC)]))
+
+    @staticmethod
+    def should_compress(sample, size=None):
+        """Sniff a leading sample to decide whether compressing is worthwhile"""
+        if not Compression.enabled():
+            return False
+        if (size if size is not None else len(sample)) < Compression.MIN_SIZE:
+            return False
+        if bytes(sample[:8]).startswith(Compression.COMPRESSED_SIGNATURES):
+            return False
+
+        sample = bytes(sample[:Compression.SAMPLE_SIZE])
+        trial = zlib.compress(sample, 1)
+        return len(trial) <= len(sample) * (1 - Compression.MIN_SAVINGS)
+
+    @staticmethod
+    def _compressor(codec_id):
+        """New streaming compressor for a codec"""
+        if codec_id == Compression.STORED:
+            return _StoredCompressor()
+        if codec_id == Compression.LZMA:
+            return lzma.LZMACompressor(preset=min(max(Compression.LEVEL, 0), 9))
+        return zlib.compressobj(min(max(Compression.LEVEL, 0), 9))
+
+    @staticmethod
+    def _decompressor(codec_id):
+        """New streaming decompressor for a codec"""
+        if codec_id == Compression.LZMA:
+            return lzma.LZMADecompressor()
+        if codec_id == Compression.ZLIB:
+            return zlib.decompressobj()
+        raise ValueError(f"Unknown compression codec: {codec_id}")
+
+    @staticmethod
+    def compress_bytes(data, codec_id=None):
+        """Compress bytes with the configured codec, or codec_id (header included)"""
+        if codec_id is None:
+            codec_id = Compression.CODECS[Compression.CODEC]
+        compressor = Compression._compressor(codec_id)
+        header = Compression.HEADER.pack(Compression.MAGIC, codec_id, len(data))
+        return header + compressor.compress(data) + compressor.flush()
+
+    @staticmethod
+    def write_compressed(f, chunks, codec_id=None):
+        """
+        Stream-compress chunks into an open, seekable binary file
+
+        Uses the configured codec unless codec_id is given. The size field
+        is back-filled once all chunks are written.
+        Returns (uncompressed_size, stored_size).
+        """
+        if codec_id is None:
+            codec_id = Compression.CODECS[Compression.CODEC]
+        compressor = Compression._compressor(codec_id)
+        start = f.tell()
+        f.write(Compression.HEADER.pack(Compression.MAGIC, codec_id, 0))
+
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            f.write(compressor.compress(chunk))
+        f.write(compressor.flush())
+
+        end = f.tell()
+        f.seek(start)
+        f.write(Compression.HEADER.pack(Compression.MAGIC, codec_id, size))
+        f.seek(end)
+        return size, end - start
+
+    @staticmethod
+    def read_header(f):
+        """Read the header from a binary file; returns (codec_id, size) or None and rewinds for plain files"""
+        start = f.tell()
+        header = f.read(Compression.HEADER.size)
+        if len(header) == Compression.HEADER.size and Compression.is_compressed(header):
+            _, codec_id, size = Compression.HEADER.unpack(header)
+            return codec_id, size
+
+        f.seek(start)
+        return None
+
+    @staticmethod
+    def iter_decompressed(f, codec_id, chunk_size=None, size=None):
+        """
+        Yield decompressed chunks of at most chunk_size bytes from a file positioned after the header
+
+        With size (from the header), output beyond it raises ValueError
+        instead of being produced.
+        """
+        chunk_size = chunk_size or Compression.CHUNK_SIZE
+        produced = 0
+
+        def checked(data):
+            nonlocal produced
+            produced += len(data)
+            if size is not None and produced > size:
+                raise ValueError(f"Compressed file holds more than the {size} bytes in its header")
+            return data
+
+        if codec_id == Compression.STORED:
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield checked(chunk)
+
+        decompressor = Compression._decompressor(codec_id)
+        while True:
+            # Drain what the decompressor holds back before reading more input
+            if codec_id == Compression.ZLIB and decompressor.unconsumed_tail:
+                data = decompressor.decompress(decompressor.unconsumed_tail, chunk_size)
+            elif codec_id == Compression.LZMA and not (decompressor.needs_input or decompressor.eof):
+                data = decompressor.decompress(b'', chunk_size)
+            else:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    break
+                data = decompressor.decompress(chunk, chunk_size)
+            if data:
+                yield checked(data)
+
+        if codec_id == Compression.ZLIB:
+            tail = decompressor.flush()
+            if tail:
+                yield checked(tail)
+
+    @staticmethod
+    def read_file(path):
+        """Read a whole file, decompressing if it carries our header"""
+        # Unbuffered, so a plain file is read straight into one bytes object
+        with open(path, 'rb', buffering=0) as f:
+            header = Compression.read_header(f)
+            if header is None:
+                return f.read()
+
+            codec_id, size = header
+            return b''.join(Compression.iter_decompressed(f, codec_id, size=size))
+
+    @staticmethod
+    def open_file(path):
+        """Open a file for buffered streaming reads, decompressing on the fly"""
+        f = open(path, 'rb')
+        header = Compression.read_header(f)
+        if header is None:
+            return f
+        return io.BufferedReader(DecompressingReader(f, header[0], header[1]), Compression.CHUNK_SIZE)
+
+
+class _StoredCompressor:
+    """Compressor interface for the STORED codec"""
+
+    def compress(self, data):
+        return bytes(data)
+
+    def flush(self):
+        return b''
+
+
+class DecompressingReader(io.RawIOBase):
+    """
+    Raw reader that decompresses a compressed file incrementally
+
+    Seekable in the decompressed stream (callers such as Streamlit rewind
+    file objects before reading them): a backward seek restarts
+    decompression from the header, a forward seek decompresses and discards.
+    """
+
+    def __init__(self, f, codec_id, size):
+        self._file = f
+        self._codec_id = codec_id
+        self._start = f.tell()      # First byte after the header
+        self.size = size
+        self._rewind()
+
+    def _rewind(self):
+        self._file.seek(self._start)
+        self._chunks = Compression.iter_decompressed(self._file, self._codec_id, size=self.size)
+        self._pending = b''
+        self._offset = 0        # Bytes of _pending already read
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError(f"Invalid whence: {whence}")
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+
+        if offset < self._position:
+            self._rewind()
+        scratch = bytearray(min(Compression.CHUNK_SIZE, offset - self._position))
+        while self._position < offset:
+            if not self.readinto(memoryview(scratch)[:offset - self._position]):
+                break
+        return self._position
+
+    def readinto(self, buffer):
+        while self._offset >= len(self._pending):
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+            self._offset = 0
+
+        n = min(len(buffer), len(self._pending) - self._offset)
+        buffer[:n] = memoryview(self._pending)[self._offset:self._offset + n]
+        self._offset += n
+        self._position += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
+
+
+def benchmark(paths):
+    """Compression ratio and throughput per file type for sample files"""
+    import time
+
+    results = {}
+    for path in paths:
+        with open(path, 'rb') as f:
+            data = f.read()
+        ext = os.path.splitext(path)[1].lower() or '(none)'
+        row = results.setdefault(ext, {
+            'files': 0, 'raw': 0, 'stored': 0, 'compressed_raw': 0,
+            'compress_s': 0.0, 'decompress_s': 0.0, 'skipped': 0
+        })
+        row['files'] += 1
+        row['raw'] += len(data)
+
+        if not Compression.should_compress(data):
+            row['stored'] += len(data)
+            row['skipped'] += 1
+            continue
+
+        start = time.perf_counter()
+        packed = Compression.compress_bytes(data)
+        row['compress_s'] += time.perf_counter() - start
+
+        buffer = io.BytesIO(packed)
+        start = time.perf_counter()
+        codec_id, _ = Compression.read_header(buffer)
+        for _ in Compression.iter_decompressed(buffer, codec_id):
+            pass
+        row['decompress_s'] += time.perf_counter() - start
+        row['stored'] += len(packed)
+        row['compressed_raw'] += len(data)
+
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("usage: python -m services.compression FILE [FILE ...]")
+        sys.exit(1)
+
+    print(f"codec={Compression.CODEC} level={Compression.LEVEL}")
+    print(f"{'type':<8} {'files':>5} {'ratio':>7} {'comp MB/s':>10} {'decomp MB/s':>12} {'skipped':>8}")
+    for ext, row in sorted(benchmark(sys.argv[1:]).items()):
+        compressed_mb = row['compressed_raw'] / (1024 * 1024)
+        ratio = row['raw'] / row['stored'] if row['stored'] else 1.0
+        comp = compressed_mb / row['compress_s'] if row['compress_s'] else float('nan')
+        decomp = compressed_mb / row['decompress_s'] if row['decompress_s'] else float('nan')
+        print(f"{ext:<8} {row['files']:>5} {ratio:>7.2f} {comp:>10.1f} {decomp:>12.1f} {row['skipped']:>8}")
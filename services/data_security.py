@@ -2,8 +2,10 @@ import streamlit as st
 from datetime import datetime
 import hashlib
 
-# Always use local storage for now
+# Documents always use local storage; user data goes through the configured backend
 from services.local_storage import LocalStorage
+from services.storage_backend import StorageBackend, get_storage_backend
+from services.background_writer import BackgroundWriter
 
 class DataSecurity:
     """Centralized data security and isolation manager"""
@@ -28,21 +30,106 @@ class DataSecurity:
         return hashlib.sha256(email.encode()).hexdigest()[:16]
     
     @staticmethod
-    def save_user_data(data_type, data):
+    def save_user_data(data_type, data, base=None):
         """
         Save data for current user
         
         IMPORTANT: For documents, this saves METADATA only
         Use save_document() for actual file content
+        
+        Pass base (the collection as it was loaded) to merge with concurrent
+        edits from other sessions instead of overwriting them; returns the
+        data actually stored.
+        
+        With STORAGE_BACKGROUND_WRITES=true the save is queued and data is
+        returned as-is; the merge then happens when the queue writes it.
         """
         email = DataSecurity.get_current_user_email()
-        return LocalStorage.save_user_data(email, data_type, data)
+        backend = get_storage_backend()
+        
+        def write(value, value_base):
+            stored = backend.save_user_data(email, data_type, value, value_base)
+            backend.record_usage(email, data_type, stored)
+            return stored
+        
+        if BackgroundWriter.enabled():
+            BackgroundWriter.submit((email, data_type), data, base, write)
+            return data
+        
+        return write(data, base)
+    
+    @staticmethod
+    def save_session_data(data_types):
+        """
+        Save session_state collections that changed since they were last persisted
+        
+        Unchanged collections are skipped. Inside deferred_saves() the changed
+        ones are only marked and written once when the run ends, however many
+        times this is called; otherwise they are written now. Returns the
+        number of collections written.
+        """
+        from services.unit_of_work import SessionUnitOfWork
+        return SessionUnitOfWork.current().save(data_types)
+    
+    @staticmethod
+    def deferred_saves():
+        """Context manager a page runs in: save_session_data writes once, when it exits"""
+        from services.unit_of_work import SessionUnitOfWork
+        return SessionUnitOfWork.current().deferred_flush()
+    
+    @staticmethod
+    def flush_pending_saves():
+        """Write collections still dirty (deferred by the last run, or after a failed save)"""
+        from services.unit_of_work import SessionUnitOfWork
+        return SessionUnitOfWork.current().flush()
+    
+    @staticmethod
+    def wait_for_saves(timeout=None):
+        """Block until queued background saves are on disk (no-op without background writes)"""
+        return BackgroundWriter.flush(timeout)
+    
+    @staticmethod
+    def get_save_queue_stats():
+        """Background save queue depth and write latency"""
+        return BackgroundWriter.stats()
+    
+    @staticmethod
+    def show_failed_saves():
+        """Show an error for each of the current user's background saves that gave up after retries"""
+        if not BackgroundWriter.enabled() or not DataSecurity.verify_session():
+            return
+        
+        failures = BackgroundWriter.take_failures(DataSecurity.get_current_user_email())
+        for (_, data_type), failure in failures.items():
+            st.error(
+                f"❌ Your latest changes to {data_type.replace('_', ' ')} could not be saved "
+                f"after {failure['attempts']} attempts: {failure['error']}"
+            )
     
     @staticmethod
     def load_user_data(data_type, default=None):
         """Load data for current user"""
         email = DataSecurity.get_current_user_email()
-        return LocalStorage.load_user_data(email, data_type, default)
+        
+        # A queued save is newer than what is on disk
+        data = BackgroundWriter.pending((email, data_type))
+        if data is None:
+            data = get_storage_backend().load_user_data(email, data_type, default)
+        
+        from services.unit_of_work import SessionUnitOfWork
+        SessionUnitOfWork.current().loaded(email, data_type, data)
+        return data
+    
+    @staticmethod
+    def load_user_data_range(data_type, start=None, end=None):
+        """Load current user's records dated within [start, end] (inclusive)"""
+        email = DataSecurity.get_current_user_email()
+        
+        pending = BackgroundWriter.pending((email, data_type))
+        if pending is not None:
+            return StorageBackend.filter_range(pending, LocalStorage.PARTITIONED_DATA_TYPES.get(data_type, 'date'), start, end)
+        
+        return get_storage_backend().load_range(email, data_type, start, end)
     
     @staticmethod
     def save_document(document_id, file_content, filename, content_type):
@@ -55,12 +142,41 @@ class DataSecurity:
         email = DataSecurity.get_current_user_email()
         return LocalStorage.save_document(email, document_id, file_content, filename, content_type)
     
+    @staticmethod
+    def save_document_stream(document_id, fileobj, filename, content_type):
+        """
+        Save a document from a file-like object in chunks
+        
+        Use for uploads instead of save_document(file.read()) so large files
+        are never held in memory twice. Returns: file path
+        """
+        email = DataSecurity.get_current_user_email()
+        return LocalStorage.save_document_stream(email, document_id, fileobj, filename, content_type)
+    
     @staticmethod
     def get_document(document_id, filename):
         """Get actual document file content"""
         email = DataSecurity.get_current_user_email()
         return LocalStorage.get_document(email, document_id, filename)
     
+    @staticmethod
+    def document_exists(document_id, filename):
+        """Whether the document file is stored (nothing is read)"""
+        email = DataSecurity.get_current_user_email()
+        return LocalStorage.document_exists(email, document_id, filename)
+    
+    @staticmethod
+    def open_document(document_id, filename):
+        """Open document file for streaming reads (None if missing)"""
+        email = DataSecurity.get_current_user_email()
+        return LocalStorage.open_document(email, document_id, filename)
+    
+    @staticmethod
+    def map_document(document_id, filename):
+        """Memory-map document file read-only (None if missing)"""
+        email = DataSecurity.get_current_user_email()
+        return LocalStorage.map_document(email, document_id, filename)
+    
     @staticmethod
     def delete_document(document_id, filename):
         """Delete document file"""
@@ -73,6 +189,51 @@ class DataSecurity:
         email = DataSecurity.get_current_user_email()
         return LocalStorage.list_user_documents(email)
     
+    @staticmethod
+    def get_document_usage():
+        """Document count and bytes for current user (no directory scan)"""
+        email = DataSecurity.get_current_user_email()
+        return LocalStorage.get_document_usage(email)
+    
+    @staticmethod
+    def get_usage():
+        """Usage ledger counters for current user (documents, bytes, matters)"""
+        email = DataSecurity.get_current_user_email()
+        return LocalStorage.get_usage(email)
+    
+    @staticmethod
+    def check_plan_limit(resource, count=1):
+        """Check whether count more 'documents' or 'matters' fit the organization's plan; returns (allowed, message)"""
+        from services.subscription_manager import SubscriptionManager
+        
+        email = DataSecurity.get_current_user_email()
+        org_code = st.session_state.get('user_data', {}).get('organization_code')
+        if not org_code:
+            return True, "no plan"
+        
+        return SubscriptionManager().can_add_resource(org_code, email, resource, count)
+    
+    @staticmethod
+    def get_dedup_stats():
+        """Storage saved by deduplicating identical document uploads"""
+        email = DataSecurity.get_current_user_email()
+        return LocalStorage.get_dedup_stats(email)
+    
+    @staticmethod
+    def get_analysis_cache_stats():
+        """Analysis result cache entries, size and hit rate for current user"""
+        from services.analysis_cache import AnalysisCache
+        
+        email = DataSecurity.get_current_user_email()
+        return AnalysisCache.stats(email)
+    
+    @staticmethod
+    def clear_analysis_cache():
+        """Drop current user's cached analysis results; returns the number removed"""
+        from services.analysis_cache import AnalysisCache
+        
+        return AnalysisCache.clear(DataSecurity.get_current_user_email())
+    
     @staticmethod
     def verify_session():
         """Verify user session is valid"""
@@ -0,0 +1,316 @@
+"""
+Text analyses behind the AI Insights page
+
+Plain functions of the extracted text (no Streamlit), so they can run in
+batch worker processes and their results can be cached.
+"""
+
+from services.term_matcher import TermMatcher
+
+def run_document_analysis(text, analysis_type):
+    """Run the selected analysis on extracted text"""
+    # Mock AI analysis - replace with actual AI service calls
+    
+    analysis_results = {
+        "summary": "",
+        "key_terms": [],
+        "risk_score": 0,
+        "compliance_issues": [],
+        "recommendations": [],
+        "clauses": [],
+        "entities": [],
+        "sentiment": "neutral"
+    }
+    
+    if analysis_type == "Full Document Analysis":
+        analysis_results = perform_full_analysis(text)
+    elif analysis_type == "Contract Review":
+        analysis_results = perform_contract_review(text)
+    elif analysis_type == "Key Terms Extraction":
+        analysis_results = extract_key_terms(text)
+    elif analysis_type == "Legal Risk Assessment":
+        analysis_results = assess_legal_risks(text)
+    elif analysis_type == "Document Summarization":
+        analysis_results = summarize_document(text)
+    elif analysis_type == "Clause Analysis":
+        analysis_results = analyze_clauses(text)
+    elif analysis_type == "Compliance Check":
+        analysis_results = check_compliance(text)
+    
+    return analysis_results
+
+def perform_full_analysis(text):
+    """Comprehensive document analysis using actual text"""
+    if not text or len(text.strip()) < 50:
+        return {"summary": "Document too short for analysis", "key_terms": [], "risk_score": 0}
+    
+    from collections import Counter
+    import re
+    
+    words = text.split()
+    word_count = len(words)
+    sentences = [s.strip() for s in text.split('.') if s.strip()]
+    
+    # Extract actual key terms
+    word_freq = Counter(word.lower().strip('.,!?;:()[]') for word in words if len(word) > 3)
+    key_terms = [word for word, count in word_freq.most_common(10)]
+    
+    # Extract entities
+    orgs = re.findall(r'\b[A-Z][a-z]+(?:\s+[A-Z][a-z]+)*\s+(?:Inc|LLC|Corp|Company|Ltd)\b', text)
+    dates = re.findall(r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b', text)
+    locations = [loc for loc in ['New York', 'California', 'Delaware', 'Texas'] if loc in text]
+    
+    # Calculate risk score based on actual keywords
+    risk_keywords = ['liability', 'penalty', 'breach', 'indemnify', 'terminate', 'damages']
+    risk_score = min(10, sum(2 for kw in risk_keywords if kw in text.lower()) / 2)
+    
+    # Detect document type
+    doc_type = "General Document"
+    if any(word in text.lower() for word in ['agreement', 'contract', 'parties']):
+        doc_type = "Contract"
+    elif any(word in text.lower() for word in ['complaint', 'plaintiff', 'defendant']):
+        doc_type = "Legal Pleading"
+    
+    return {
+        "summary": f"This document contains {word_count} words across {len(sentences)} sentences. Most frequent terms suggest it is a {doc_type.lower()}.",
+        "key_terms": key_terms[:10],
+        "risk_score": round(risk_score, 1),
+        "compliance_issues": ["Review required - automated compliance check not available"],
+        "recommendations": [
+            f"Document contains {len(orgs)} organization references",
+            f"Found {len(dates)} date references",
+            "Manual legal review recommended for compliance"
+        ],
+        "entities": list(set(orgs[:5] + locations)),
+        "sentiment": "neutral",
+        "document_type": doc_type,
+        "confidence": 0.75
+    }
+
+def perform_contract_review(text):
+    """Analyze contract-specific elements"""
+    return {
+        "summary": "Contract review identifies key commercial terms and potential risk areas.",
+        "clauses": [
+            {"type": "Payment Terms", "status": "Present", "risk": "Low"},
+            {"type": "Termination", "status": "Unclear", "risk": "Medium"},
+            {"type": "Intellectual Property", "status": "Missing", "risk": "High"},
+            {"type": "Liability", "status": "Present", "risk": "Low"}
+        ],
+        "key_terms": ["payment", "delivery", "warranty", "indemnification"],
+        "risk_score": 4.1,
+        "missing_clauses": ["Force Majeure", "Governing Law", "Dispute Resolution"],
+        "recommendations": [
+            "Add intellectual property protection clauses",
+            "Clarify termination procedures",
+            "Include dispute resolution mechanisms"
+        ]
+    }
+
+def extract_key_terms(text):
+    """Extract important legal terms and concepts from actual text"""
+    if not text:
+        return {"summary": "No text to analyze", "key_terms": [], "term_analysis": []}
+    
+    from collections import Counter
+    
+    # Extract all meaningful words (length > 3)
+    words = [word.lower().strip('.,!?;:()[]"\'') for word in text.split() if len(word) > 3]
+    word_freq = Counter(words)
+    
+    # Define legal keywords to prioritize
+    legal_keywords = ["shall", "agreement", "party", "parties", "obligation", "right", "liability", 
+                     "termination", "breach", "indemnify", "warranty", "payment", "fee",
+                     "contract", "clause", "provision", "covenant", "entity", "jurisdiction"]
+    
+    # Build term analysis
+    terms = []
+    for keyword in legal_keywords:
+        count = word_freq.get(keyword, 0)
+        if count > 0:
+            terms.append({
+                "term": keyword,
+                "frequency": count,
+                "importance": "high" if count > 3 else "medium"
+            })
+    
+    # Add other frequent terms not in legal keywords
+    for word, count in word_freq.most_common(15):
+        if word not in legal_keywords and count > 2:
+            terms.append({
+                "term": word,
+                "frequency": count,
+                "importance": "medium" if count > 5 else "low"
+            })
+    
+    return {
+        "summary": f"Extracted {len(terms)} key terms from the document. Most frequent: {terms[0]['term'] if terms else 'none'}",
+        "key_terms": [term["term"] for term in terms[:10]],
+        "term_analysis": sorted(terms, key=lambda x: x["frequency"], reverse=True)[:15],
+        "most_frequent": max(terms, key=lambda x: x["frequency"]) if terms else None
+    }
+
+def summarize_document(text):
+    """Generate document summary"""
+    word_count = len(text.split())
+    sentences = text.split('.')
+    
+    return {
+        "summary": f"This document is approximately {word_count} words long and contains {len(sentences)} sentences. It appears to be a legal document covering contractual obligations and terms.",
+        "key_points": [
+            "Establishes contractual relationship between parties",
+            "Defines mutual obligations and responsibilities",
+            "Includes standard legal protections",
+            "Specifies terms for agreement termination"
+        ],
+        "document_structure": {
+            "word_count": word_count,
+            "sentence_count": len(sentences),
+            "estimated_reading_time": f"{word_count // 250} minutes"
+        }
+    }
+
+def analyze_clauses(text):
+    """Analyze specific contract clauses from actual text"""
+    if not text:
+        return {"summary": "No text to analyze", "clauses": []}
+    
+    text_lower = text.lower()
+    
+    # Define clause types and their detection keywords
+    clause_checks = {
+        "Payment Terms": ["payment", "fee", "compensation", "remuneration", "pay"],
+        "Termination": ["termination", "terminate", "end this agreement", "cancel"],
+        "Force Majeure": ["force majeure", "act of god", "beyond control"],
+        "Confidentiality": ["confidential", "non-disclosure", "proprietary"],
+        "Intellectual Property": ["intellectual property", "copyright", "trademark", "ip rights"],
+        "Liability": ["liability", "liable", "indemnify", "indemnification"],
+        "Governing Law": ["governed by", "jurisdiction", "applicable law"],
+        "Dispute Resolution": ["dispute", "arbitration", "mediation", "litigation"]
+    }
+    
+    clauses = []
+    for clause_name, keywords in clause_checks.items():
+        present = any(keyword in text_lower for keyword in keywords)
+        keyword_count = sum(text_lower.count(kw) for kw in keywords)
+        
+        if present:
+            quality = "Good" if keyword_count > 2 else "Fair" if keyword_count > 0 else "Weak"
+            issues = [] if keyword_count > 2 else ["Limited detail - may need expansion"]
+            suggestions = [] if keyword_count > 2 else [f"Consider adding more detailed {clause_name.lower()} provisions"]
+        else:
+            quality = "Missing"
+            issues = [f"{clause_name} not found in document"]
+            suggestions = [f"Add {clause_name.lower()} clause for completeness"]
+        
+        clauses.append({
+            "name": clause_name,
+            "present": present,
+            "quality": quality,
+            "issues": issues,
+            "suggestions": suggestions
+        })
+    
+    present_count = sum(1 for c in clauses if c["present"])
+    
+    return {
+        "summary": f"Found {present_count} of {len(clauses)} standard clauses in the document.",
+        "clauses": clauses
+    }
+
+def check_compliance(text):
+    """Check document compliance with legal standards"""
+    return {
+        "summary": "Compliance check evaluates adherence to legal and regulatory requirements.",
+        "compliance_score": 7.2,
+        "compliant_areas": [
+            "Privacy policy requirements",
+            "Basic contract formation elements",
+            "Signature requirements"
+        ],
+        "non_compliant_areas": [
+            "Missing mandatory disclosures",
+            "Unclear dispute resolution",
+            "Incomplete governing law specification"
+        ],
+        "recommendations": [
+            "Add required regulatory disclosures",
+            "Specify complete governing law and jurisdiction",
+            "Include mandatory consumer protection clauses"
+        ]
+    }
+
+def classify_document(text):
+    """Classify document type based on content"""
+    # Simple keyword-based classification
+    if any(word in text.lower() for word in ["agreement", "contract", "parties"]):
+        return "Contract"
+    elif any(word in text.lower() for word in ["complaint", "plaintiff", "defendant"]):
+        return "Legal Pleading"
+    elif any(word in text.lower() for word in ["memo", "memorandum", "analysis"]):
+        return "Legal Memorandum"
+    else:
+        return "General Legal Document"
+
+RISK_KEYWORDS = ['liability', 'penalty', 'breach', 'damages', 'indemnify', 'lawsuit', 'litigation']
+PROTECTION_KEYWORDS = ['limit', 'cap', 'maximum', 'insurance', 'indemnification']
+LEGAL_RISK_TERMS = RISK_KEYWORDS + PROTECTION_KEYWORDS + [
+    'may terminate', 'notice', 'intellectual property', 'ip rights', 'copyright', 'payment', 'date', 'within',
+    'days', 'force majeure', 'confidential', 'non-disclosure', 'governed by', 'jurisdiction'
+]
+
+def assess_legal_risks(text):
+    """Assess potential legal risks based on actual document content"""
+    if not text:
+        return {"summary": "No text to analyze", "risk_score": 0}
+    
+    # Every keyword below, found in one pass over the document
+    hits = TermMatcher.of(LEGAL_RISK_TERMS).scan(text.lower())
+    
+    # Define risk indicators
+    high_risk_indicators = {
+        "unlimited liability": ["unlimited", "liability", "without limit"],
+        "unclear termination": ["may terminate" if hits.contains("may terminate") and not hits.contains("notice") else ""],
+        "missing IP protection": [] if hits.count_any(["intellectual property", "ip rights", "copyright"]) else ["no IP protection"]
+    }
+    
+    medium_risk_indicators = {
+        "payment ambiguity": [] if hits.contains("payment") and hits.count_any(["date", "within", "days"]) else ["payment terms unclear"],
+        "force majeure": [] if hits.contains("force majeure") else ["no force majeure clause"]
+    }
+    
+    low_risk_indicators = {
+        "confidentiality": [hits.contains("confidential") or hits.contains("non-disclosure")],
+        "governing law": [hits.contains("governed by") or hits.contains("jurisdiction")]
+    }
+    
+    # Calculate actual risks
+    high_risk_areas = []
+    for risk, indicators in high_risk_indicators.items():
+        if indicators and indicators[0]:
+            high_risk_areas.append(risk.title())
+    
+    medium_risk_areas = []
+    for risk, indicators in medium_risk_indicators.items():
+        if indicators and indicators[0]:
+            medium_risk_areas.append(risk.title())
+    
+    low_risk_areas = [area.replace("_", " ").title() for area, present in low_risk_indicators.items() if present]
+    
+    # Calculate risk score
+    risk_count = 3 * hits.count_any(RISK_KEYWORDS)
+    protection_count = hits.count_any(PROTECTION_KEYWORDS)
+    risk_score = max(0, min(10, risk_count - protection_count))
+    
+    return {
+        "summary": f"Risk assessment identified {len(high_risk_areas)} high-risk and {len(medium_risk_areas)} medium-risk areas.",
+        "risk_score": round(risk_score, 1),
+        "high_risk_areas": high_risk_areas if high_risk_areas else ["No critical risks detected"],
+        "medium_risk_areas": medium_risk_areas if medium_risk_areas else ["No medium risks detected"],
+        "low_risk_areas": low_risk_areas if low_risk_areas else ["Standard provisions present"],
+        "recommendations": [
+            f"Address {len(high_risk_areas)} high-priority risk areas" if high_risk_areas else "Continue monitoring for risks",
+            "Consider professional legal review for comprehensive assessment",
+            "Ensure all critical clauses are present and detailed"
+        ]
+    }
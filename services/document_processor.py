@@ -1,12 +1,87 @@
 import re
+import heapq
 import hashlib
 from typing import Dict, List, Tuple, Optional, Any
 from datetime import datetime
 import json
 
+from services.analysis_cache import AnalysisCache
+from services.analysis_context import AnalysisContext
+from services.streaming_context import StreamingContext
+from services.term_matcher import TermMatcher
+from services.text_patterns import TextPatterns
+
 class DocumentProcessor:
     
-    def __init__(self):
+    # (document type, filename words, keywords in the first 2000 characters, keywords needed), checked in order
+    CLASSIFICATION_RULES = [
+        ('Contract/Agreement', ['contract', 'agreement'], [
+            'contract', 'agreement', 'terms and conditions', 'hereby agree', 'parties agree', 'consideration',
+            'obligations', 'covenants'
+        ], 2),
+        ('Court Filing', ['motion', 'complaint', 'petition', 'brief'], [
+            'motion', 'complaint', 'petition', 'brief', 'order', 'judgment', 'court', 'honorable',
+            'civil action', 'case no', 'docket', 'plaintiff', 'defendant', 'respondent', 'petitioner'
+        ], 3),
+        ('Corporate Document', ['bylaws', 'incorporation', 'corporate'], [
+            'llc', 'corporation', 'incorporation', 'bylaws', 'board of directors', 'shareholders',
+            'articles of incorporation', 'operating agreement', 'board resolution', 'corporate', 'entity'
+        ], 2),
+        ('Real Estate', ['lease', 'deed', 'mortgage'], [
+            'lease', 'deed', 'mortgage', 'property', 'real estate', 'premises', 'landlord', 'tenant', 'rent',
+            'purchase agreement', 'title', 'escrow', 'closing', 'conveyance'
+        ], 3),
+        ('Family Law', ['divorce', 'custody', 'prenup'], [
+            'divorce', 'custody', 'prenuptial', 'marriage', 'child support', 'alimony', 'spousal support',
+            'parenting plan', 'dissolution', 'domestic relations', 'family court'
+        ], 2),
+        ('Employment Law', ['employment', 'employee', 'job'], [
+            'employment', 'employee', 'employer', 'job', 'salary', 'wages', 'benefits', 'termination',
+            'resignation', 'workplace', 'hr', 'human resources', 'discrimination', 'harassment'
+        ], 3),
+        ('Intellectual Property', ['patent', 'trademark', 'copyright'], [
+            'patent', 'trademark', 'copyright', 'intellectual property', 'trade secret', 'licensing',
+            'infringement', 'royalty'
+        ], 2),
+        ('Invoice/Billing', ['invoice', 'bill'], [
+            'invoice', 'bill', 'payment', 'due date', 'amount due', 'services rendered', 'billing', 'charges',
+            'fees'
+        ], 3),
+        ('Correspondence', ['letter', 'memo', 'correspondence'], [
+            'dear', 'sincerely', 'regards', 'letter', 'correspondence', 'memo', 'memorandum', 're:',
+            'subject:'
+        ], 2)
+    ]
+    
+    # Common words of each language, matched as whole words in the first 1000 characters
+    LANGUAGE_TERMS = {
+        'English': ['the', 'and', 'agreement', 'contract', 'shall', 'party', 'rights'],
+        'Spanish': ['el', 'la', 'y', 'contrato', 'acuerdo', 'parte', 'derechos'],
+        'French': ['le', 'la', 'et', 'contrat', 'accord', 'partie', 'droits']
+    }
+    
+    SENTIMENT_WORDS = {
+        'positive': [
+            'agree', 'consent', 'approve', 'accept', 'beneficial', 'favorable',
+            'satisfactory', 'successful', 'resolved', 'settlement'
+        ],
+        'negative': [
+            'dispute', 'breach', 'violation', 'default', 'reject', 'deny',
+            'fail', 'unable', 'refuse', 'terminate', 'cancel', 'void'
+        ],
+        'neutral': [
+            'whereas', 'therefore', 'pursuant', 'herein', 'aforementioned',
+            'notwithstanding', 'stipulate', 'covenant'
+        ]
+    }
+    
+    # Single-pass keyword matchers for the dictionaries above
+    CLASSIFICATION_MATCHER = TermMatcher.of(term for rule in CLASSIFICATION_RULES for term in rule[2])
+    LANGUAGE_MATCHER = TermMatcher.of(term for terms in LANGUAGE_TERMS.values() for term in terms)
+    SENTIMENT_MATCHER = TermMatcher.of(term for words in SENTIMENT_WORDS.values() for term in words)
+    
+    def __init__(self, user_email: str = None):
+        self.user_email = user_email    # Tenant whose analysis cache is used (no caching without one)
         self.legal_entities = [
             'corporation', 'llc', 'partnership', 'limited liability company',
             'inc', 'corp', 'co', 'ltd', 'company', 'firm', 'associates',
@@ -30,192 +105,87 @@ class DocumentProcessor:
         }
     
     @staticmethod
-    def extract_key_information(text: str) -> Dict:
+    @AnalysisContext.budgeted
+    def extract_key_information(text) -> Dict:
         """Extract key information from document text using advanced regex patterns."""
+        context = AnalysisContext.of(text)
         key_info = {}
         
-        # Extract dates with multiple formats
-        date_patterns = [
-            r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b',  # MM/DD/YYYY, M/D/YY
-            r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}\b',  # Month DD, YYYY
-            r'\b\d{1,2}\s+(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{4}\b',  # DD Month YYYY
-            r'\b\d{4}[-/]\d{1,2}[-/]\d{1,2}\b'  # YYYY-MM-DD
-        ]
-        
-        dates = []
-        for pattern in date_patterns:
-            dates.extend(re.findall(pattern, text, re.IGNORECASE))
+        # Extract dates with multiple formats (MM/DD/YYYY, Month DD YYYY, DD Month YYYY, YYYY-MM-DD) in one pass
+        dates = [date for matches in context.scan(TextPatterns.DATES).values() for date in matches]
         key_info['dates'] = list(set(dates))[:10]
         
-        # Extract monetary amounts with various formats
-        money_patterns = [
-            r'\$[\d,]+(?:\.\d{2})?',  # $1,000.00
-            r'USD\s*[\d,]+(?:\.\d{2})?',  # USD 1000.00
-            r'[\d,]+\s*dollars?',  # 1000 dollars
-            r'[\d,]+\s*USD'  # 1000 USD
-        ]
-        
-        amounts = []
-        for pattern in money_patterns:
-            amounts.extend(re.findall(pattern, text, re.IGNORECASE))
+        # Extract monetary amounts with various formats ($1,000.00, USD 1000.00, 1000 dollars, 1000 USD)
+        amounts = [amount for matches in context.scan(TextPatterns.MONEY).values() for amount in matches]
         key_info['monetary_amounts'] = list(set(amounts))[:10]
         
         # Extract email addresses
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
-        emails = re.findall(email_pattern, text)
+        emails = context.findall(TextPatterns.EMAIL)
         key_info['email_addresses'] = list(set(emails))
         
-        # Extract phone numbers with various formats
-        phone_patterns = [
-            r'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b',  # 123-456-7890, 123.456.7890, 123 456 7890
-            r'\(\d{3}\)\s*\d{3}[-.\s]?\d{4}\b',  # (123) 456-7890
-            r'\+1[-.\s]?\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b'  # +1-123-456-7890
-        ]
-        
-        phones = []
-        for pattern in phone_patterns:
-            phones.extend(re.findall(pattern, text))
+        # Extract phone numbers with various formats (+1-123-456-7890, (123) 456-7890, 123-456-7890)
+        phones = [phone for matches in context.scan(TextPatterns.PHONES).values() for phone in matches]
         key_info['phone_numbers'] = list(set(phones))
         
-        # Extract addresses
-        address_pattern = r'\d+\s+[A-Za-z0-9\s,.-]+(?:Street|St|Avenue|Ave|Road|Rd|Drive|Dr|Boulevard|Blvd|Lane|Ln|Court|Ct|Place|Pl)'
-        addresses = re.findall(address_pattern, text, re.IGNORECASE)
+        # Extract addresses (house number, up to four words, street suffix)
+        address_pattern = r'\b\d{1,6}\s+(?:[A-Za-z0-9.\'-]+\s+){0,4}(?:Street|St|Avenue|Ave|Road|Rd|Drive|Dr|Boulevard|Blvd|Lane|Ln|Court|Ct|Place|Pl)\b'
+        addresses = context.findall(address_pattern, re.IGNORECASE)
         key_info['addresses'] = list(set(addresses))[:5]
         
-        # Extract company names and entities
+        # Extract company names and entities (up to six capitalized words, "&", "and" or "of" before the suffix)
         entity_patterns = [
-            r'[A-Za-z0-9\s&,.-]+\s+(?:Inc|Corp|LLC|Co|Ltd|Company|Corporation|Limited)\b',
-            r'\b[A-Z][A-Za-z0-9\s&,.-]*\s+(?:Law\s+Firm|Associates|Legal\s+Services)\b'
+            r'\b[A-Z][\w&\'-]{0,40}(?:[ \t]+(?:[A-Z][\w&\'-]{0,40}|&|and|of)){0,5}?,?[ \t]+(?i:Inc|Corp|LLC|Co|Ltd|Company|Corporation|Limited)\b',
+            r'\b[A-Z][\w&\'-]{0,40}(?:[ \t]+(?:[A-Z][\w&\'-]{0,40}|&|and|of)){0,5}?[ \t]+(?i:Law\s+Firm|Associates|Legal\s+Services)\b'
         ]
         
         entities = []
         for pattern in entity_patterns:
-            entities.extend(re.findall(pattern, text, re.IGNORECASE))
+            entities.extend(context.findall(pattern))
         key_info['entities'] = list(set(entities))[:10]
         
         # Extract case numbers and docket numbers
         case_pattern = r'(?:Case\s+No\.?|Docket\s+No\.?|Civil\s+Action\s+No\.?)\s*:?\s*[\w\d-]+(?:\s*\([A-Z]{2,}\))?'
-        case_numbers = re.findall(case_pattern, text, re.IGNORECASE)
+        case_numbers = context.findall(case_pattern, re.IGNORECASE)
         key_info['case_numbers'] = list(set(case_numbers))
         
-        # Extract signatures (lines that look like signature blocks)
-        signature_pattern = r'(?:Signed|Signature|By:)\s*[^\n]*(?:\n\s*[A-Za-z\s,.-]+){1,3}'
-        signatures = re.findall(signature_pattern, text, re.IGNORECASE | re.MULTILINE)
+        # Extract signatures (lines that look like signature blocks, at most 1000 characters to the line break)
+        signature_pattern = r'(?:Signed|Signature|By:)\s*[^\n]{0,1000}+(?:\n\s*[A-Za-z\s,.-]+){1,3}'
+        signatures = context.findall(signature_pattern, re.IGNORECASE | re.MULTILINE)
         key_info['signature_blocks'] = signatures[:5]
         
         return key_info
     
     @staticmethod
-    def classify_document(filename: str, text: str) -> str:
+    def classify_document(filename: str, text) -> str:
         """Classify document type based on filename and content analysis."""
         filename_lower = filename.lower()
-        text_lower = text.lower()
         
         # Check first 2000 characters for classification (more comprehensive than original)
-        text_sample = text_lower[:2000]
+        text_sample = AnalysisContext.of(text).head(2000, lower=True)
+        hits = DocumentProcessor.CLASSIFICATION_MATCHER.scan(text_sample)
         
-        # Contract/Agreement classification
-        contract_keywords = [
-            'contract', 'agreement', 'terms and conditions', 'hereby agree',
-            'parties agree', 'consideration', 'obligations', 'covenants'
-        ]
-        if any(word in filename_lower for word in ['contract', 'agreement']) or \
-           sum(1 for word in contract_keywords if word in text_sample) >= 2:
-            return 'Contract/Agreement'
-        
-        # Court Filing classification
-        court_keywords = [
-            'motion', 'complaint', 'petition', 'brief', 'order', 'judgment',
-            'court', 'honorable', 'civil action', 'case no', 'docket',
-            'plaintiff', 'defendant', 'respondent', 'petitioner'
-        ]
-        if any(word in filename_lower for word in ['motion', 'complaint', 'petition', 'brief']) or \
-           sum(1 for word in court_keywords if word in text_sample) >= 3:
-            return 'Court Filing'
-        
-        # Corporate Document classification
-        corporate_keywords = [
-            'llc', 'corporation', 'incorporation', 'bylaws', 'board of directors',
-            'shareholders', 'articles of incorporation', 'operating agreement',
-            'board resolution', 'corporate', 'entity'
-        ]
-        if any(word in filename_lower for word in ['bylaws', 'incorporation', 'corporate']) or \
-           sum(1 for word in corporate_keywords if word in text_sample) >= 2:
-            return 'Corporate Document'
-        
-        # Real Estate classification
-        real_estate_keywords = [
-            'lease', 'deed', 'mortgage', 'property', 'real estate', 'premises',
-            'landlord', 'tenant', 'rent', 'purchase agreement', 'title',
-            'escrow', 'closing', 'conveyance'
-        ]
-        if any(word in filename_lower for word in ['lease', 'deed', 'mortgage']) or \
-           sum(1 for word in real_estate_keywords if word in text_sample) >= 3:
-            return 'Real Estate'
-        
-        # Family Law classification
-        family_keywords = [
-            'divorce', 'custody', 'prenuptial', 'marriage', 'child support',
-            'alimony', 'spousal support', 'parenting plan', 'dissolution',
-            'domestic relations', 'family court'
-        ]
-        if any(word in filename_lower for word in ['divorce', 'custody', 'prenup']) or \
-           sum(1 for word in family_keywords if word in text_sample) >= 2:
-            return 'Family Law'
-        
-        # Employment Law classification
-        employment_keywords = [
-            'employment', 'employee', 'employer', 'job', 'salary', 'wages',
-            'benefits', 'termination', 'resignation', 'workplace', 'hr',
-            'human resources', 'discrimination', 'harassment'
-        ]
-        if any(word in filename_lower for word in ['employment', 'employee', 'job']) or \
-           sum(1 for word in employment_keywords if word in text_sample) >= 3:
-            return 'Employment Law'
-        
-        # Intellectual Property classification
-        ip_keywords = [
-            'patent', 'trademark', 'copyright', 'intellectual property',
-            'trade secret', 'licensing', 'infringement', 'royalty'
-        ]
-        if any(word in filename_lower for word in ['patent', 'trademark', 'copyright']) or \
-           sum(1 for word in ip_keywords if word in text_sample) >= 2:
-            return 'Intellectual Property'
-        
-        # Invoice/Billing classification
-        billing_keywords = [
-            'invoice', 'bill', 'payment', 'due date', 'amount due',
-            'services rendered', 'billing', 'charges', 'fees'
-        ]
-        if any(word in filename_lower for word in ['invoice', 'bill']) or \
-           sum(1 for word in billing_keywords if word in text_sample) >= 3:
-            return 'Invoice/Billing'
-        
-        # Correspondence classification
-        correspondence_keywords = [
-            'dear', 'sincerely', 'regards', 'letter', 'correspondence',
-            'memo', 'memorandum', 're:', 'subject:'
-        ]
-        if any(word in filename_lower for word in ['letter', 'memo', 'correspondence']) or \
-           sum(1 for word in correspondence_keywords if word in text_sample) >= 2:
-            return 'Correspondence'
+        for document_type, filename_words, keywords, needed in DocumentProcessor.CLASSIFICATION_RULES:
+            if any(word in filename_lower for word in filename_words) or hits.count_any(keywords) >= needed:
+                return document_type
         
         return 'General Document'
     
-    def extract_parties(self, text: str) -> List[str]:
+    @AnalysisContext.budgeted
+    def extract_parties(self, text) -> List[str]:
         """Extract party names from legal documents."""
+        context = AnalysisContext.of(text)
         parties = []
         
         # Look for party identification patterns
         party_patterns = [
             r'(?:plaintiff|defendant|petitioner|respondent):\s*([A-Za-z\s,.-]+?)(?:\n|\.|,)',
-            r'between\s+([A-Za-z\s,.-]+?)\s+and\s+([A-Za-z\s,.-]+?)(?:\s|,|\.|$)',
+            r'between\s+([A-Za-z\s,.-]{1,100}?)\s+and\s+([A-Za-z\s,.-]+?)(?:\s|,|\.|$)',
             r'(?:party|client):\s*([A-Za-z\s,.-]+?)(?:\n|\.|,)',
-            r'(?:^|\n)\s*([A-Z][A-Za-z\s&,.-]+(?:Inc|Corp|LLC|Co|Ltd|Company|Corporation))\s*(?:\n|,|\.|$)'
+            r'(?:^|\n)[ \t]*([A-Z][A-Za-z \t&,.-]{0,100}(?:Inc|Corp|LLC|Co|Ltd|Company|Corporation))[ \t]*(?:\n|,|\.|$)'
         ]
         
         for pattern in party_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE | re.MULTILINE)
+            matches = context.findall(pattern, re.IGNORECASE | re.MULTILINE)
             if isinstance(matches[0], tuple) if matches else False:
                 # Handle patterns that return tuples
                 for match in matches:
@@ -232,26 +202,23 @@ class DocumentProcessor:
         
         return cleaned_parties[:10]  # Limit to first 10 parties
     
-    def calculate_document_hash(self, text: str) -> str:
+    def calculate_document_hash(self, text) -> str:
         """Calculate SHA-256 hash of document content for duplicate detection."""
-        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return AnalysisContext.of(text).content_hash
+    
+    def calculate_file_hash(self, content: bytes) -> str:
+        """Calculate SHA-256 hash of raw file bytes (the key used by the document blob store)."""
+        return hashlib.sha256(content).hexdigest()
     
-    def detect_language(self, text: str) -> str:
+    def detect_language(self, text) -> str:
         """Simple language detection based on common legal terms."""
         # Sample text for analysis (first 1000 characters)
-        sample = text.lower()[:1000]
+        hits = self.LANGUAGE_MATCHER.scan(AnalysisContext.of(text).head(1000, lower=True))
         
-        # English legal terms
-        english_terms = ['the', 'and', 'agreement', 'contract', 'shall', 'party', 'rights']
-        english_score = sum(1 for term in english_terms if term in sample)
-        
-        # Spanish legal terms
-        spanish_terms = ['el', 'la', 'y', 'contrato', 'acuerdo', 'parte', 'derechos']
-        spanish_score = sum(1 for term in spanish_terms if term in sample)
-        
-        # French legal terms
-        french_terms = ['le', 'la', 'et', 'contrat', 'accord', 'partie', 'droits']
-        french_score = sum(1 for term in french_terms if term in sample)
+        # Short function words ('y', 'el', 'et') are only counted as words of their own
+        english_score = hits.count_any(self.LANGUAGE_TERMS['English'], whole_words=True)
+        spanish_score = hits.count_any(self.LANGUAGE_TERMS['Spanish'], whole_words=True)
+        french_score = hits.count_any(self.LANGUAGE_TERMS['French'], whole_words=True)
         
         if spanish_score > english_score and spanish_score > french_score:
             return 'Spanish'
@@ -260,57 +227,46 @@ class DocumentProcessor:
         else:
             return 'English'
     
-    def extract_contract_terms(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def extract_contract_terms(self, text) -> Dict[str, Any]:
         """Extract key contract terms and clauses."""
+        context = AnalysisContext.of(text)
         terms = {}
         
         # Extract effective dates
         effective_pattern = r'effective\s+(?:date|as\s+of)\s*:?\s*([^.;\n]+)'
-        effective_dates = re.findall(effective_pattern, text, re.IGNORECASE)
+        effective_dates = context.findall(effective_pattern, re.IGNORECASE)
         terms['effective_dates'] = [date.strip() for date in effective_dates]
         
-        # Extract termination clauses
-        termination_pattern = r'terminat[ei]\w*[^.]*\.(?:[^.]*\.)*'
-        termination_clauses = re.findall(termination_pattern, text, re.IGNORECASE)
-        terms['termination_clauses'] = termination_clauses[:3]
+        # Extract termination clauses: terminat[ei]\w*[^.]*\.(?:[^.]*\.)* matches from the first
+        # termination word to the last period of the document, found here without backtracking
+        # (the first match is the one to use as long as it ends before that period)
+        last_period = context.rfind('.')
+        first = context.search_span(r'terminat[ei]', re.IGNORECASE)
+        if first and first[1] <= max(last_period, 0):
+            terms['termination_clauses'] = [context.slice(first[0], last_period + 1)]
+        else:
+            terms['termination_clauses'] = []
         
         # Extract governing law
         law_pattern = r'governed\s+by\s+(?:the\s+)?laws?\s+of\s+([^.;\n]+)'
-        governing_law = re.findall(law_pattern, text, re.IGNORECASE)
+        governing_law = context.findall(law_pattern, re.IGNORECASE)
         terms['governing_law'] = [law.strip() for law in governing_law]
         
         # Extract payment terms
-        payment_pattern = r'payment[^.]*\$[\d,]+(?:\.\d{2})?[^.]*\.'
-        payment_terms = re.findall(payment_pattern, text, re.IGNORECASE)
+        payment_pattern = r'payment(?=[^.]{0,1000}\.)[^.]*\$[\d,]+(?:\.\d{2})?[^.]*\.'
+        payment_terms = context.findall(payment_pattern, re.IGNORECASE)
         terms['payment_terms'] = payment_terms[:5]
         
         return terms
     
-    def analyze_document_sentiment(self, text: str) -> Dict[str, Any]:
+    def analyze_document_sentiment(self, text) -> Dict[str, Any]:
         """Basic sentiment analysis for legal documents."""
-        # Positive indicators
-        positive_words = [
-            'agree', 'consent', 'approve', 'accept', 'beneficial', 'favorable',
-            'satisfactory', 'successful', 'resolved', 'settlement'
-        ]
-        
-        # Negative indicators
-        negative_words = [
-            'dispute', 'breach', 'violation', 'default', 'reject', 'deny',
-            'fail', 'unable', 'refuse', 'terminate', 'cancel', 'void'
-        ]
-        
-        # Neutral/formal indicators
-        neutral_words = [
-            'whereas', 'therefore', 'pursuant', 'herein', 'aforementioned',
-            'notwithstanding', 'stipulate', 'covenant'
-        ]
-        
-        text_lower = text.lower()
+        hits = AnalysisContext.of(text).terms(self.SENTIMENT_MATCHER)
         
-        positive_count = sum(1 for word in positive_words if word in text_lower)
-        negative_count = sum(1 for word in negative_words if word in text_lower)
-        neutral_count = sum(1 for word in neutral_words if word in text_lower)
+        positive_count = hits.count_any(self.SENTIMENT_WORDS['positive'])
+        negative_count = hits.count_any(self.SENTIMENT_WORDS['negative'])
+        neutral_count = hits.count_any(self.SENTIMENT_WORDS['neutral'])
         
         total_indicators = positive_count + negative_count + neutral_count
         
@@ -336,8 +292,10 @@ class DocumentProcessor:
             'neutral_indicators': neutral_count
         }
     
-    def extract_deadlines_and_dates(self, text: str) -> List[Dict[str, Any]]:
+    @AnalysisContext.budgeted
+    def extract_deadlines_and_dates(self, text) -> List[Dict[str, Any]]:
         """Extract deadlines and important dates with context."""
+        context = AnalysisContext.of(text)
         deadlines = []
         
         # Deadline patterns with context
@@ -350,7 +308,7 @@ class DocumentProcessor:
         ]
         
         for pattern, date_type in deadline_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+            matches = context.findall(pattern, re.IGNORECASE)
             for match in matches:
                 deadlines.append({
                     'type': date_type,
@@ -360,8 +318,10 @@ class DocumentProcessor:
         
         return deadlines[:10]
     
-    def detect_sensitive_information(self, text: str) -> Dict[str, Any]:
+    @AnalysisContext.budgeted
+    def detect_sensitive_information(self, text) -> Dict[str, Any]:
         """Detect potentially sensitive information in documents."""
+        context = AnalysisContext.of(text)
         sensitive_info = {
             'social_security_numbers': [],
             'credit_card_numbers': [],
@@ -371,51 +331,46 @@ class DocumentProcessor:
             'tax_id_numbers': []
         }
         
-        # SSN pattern
-        ssn_pattern = r'\b\d{3}-\d{2}-\d{4}\b'
-        sensitive_info['social_security_numbers'] = re.findall(ssn_pattern, text)
-        
-        # Credit card pattern (basic)
-        cc_pattern = r'\b(?:\d{4}[-\s]?){3}\d{4}\b'
-        sensitive_info['credit_card_numbers'] = re.findall(cc_pattern, text)
-        
-        # Bank account pattern (basic)
-        bank_pattern = r'\b\d{8,17}\b'
-        potential_accounts = re.findall(bank_pattern, text)
-        sensitive_info['bank_account_numbers'] = potential_accounts[:5]  # Limit false positives
-        
-        # Tax ID pattern
-        tax_id_pattern = r'\b\d{2}-\d{7}\b'
-        sensitive_info['tax_id_numbers'] = re.findall(tax_id_pattern, text)
+        # SSN, tax ID, credit card (basic) and bank account (basic) numbers in one pass
+        found = context.scan(TextPatterns.SENSITIVE)
+        sensitive_info['social_security_numbers'] = list(found['ssn'])
+        sensitive_info['credit_card_numbers'] = list(found['credit_card'])
+        sensitive_info['bank_account_numbers'] = found['bank_account'][:5]  # Limit false positives
+        sensitive_info['tax_id_numbers'] = list(found['tax_id'])
         
         return sensitive_info
     
-    def generate_document_summary(self, text: str, max_length: int = 500) -> str:
+    def generate_document_summary(self, text, max_length: int = 500) -> str:
         """Generate a summary of the document content."""
-        # Simple extractive summarization
-        sentences = re.split(r'[.!?]+', text)
-        sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
+        context = AnalysisContext.of(text)
         
-        if len(sentences) <= 3:
-            return ' '.join(sentences)
+        # Simple extractive summarization over sentences of more than 20 characters, in two passes
+        # (word frequencies, then sentence scores) so a StreamingContext never holds them all
+        def sentence_words():
+            for sentence in context.iter_sentences():
+                if len(sentence) > 20:
+                    yield sentence, [word for word in AnalysisContext.WORD_TOKEN.findall(sentence.lower()) if len(word) > 3]  # Ignore short words
         
-        # Score sentences based on keyword frequency
         word_freq = {}
-        for sentence in sentences:
-            words = re.findall(r'\b\w+\b', sentence.lower())
+        first_sentences = []
+        sentence_count = 0
+        for sentence, words in sentence_words():
+            sentence_count += 1
+            if sentence_count <= 3:
+                first_sentences.append(sentence)
             for word in words:
-                if len(word) > 3:  # Ignore short words
-                    word_freq[word] = word_freq.get(word, 0) + 1
+                word_freq[word] = word_freq.get(word, 0) + 1
         
-        # Score sentences
-        sentence_scores = []
-        for sentence in sentences:
-            words = re.findall(r'\b\w+\b', sentence.lower())
-            score = sum(word_freq.get(word, 0) for word in words if len(word) > 3)
-            sentence_scores.append((score, sentence))
+        if sentence_count <= 3:
+            return ' '.join(first_sentences)
         
-        # Sort by score and take top sentences
-        sentence_scores.sort(reverse=True, key=lambda x: x[0])
+        # Top sentences by score, ties in document order (as a stable sort); every sentence is
+        # over 20 characters, so no more than max_length // 21 of them fit in the summary
+        sentence_scores = heapq.nlargest(
+            max_length // 21 + 1,
+            ((sum(word_freq[word] for word in words), sentence) for sentence, words in sentence_words()),
+            key=lambda x: x[0]
+        )
         
         summary_sentences = []
         current_length = 0
@@ -427,23 +382,48 @@ class DocumentProcessor:
             else:
                 break
         
-        return '. '.join(summary_sentences) + '.' if summary_sentences else text[:max_length]
+        return '. '.join(summary_sentences) + '.' if summary_sentences else context.head(max_length)
     
-    def process_document_complete(self, filename: str, text: str) -> Dict[str, Any]:
-        """Complete document processing with all available analysis."""
-        return {
+    def process_document_complete(self, filename: str, text) -> Dict[str, Any]:
+        """
+        Complete document processing with all available analysis.
+        
+        text may be an AnalysisContext already used by AIAnalysisSystem, so
+        the document is lowercased, split and pattern-matched only once.
+        With a user_email the result is kept in the tenant's AnalysisCache.
+        """
+        context = AnalysisContext.of(text)
+        return AnalysisCache.get_or_compute(
+            self.user_email, 'process_document_complete', context,
+            lambda: self._process_document_complete(filename, context),
+            options={'filename': filename}
+        )
+    
+    def process_document_stream(self, filename: str, pieces) -> Dict[str, Any]:
+        """
+        process_document_complete for a document given as an iterable of text
+        pieces (TextExtractor.iter_text), analyzed through a StreamingContext
+        so memory does not grow with the size of the document.
+        """
+        with StreamingContext(pieces) as context:
+            return self.process_document_complete(filename, context)
+    
+    def _process_document_complete(self, filename: str, context: AnalysisContext) -> Dict[str, Any]:
+        results = {
             'filename': filename,
-            'document_type': self.classify_document(filename, text),
-            'key_information': self.extract_key_information(text),
-            'parties': self.extract_parties(text),
-            'contract_terms': self.extract_contract_terms(text),
-            'deadlines': self.extract_deadlines_and_dates(text),
-            'sentiment_analysis': self.analyze_document_sentiment(text),
-            'language': self.detect_language(text),
-            'sensitive_info': self.detect_sensitive_information(text),
-            'document_hash': self.calculate_document_hash(text),
-            'summary': self.generate_document_summary(text),
-            'word_count': len(text.split()),
-            'character_count': len(text),
+            'document_type': self.classify_document(filename, context),
+            'key_information': self.extract_key_information(context),
+            'parties': self.extract_parties(context),
+            'contract_terms': self.extract_contract_terms(context),
+            'deadlines': self.extract_deadlines_and_dates(context),
+            'sentiment_analysis': self.analyze_document_sentiment(context),
+            'language': self.detect_language(context),
+            'sensitive_info': self.detect_sensitive_information(context),
+            'document_hash': self.calculate_document_hash(context),
+            'summary': self.generate_document_summary(context),
+            'word_count': context.word_count,
+            'character_count': context.length,
             'processing_date': datetime.now().isoformat()
         }
+        results['degraded'] = list(context.degraded)      # Extractors cut short by their time budget
+        return results
@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no advisory locks, fall back to in-process locking only
+    fcntl = None
+
+
+class FileLock:
+    """
+    Advisory cross-process lock on a lock file (fcntl.flock)
+
+    Usage:
+        with FileLock.exclusive(path):   # writers
+            ...
+        with FileLock.shared(path):      # readers
+            ...
+
+    Locks are re-entrant per thread: a thread already holding a lock on a
+    path (shared or exclusive) does not lock it again, so a save may call a
+    load for the same collection. Waits time out after LOCK_TIMEOUT
+    seconds; wait latency is recorded in stats().
+    """
+
+    # STORAGE_LOCK_TIMEOUT=seconds before giving up with TimeoutError
+    LOCK_TIMEOUT = float(os.getenv('STORAGE_LOCK_TIMEOUT', '30'))
+
+    _held = threading.local()
+    _local_locks = {}
+    _lock = threading.Lock()
+    _stats = {'acquired': 0, 'contended': 0, 'timeouts': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+
+    @staticmethod
+    def _held_paths():
+        if not hasattr(FileLock._held, 'paths'):
+            FileLock._held.paths = {}
+        return FileLock._held.paths
+
+    @staticmethod
+    def _local_lock(path):
+        with FileLock._lock:
+            if path not in FileLock._local_locks:
+                FileLock._local_locks[path] = threading.RLock()
+            return FileLock._local_locks[path]
+
+    @staticmethod
+    def _record(waited, contended):
+        with FileLock._lock:
+            FileLock._stats['acquired'] += 1
+            FileLock._stats['wait_total'] += waited
+            FileLock._stats['wait_max'] = max(FileLock._stats['wait_max'], waited)
+            if contended:
+                FileLock._stats['contended'] += 1
+
+    @staticmethod
+    def _acquire(path, exclusive, timeout):
+        """Open the lock file and flock it; returns the file descriptor"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+
+        start = time.monotonic()
+        try:
+            fcntl.flock(fd, flags | fcntl.LOCK_NB)
+            contended = False
+        except BlockingIOError:
+            contended = True
+            if not FileLock._wait(fd, flags, timeout):
+                with FileLock._lock:
+                    FileLock._stats['timeouts'] += 1
+                raise TimeoutError(f"Timed out waiting for lock: {path}")
+        except BaseException:
+            os.close(fd)
+            raise
+
+        FileLock._record(time.monotonic() - start, contended)
+        return fd
+
+    @staticmethod
+    def _wait(fd, flags, timeout):
+        """
+        Blocking flock with a timeout
+
+        The kernel wakes blocked waiters far more promptly than polling
+        with LOCK_NB, which lets readers starve a writer. The blocking call
+        runs in a helper thread; if the caller gives up first, the helper
+        closes fd as soon as it gets the lock, releasing it again.
+        """
+        state = {'acquired': False, 'abandoned': False, 'error': None}
+        done = threading.Event()
+        guard = threading.Lock()
+
+        def wait():
+            try:
+                fcntl.flock(fd, flags)
+                acquired = True
+            except OSError as e:
+                state['error'] = e
+                acquired = False
+            with guard:
+                state['acquired'] = acquired
+                abandoned = state['abandoned']
+            if abandoned or not acquired:
+                os.close(fd)
+            done.set()
+
+        threading.Thread(target=wait, name="FileLock-wait", daemon=True).start()
+        done.wait(timeout)
+
+        with guard:
+            if state['acquired']:
+                return True
+            if state['error'] is not None:
+                raise state['error']
+            state['abandoned'] = True
+            return False
+
+    @staticmethod
+    @contextmanager
+    def _locked(path, exclusive, timeout=None):
+        path = os.path.abspath(path)
+        held = FileLock._held_paths()
+        if path in held:
+            if exclusive and not held[path]:
+                raise RuntimeError(f"Cannot upgrade a shared lock to exclusive: {path}")
+            yield
+            return
+
+        timeout = FileLock.LOCK_TIMEOUT if timeout is None else timeout
+        if fcntl is None:
+            local_lock = FileLock._local_lock(path)
+            start = time.monotonic()
+            if not local_lock.acquire(timeout=timeout):
+                raise TimeoutError(f"Timed out waiting for lock: {path}")
+            FileLock._record(time.monotonic() - start, False)
+            release = local_lock.release
+        else:
+            fd = FileLock._acquire(path, exclusive, timeout)
+
+            def release():
+                # Closing the descriptor drops the flock
+                os.close(fd)
+
+        held[path] = exclusive
+        try:
+            yield
+        finally:
+            del held[path]
+            release()
+
+    @staticmethod
+    def exclusive(path, timeout=None):
+        """Context manager holding an exclusive lock on path"""
+        return FileLock._locked(path, True, timeout)
+
+    @staticmethod
+    def shared(path, timeout=None):
+        """Context manager holding a shared lock on path"""
+        return FileLock._locked(path, False, timeout)
+
+    @staticmethod
+    def stats():
+        """Lock acquisitions, contention and wait latency (seconds) for this process"""
+        with FileLock._lock:
+            stats = dict(FileLock._stats)
+        stats['wait_avg'] = stats['wait_total'] / stats['acquired'] if stats['acquired'] else 0.0
+        return stats
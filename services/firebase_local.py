@@ -0,0 +1,149 @@
+import os
+import json
+import copy
+import threading
+
+
+class LocalRealtimeDatabase:
+    """
+    Offline stand-in for firebase_admin.db
+
+    Implements the subset of the Realtime Database API the app uses
+    (reference().get/set/update/delete/child/listen) over an in-memory tree,
+    optionally persisted to a JSON file. Enable with USE_LOCAL_FIREBASE=true
+    or pass an instance to UserDirectory.set_database().
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.RLock()
+        self._tree = {}
+        self._listeners = []
+        self.stats = {'reads': 0, 'writes': 0, 'bytes_read': 0, 'bytes_written': 0}
+
+        if path and os.path.exists(path):
+            with open(path, 'r') as f:
+                self._tree = json.load(f) or {}
+
+    def reference(self, path='/'):
+        """Get a reference to a path (same call shape as firebase_admin.db.reference)"""
+        return LocalReference(self, LocalRealtimeDatabase._split(path))
+
+    @staticmethod
+    def _split(path):
+        return [part for part in (path or '').split('/') if part]
+
+    def _persist(self):
+        if self.path:
+            from services.atomic_io import AtomicFile
+            AtomicFile.write_text(self.path, json.dumps(self._tree))
+
+    def _get(self, parts):
+        node = self._tree
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _set(self, parts, value):
+        if not parts:
+            self._tree = value if isinstance(value, dict) else {}
+            return
+
+        node = self._tree
+        for part in parts[:-1]:
+            if not isinstance(node.get(part), dict):
+                node[part] = {}
+            node = node[part]
+
+        if value is None:
+            node.pop(parts[-1], None)
+        else:
+            node[parts[-1]] = value
+
+    def _write(self, changes):
+        """Apply [(parts, value)] atomically and notify listeners"""
+        with self._lock:
+            for parts, value in changes:
+                self._set(parts, copy.deepcopy(value))
+            self._persist()
+            self.stats['writes'] += 1
+            self.stats['bytes_written'] += sum(len(json.dumps(value)) for _, value in changes)
+            listeners = list(self._listeners)
+
+        for listener_parts, callback in listeners:
+            for parts, value in changes:
+                if parts[:len(listener_parts)] == listener_parts:
+                    callback(LocalEvent('put', '/' + '/'.join(parts[len(listener_parts):]), copy.deepcopy(value)))
+
+
+class LocalEvent:
+    """Mirror of firebase_admin.db.Event"""
+
+    def __init__(self, event_type, path, data):
+        self.event_type = event_type
+        self.path = path
+        self.data = data
+
+
+class LocalListenerRegistration:
+    """Mirror of firebase_admin.db.ListenerRegistration"""
+
+    def __init__(self, database, entry):
+        self._database = database
+        self._entry = entry
+
+    def close(self):
+        with self._database._lock:
+            if self._entry in self._database._listeners:
+                self._database._listeners.remove(self._entry)
+
+
+class LocalReference:
+    """Mirror of firebase_admin.db.Reference"""
+
+    def __init__(self, database, parts):
+        self._database = database
+        self._parts = parts
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return '/' + '/'.join(self._parts)
+
+    def child(self, path):
+        return LocalReference(self._database, self._parts + LocalRealtimeDatabase._split(path))
+
+    def get(self):
+        with self._database._lock:
+            value = copy.deepcopy(self._database._get(self._parts))
+            self._database.stats['reads'] += 1
+            self._database.stats['bytes_read'] += len(json.dumps(value))
+        return value
+
+    def set(self, value):
+        self._database._write([(self._parts, value)])
+
+    def update(self, value):
+        """Multi-path update: keys may contain '/', None values delete"""
+        if not value:
+            raise ValueError("Update value must be a non-empty dictionary")
+        self._database._write([
+            (self._parts + LocalRealtimeDatabase._split(key), child_value)
+            for key, child_value in value.items()
+        ])
+
+    def delete(self):
+        self._database._write([(self._parts, None)])
+
+    def listen(self, callback):
+        """Call callback(event) for every change at or below this path"""
+        entry = (self._parts, callback)
+        with self._database._lock:
+            self._database._listeners.append(entry)
+        callback(LocalEvent('put', '/', self.get()))
+        return LocalListenerRegistration(self._database, entry)
@@ -1,29 +1,91 @@
 import os
-import json
+import mmap
+import threading
 from datetime import datetime
 import streamlit as st
 
-class LocalStorage:
+from services.atomic_io import AtomicFile
+from services.blob_store import BlobStore
+from services.compression import Compression
+from services.file_lock import FileLock
+from services.storage_backend import StorageBackend
+from services.storage_cache import UserDataCache
+from services.storage_codecs import JsonCodec, StorageCodecs
+from services.storage_journal import RecordJournal
+from services.storage_partitions import PartitionedCollection
+from services.tenant_registry import TenantRegistry
+from services.usage_ledger import UsageLedger
+from services.user_directory import UserDirectory
+
+class LocalStorage(StorageBackend):
     """Local file storage for documents (before S3)"""
     
     DATA_DIR = "user_data"
     DOCUMENTS_DIR = "documents"
     
+    # Record collections saved as snapshot + append-only journal
+    JOURNALED_DATA_TYPES = {
+        'matters', 'documents', 'tasks', 'court_deadlines',
+        'portal_clients', 'case_comparisons'
+    }
+    
+    # <data_type>.lock next to each collection serializes its writers
+    LOCK_SUFFIX = ".lock"
+    _merge_stats = {'merges': 0, 'record_conflicts': 0, 'overwrites': 0}
+    _merge_stats_lock = threading.Lock()
+    
+    # Date-keyed collections split into monthly segments → date field used
+    PARTITIONED_DATA_TYPES = {
+        'time_entries': 'date',
+        'invoices': 'date',
+        'events': 'date'
+    }
+    
+    # Directories already created by this process (skips makedirs on every access)
+    _known_directories = set()
+    
+    @staticmethod
+    def _ensure_directory(path):
+        """Create a directory once per process"""
+        if path not in LocalStorage._known_directories:
+            os.makedirs(path, exist_ok=True)
+            LocalStorage._known_directories.add(path)
+        return path
+    
+    @staticmethod
+    def forget_directories():
+        """Forget created directories (call after deleting or moving user directories)"""
+        LocalStorage._known_directories.clear()
+        TenantRegistry.forget()
+    
     @staticmethod
     def get_user_directory(user_email):
-        """Get user-specific directory"""
-        safe_email = user_email.replace('@', '_at_').replace('.', '_').replace('/', '_')
-        user_dir = os.path.join(LocalStorage.DATA_DIR, safe_email)
-        os.makedirs(user_dir, exist_ok=True)
-        return user_dir
+        """Get user-specific directory (user_data/tenants/<shard>/<safe_email>, see TenantRegistry)"""
+        return TenantRegistry.resolve(LocalStorage.DATA_DIR, user_email)
+    
+    @staticmethod
+    def list_tenants():
+        """email → {path, created, size} for every tenant, from the registry (no directory scan)"""
+        return TenantRegistry.tenants(LocalStorage.DATA_DIR)
+    
+    @staticmethod
+    def list_collections(user_email):
+        """Data types stored for a user: <data_type>.json collections and partitioned collection directories"""
+        user_dir = LocalStorage.get_user_directory(user_email)
+        data_types = set()
+        for entry in os.scandir(user_dir):
+            if entry.is_file() and entry.name.endswith('.json') and entry.name != UsageLedger.LEDGER_FILE:
+                data_types.add(entry.name[:-len('.json')])
+            elif entry.is_dir() and LocalStorage.is_partitioned(entry.name) and PartitionedCollection.exists(user_dir, entry.name):
+                data_types.add(entry.name)
+        return sorted(data_types)
     
     @staticmethod
     def get_documents_directory(user_email):
         """Get user's documents directory"""
         user_dir = LocalStorage.get_user_directory(user_email)
         docs_dir = os.path.join(user_dir, LocalStorage.DOCUMENTS_DIR)
-        os.makedirs(docs_dir, exist_ok=True)
-        return docs_dir
+        return LocalStorage._ensure_directory(docs_dir)
     
     @staticmethod
     def save_document(user_email, document_id, file_content, filename, content_type):
@@ -35,80 +97,167 @@ class LocalStorage:
         └── user_at_email_com/
             ├── documents.json          ← Metadata only
             └── documents/              ← Actual files here
-                ├── doc-123_contract.pdf
-                └── doc-456_brief.docx
+                ├── index.json          ← document_id → content hash
+                └── blobs/3f/a2/3fa2…   ← Stored once per unique content
         """
         try:
             docs_dir = LocalStorage.get_documents_directory(user_email)
             
-            # Create safe filename
-            safe_filename = f"{document_id}_{filename}"
-            file_path = os.path.join(docs_dir, safe_filename)
-            
-            # Save the actual file
-            with open(file_path, 'wb') as f:
-                f.write(file_content)
-            
-            # Return the relative path
-            return file_path
+            # Identical bytes are stored once (temp + fsync + rename, never a torn file)
+            return BlobStore.put(
+                docs_dir, document_id, file_content, filename, content_type,
+                on_totals=LocalStorage._document_usage_recorder(user_email)
+            )
         
         except Exception as e:
             st.error(f"Error saving document: {e}")
             return None
+    
+    @staticmethod
+    def _legacy_document_path(docs_dir, document_id, filename):
+        """Path used for documents saved before the blob store"""
+        return os.path.join(docs_dir, f"{document_id}_{filename}")
             
     @staticmethod
-    def load_all_users():
-        """Load all registered users from Firebase"""
+    def load_all_users(refresh=False):
+        """Load all registered users from Firebase (cached for UserDirectory.CACHE_TTL seconds)"""
         try:
-            from services.firebase_config import db
-            ref = db.reference('users')
-            users = ref.get()
-            
-            if not users:
-                return {}
-        
-            # Convert back to email keys
-            email_users = {}
-            for safe_key, user_data in users.items():
-                original_email = user_data.get('original_email', safe_key.replace('_DOT_', '.').replace('_AT_', '@'))
-                email_users[original_email] = user_data
-            
-            return email_users
+            return UserDirectory.load(refresh=refresh)
         except:
             return {}
     
     @staticmethod
     def save_all_users(users_dict):
-        """Save all users to Firebase"""
+        """Save all users to Firebase (only added/changed/removed users are sent)"""
         try:
-            from services.firebase_config import db
-            ref = db.reference('users')
-            
-            # Convert emails to safe keys (replace . and @ and other invalid chars)
-            safe_users = {}
-            for email, user_data in users_dict.items():
-                safe_key = email.replace('.', '_DOT_').replace('@', '_AT_').replace('$', '_').replace('#', '_').replace('[', '_').replace(']', '_').replace('/', '_')
-                safe_users[safe_key] = {
-                    **user_data,
-                    'original_email': email  # Store original email
-                }
-            
-            ref.set(safe_users)
+            UserDirectory.save_all(users_dict)
         except Exception as e:
             st.error(f"❌ Error saving users: {e}")
+    
+    @staticmethod
+    def save_user(email, user_data):
+        """Create or update a single user in Firebase"""
+        try:
+            UserDirectory.save_user(email, user_data)
+        except Exception as e:
+            st.error(f"❌ Error saving user: {e}")
+    
+    @staticmethod
+    def delete_user(email):
+        """Delete a single user from Firebase"""
+        try:
+            UserDirectory.delete_user(email)
+            return True
+        except Exception as e:
+            st.error(f"❌ Error deleting user: {e}")
+            return False
+    
+    @staticmethod
+    def add_user_listener(callback):
+        """Call callback(email, user_data_or_None) when a user changes; returns an unsubscribe function"""
+        return UserDirectory.add_listener(callback)
+    
+    @staticmethod
+    def save_document_stream(user_email, document_id, fileobj, filename, content_type):
+        """
+        Save a document from a binary file-like object without reading it into memory
+        
+        The content is hashed while it is written in BlobStore.CHUNK_SIZE chunks.
+        Returns the stored file path.
+        """
+        try:
+            docs_dir = LocalStorage.get_documents_directory(user_email)
+            return BlobStore.put_stream(
+                docs_dir, document_id, fileobj, filename, content_type,
+                on_totals=LocalStorage._document_usage_recorder(user_email)
+            )
+        
+        except Exception as e:
+            st.error(f"Error saving document: {e}")
+            return None
+    
+    @staticmethod
+    def _document_path(user_email, document_id, filename):
+        """Resolve a document to its file on disk, or None"""
+        docs_dir = LocalStorage.get_documents_directory(user_email)
+        file_path = BlobStore.resolve(docs_dir, document_id)
+        if file_path is None:
+            file_path = LocalStorage._legacy_document_path(docs_dir, document_id, filename)
+        
+        return file_path if os.path.exists(file_path) else None
+    
+    @staticmethod
+    def document_exists(user_email, document_id, filename):
+        """Whether a document's file is stored (index lookup, nothing is read)"""
+        return LocalStorage._document_path(user_email, document_id, filename) is not None
+    
     @staticmethod
     def get_document(user_email, document_id, filename):
         """Retrieve document file"""
         try:
-            docs_dir = LocalStorage.get_documents_directory(user_email)
-            safe_filename = f"{document_id}_{filename}"
-            file_path = os.path.join(docs_dir, safe_filename)
+            file_path = LocalStorage._document_path(user_email, document_id, filename)
+            if file_path is None:
+                return None
+            
+            return Compression.read_file(file_path)
+        
+        except Exception as e:
+            st.error(f"Error retrieving document: {e}")
+            return None
+    
+    @staticmethod
+    def open_document(user_email, document_id, filename):
+        """Open a document for streaming reads (caller closes it); None if missing"""
+        try:
+            file_path = LocalStorage._document_path(user_email, document_id, filename)
+            if file_path is None:
+                return None
             
-            if not os.path.exists(file_path):
+            return Compression.open_file(file_path)
+        
+        except Exception as e:
+            st.error(f"Error retrieving document: {e}")
+            return None
+    
+    @staticmethod
+    def iter_document(user_email, document_id, filename, chunk_size=None):
+        """Yield a document's bytes in chunks"""
+        f = LocalStorage.open_document(user_email, document_id, filename)
+        if f is None:
+            return
+        
+        with f:
+            yield from BlobStore.iter_chunks(f, chunk_size)
+    
+    @staticmethod
+    def map_document(user_email, document_id, filename):
+        """
+        Memory-map a document read-only for zero-copy access
+        
+        Slicing the returned mmap only pages in what is touched. Compressed
+        files are decompressed into an anonymous map instead. Returns None
+        if the document is missing, b'' if it is empty; close it when done.
+        """
+        try:
+            file_path = LocalStorage._document_path(user_email, document_id, filename)
+            if file_path is None:
                 return None
             
             with open(file_path, 'rb') as f:
-                return f.read()
+                header = Compression.read_header(f)
+                if header is not None:
+                    codec_id, size = header
+                    if size == 0:
+                        return b''
+                    mapped = mmap.mmap(-1, size)
+                    for data in Compression.iter_decompressed(f, codec_id, size=size):
+                        mapped.write(data)
+                    mapped.seek(0)
+                    return mapped
+                
+                if os.fstat(f.fileno()).st_size == 0:
+                    return b''
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
         
         except Exception as e:
             st.error(f"Error retrieving document: {e}")
@@ -116,79 +265,367 @@ class LocalStorage:
     
     @staticmethod
     def delete_document(user_email, document_id, filename):
-        """Delete document file"""
+        """Delete document file (the blob is removed once no document references it)"""
         try:
             docs_dir = LocalStorage.get_documents_directory(user_email)
-            safe_filename = f"{document_id}_{filename}"
-            file_path = os.path.join(docs_dir, safe_filename)
-            
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            on_totals = LocalStorage._document_usage_recorder(user_email)
+            if BlobStore.release(docs_dir, document_id, on_totals):
                 return True
             
-            return False
+            return BlobStore.release_legacy(docs_dir, f"{document_id}_{filename}", on_totals)
         
         except Exception as e:
             st.error(f"Error deleting document: {e}")
             return False
     
+    @staticmethod
+    def get_dedup_stats(user_email):
+        """Bytes saved by storing identical document content once, and by compression"""
+        try:
+            return BlobStore.dedup_stats(LocalStorage.get_documents_directory(user_email))
+        except Exception:
+            return {
+                'documents': 0, 'unique_blobs': 0, 'logical_bytes': 0, 'unique_bytes': 0,
+                'stored_bytes': 0, 'dedup_saved_bytes': 0, 'compression_saved_bytes': 0,
+                'saved_bytes': 0, 'dedup_ratio': 1.0, 'compression_ratio': 1.0
+            }
+    
     @staticmethod
     def list_user_documents(user_email):
-        """List all document files for a user"""
+        """List all document files for a user (served from the documents manifest)"""
         try:
-            docs_dir = LocalStorage.get_documents_directory(user_email)
-            
-            files = []
-            for filename in os.listdir(docs_dir):
-                file_path = os.path.join(docs_dir, filename)
-                if os.path.isfile(file_path):
-                    files.append({
-                        'filename': filename,
-                        'size': os.path.getsize(file_path),
-                        'modified': datetime.fromtimestamp(os.path.getmtime(file_path))
-                    })
-            
-            return files
+            return BlobStore.list_documents(LocalStorage.get_documents_directory(user_email))
         
-        except Exception as e:
+        except Exception:
             return []
     
     @staticmethod
-    def save_user_data(user_email, data_type, data):
-        """Save user data (metadata only, NO file content!)"""
+    def get_document_usage(user_email):
+        """Document count and total bytes for a user without scanning files"""
+        try:
+            return BlobStore.usage(LocalStorage.get_documents_directory(user_email))
+        
+        except Exception:
+            return {'documents': 0, 'bytes': 0, 'stored_bytes': 0}
+    
+    @staticmethod
+    def rebuild_document_manifest(user_email):
+        """Rebuild a user's documents manifest from disk"""
+        index = BlobStore.rebuild_index(LocalStorage.get_documents_directory(user_email))
+        LocalStorage._document_usage_recorder(user_email)(index['totals'])
+        return index
+    
+    @staticmethod
+    def _document_usage_recorder(user_email):
+        """Callback copying new document manifest totals into the usage ledger"""
+        user_dir = LocalStorage.get_user_directory(user_email)
+        return lambda totals: UsageLedger.record_documents(user_email, user_dir, totals)
+    
+    @staticmethod
+    def get_usage(user_email):
+        """
+        Usage counters for a tenant (documents, bytes, matters, records per collection)
+        
+        Read from the usage ledger, which every DataSecurity save and
+        document change keeps current; a tenant without a ledger yet is
+        scanned once to build it.
+        """
+        usage = UsageLedger.read(LocalStorage.get_user_directory(user_email))
+        if usage is None:
+            usage, _ = UsageLedger.reconcile(user_email)
+        return usage
+    
+    @staticmethod
+    def get_organization_usage(org_code, members):
+        """
+        ORG_COUNTERS summed over an organization, plus 'members'
+        
+        Read from the organization's aggregate ledger, which member saves
+        keep current; members() (returning the member emails) is only
+        called to build it the first time.
+        """
+        usage = UsageLedger.read_organization(org_code)
+        if usage is None:
+            usage = UsageLedger.rebuild_organization(org_code, members())
+        return usage
+    
+    @staticmethod
+    def reconcile_usage(user_email):
+        """Rebuild a tenant's usage ledger from a full scan; returns (usage, drift)"""
+        return UsageLedger.reconcile(user_email)
+    
+    @staticmethod
+    def lock_path(user_email, data_type):
+        """Lock file serializing writers of one collection across processes"""
+        return os.path.join(LocalStorage.get_user_directory(user_email), f"{data_type}{LocalStorage.LOCK_SUFFIX}")
+    
+    @staticmethod
+    def save_user_data(user_email, data_type, data, base=None):
+        """
+        Save user data (metadata only, NO file content!)
+        
+        Writers of a collection are serialized with an exclusive file lock.
+        When base (the collection as this writer loaded it) is given, the
+        save is optimistic: if the stored collection changed since base,
+        record lists are merged record by record instead of overwriting the
+        other writer's edits. Returns the data actually stored.
+        """
+        with FileLock.exclusive(LocalStorage.lock_path(user_email, data_type)):
+            if base is not None:
+                found, current = LocalStorage._load_user_data(user_email, data_type)
+                if found and current != base:
+                    data = LocalStorage._merge_concurrent(base, data, current)
+            
+            LocalStorage._save_user_data(user_email, data_type, data)
+        
+        return data
+    
+    @staticmethod
+    def _merge_concurrent(base, data, current):
+        """Merge our edits (base -> data) into a collection someone else changed"""
+        merged = RecordJournal.merge(base, data, current)
+        with LocalStorage._merge_stats_lock:
+            LocalStorage._merge_stats['merges'] += 1
+            if merged is None:
+                # Not a record list: last writer wins
+                LocalStorage._merge_stats['overwrites'] += 1
+                return data
+            LocalStorage._merge_stats['record_conflicts'] += merged[1]
+        return merged[0]
+    
+    @staticmethod
+    def concurrency_stats():
+        """Lock wait latency plus merge counts for this process"""
+        stats = FileLock.stats()
+        with LocalStorage._merge_stats_lock:
+            stats.update(LocalStorage._merge_stats)
+        return stats
+    
+    @staticmethod
+    def _save_user_data(user_email, data_type, data):
         user_dir = LocalStorage.get_user_directory(user_email)
         file_path = os.path.join(user_dir, f"{data_type}.json")
         
+        try:
+            if LocalStorage.is_partitioned(data_type) and isinstance(data, list):
+                PartitionedCollection.save(user_email, user_dir, data_type, LocalStorage.PARTITIONED_DATA_TYPES[data_type], data)
+                
+                # Collections saved before partitioning are migrated on first save
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                    RecordJournal.clear(file_path)
+                    RecordJournal.forget(file_path)
+            else:
+                LocalStorage._persist_user_data(user_email, data_type, file_path, data)
+        finally:
+            UserDataCache.invalidate((user_email, data_type))
+    
+    @staticmethod
+    def _persist_user_data(user_email, data_type, file_path, data):
+        """Write a collection as a journal append or a full snapshot"""
+        # Journaled collections append only the changed records
+        if LocalStorage.is_journaled(data_type) and RecordJournal.is_journalable(data):
+            baseline = RecordJournal.get_baseline(file_path)
+            if baseline is None and os.path.exists(file_path):
+                LocalStorage._read_user_data(user_email, data_type, file_path)
+                baseline = RecordJournal.get_baseline(file_path)
+            
+            if baseline is not None:
+                ops = RecordJournal.diff(baseline, data)
+                if ops is not None and not RecordJournal.needs_compaction(baseline, len(data), len(ops)):
+                    if ops:
+                        RecordJournal.append(file_path, baseline, ops, StorageCodecs.for_data_type(data_type))
+                    return
+        
+        if not LocalStorage.is_journaled(data_type):
+            LocalStorage._write_snapshot(user_email, file_path, data, StorageCodecs.for_data_type(data_type))
+            return
+        
+        # A new generation makes any existing journal stale before it is removed
+        generation = RecordJournal.new_generation()
+        LocalStorage._write_snapshot(user_email, file_path, data, StorageCodecs.for_data_type(data_type), generation)
+        RecordJournal.clear(file_path)
+        RecordJournal.remember(file_path, data, 0, generation)
+    
+    @staticmethod
+    def _write_snapshot(user_email, file_path, data, codec=None, generation=None):
+        """Write the full collection file (JSON unless another codec is given)"""
         # Add metadata
         secure_data = {
             'owner': user_email,
             'last_modified': datetime.now().isoformat(),
             'data': data
         }
+        if generation is not None:
+            secure_data['generation'] = generation      # Journal generation (see RecordJournal)
         
-        with open(file_path, 'w') as f:
-            json.dump(secure_data, f, default=str, indent=2)
+        LocalStorage._write_data_file(file_path, secure_data, codec)
     
     @staticmethod
-    def load_user_data(user_email, data_type, default=None):
-        """Load user data"""
-        user_dir = LocalStorage.get_user_directory(user_email)
-        file_path = os.path.join(user_dir, f"{data_type}.json")
+    def _write_data_file(file_path, value, codec=None):
+        """Atomically write an encoded (and possibly compressed) data file"""
+        payload = (codec or JsonCodec).encode(value)
+        if Compression.should_compress(payload):
+            payload = Compression.compress_bytes(payload)
         
+        AtomicFile.write_bytes(file_path, payload)
+    
+    @staticmethod
+    def is_journaled(data_type):
+        """Check if a data type is stored as snapshot + append-only journal"""
+        return data_type in LocalStorage.JOURNALED_DATA_TYPES
+    
+    @staticmethod
+    def is_partitioned(data_type):
+        """Check if a data type is stored as monthly segments"""
+        return data_type in LocalStorage.PARTITIONED_DATA_TYPES
+    
+    @staticmethod
+    def compact_user_data(user_email, data_type):
+        """Fold a collection's journal into a fresh snapshot"""
+        file_path = os.path.join(LocalStorage.get_user_directory(user_email), f"{data_type}.json")
         if not os.path.exists(file_path):
-            return default if default is not None else []
+            return
         
         try:
-            with open(file_path, 'r') as f:
-                secure_data = json.load(f)
-            
-            # Verify owner
-            if secure_data.get('owner') != user_email:
-                st.error("🚨 Security violation: Data owner mismatch!")
+            with FileLock.exclusive(LocalStorage.lock_path(user_email, data_type)):
+                found, data = LocalStorage._read_user_data(user_email, data_type, file_path)
+                if not found:
+                    return
+                
+                generation = RecordJournal.new_generation()
+                LocalStorage._write_snapshot(user_email, file_path, data, StorageCodecs.for_data_type(data_type), generation)
+                RecordJournal.clear(file_path)
+                RecordJournal.remember(file_path, data, 0, generation)
+        finally:
+            UserDataCache.invalidate((user_email, data_type))
+    
+    @staticmethod
+    def _data_files(file_path):
+        """Files whose state determines a collection's contents"""
+        return (file_path, RecordJournal.journal_path(file_path))
+    
+    @staticmethod
+    def read_json_file(file_path):
+        """Parse a collection file (JSON or binary codec, plain or compressed)"""
+        return StorageCodecs.decode(Compression.read_file(file_path))
+    
+    @staticmethod
+    def _read_user_data(user_email, data_type, file_path):
+        """
+        Read a collection from disk, replaying its journal
+        
+        Returns (found, data); found is False when there is no stored data
+        for this owner.
+        """
+        secure_data = LocalStorage.read_json_file(file_path)
+        
+        # Verify owner
+        if secure_data.get('owner') != user_email:
+            st.error("🚨 Security violation: Data owner mismatch!")
+            return False, None
+        
+        if 'data' not in secure_data:
+            return False, None
+        data = secure_data['data']
+        
+        # Replay journaled changes made since this snapshot (a journal of another generation is stale)
+        if isinstance(data, list):
+            generation = secure_data.get('generation')
+            journal_generation, ops = RecordJournal.read_journal(RecordJournal.journal_path(file_path))
+            if journal_generation != generation:
+                ops = []
+            data = RecordJournal.replay(data, ops)
+            if LocalStorage.is_journaled(data_type):
+                RecordJournal.remember(file_path, data, len(ops), generation, journal_generation)
+        
+        return True, data
+    
+    @staticmethod
+    def load_user_data(user_email, data_type, default=None):
+        """Load user data (served from the process-wide cache when unchanged on disk)"""
+        try:
+            found, data = LocalStorage._load_user_data(user_email, data_type)
+            if not found:
                 return default if default is not None else []
-            
-            return secure_data.get('data', default if default is not None else [])
+            return data
         
         except Exception as e:
             st.error(f"Error loading data: {e}")
             return default if default is not None else []
+    
+    @staticmethod
+    def _load_user_data(user_email, data_type):
+        """Load a collection; returns (found, data) and raises on read errors"""
+        user_dir = LocalStorage.get_user_directory(user_email)
+        file_path = os.path.join(user_dir, f"{data_type}.json")
+        partitioned = LocalStorage.is_partitioned(data_type) and PartitionedCollection.exists(user_dir, data_type)
+        
+        if not partitioned and not os.path.exists(file_path):
+            return False, None
+        
+        cache_key = (user_email, data_type)
+        if partitioned:
+            data_files = PartitionedCollection.data_files(user_dir, data_type)
+        else:
+            data_files = LocalStorage._data_files(file_path)
+        cached = UserDataCache.get(cache_key, data_files)
+        if cached is not None:
+            return True, cached
+        
+        # Shared lock so a snapshot and its journal are read as one version
+        with FileLock.shared(LocalStorage.lock_path(user_email, data_type)):
+            version = UserDataCache.version(cache_key)
+            if partitioned:
+                found, data = True, PartitionedCollection.load(user_email, user_dir, data_type)
+            else:
+                found, data = LocalStorage._read_user_data(user_email, data_type, file_path)
+            
+            # Still under the lock: the file state recorded must be the one read
+            if found:
+                UserDataCache.put(cache_key, data_files, data, version)
+        
+        return found, data
+    
+    @staticmethod
+    def load_range(user_email, data_type, start=None, end=None):
+        """
+        Load records dated within [start, end] (inclusive, date or 'YYYY-MM-DD')
+        
+        Partitioned collections read only the monthly segments that overlap
+        the range; other collections are filtered after a full load.
+        """
+        user_dir = LocalStorage.get_user_directory(user_email)
+        if LocalStorage.is_partitioned(data_type) and PartitionedCollection.exists(user_dir, data_type):
+            try:
+                # Shared lock: a save removes the segment files it replaced once its index is committed
+                with FileLock.shared(LocalStorage.lock_path(user_email, data_type)):
+                    return PartitionedCollection.load_range(
+                        user_email, user_dir, data_type, LocalStorage.PARTITIONED_DATA_TYPES[data_type], start, end
+                    )
+            except Exception as e:
+                st.error(f"Error loading data: {e}")
+                return []
+        
+        field = LocalStorage.PARTITIONED_DATA_TYPES.get(data_type, 'date')
+        return StorageBackend.filter_range(LocalStorage.load_user_data(user_email, data_type), field, start, end)
+    
+    @staticmethod
+    def compact_segments(user_email, data_type, before_year):
+        """Merge monthly segments older than before_year into yearly segments"""
+        user_dir = LocalStorage.get_user_directory(user_email)
+        if not (LocalStorage.is_partitioned(data_type) and PartitionedCollection.exists(user_dir, data_type)):
+            return 0
+        
+        try:
+            with FileLock.exclusive(LocalStorage.lock_path(user_email, data_type)):
+                return PartitionedCollection.compact(
+                    user_email, user_dir, data_type, LocalStorage.PARTITIONED_DATA_TYPES[data_type], before_year
+                )
+        finally:
+            UserDataCache.invalidate((user_email, data_type))
+    
+    @staticmethod
+    def cache_stats():
+        """Read cache hit/miss counters"""
+        return UserDataCache.stats()
@@ -0,0 +1,418 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+import streamlit as st
+
+from services.storage_backend import StorageBackend
+from services.storage_journal import RecordJournal
+from services.storage_codecs import JsonCodec
+
+
+class SQLiteStorage(StorageBackend):
+    """
+    Embedded SQLite backend for user data
+
+    One shared database with an owner column. Record collections (lists of
+    dicts with unique 'id') are stored row-by-row so they can be queried and
+    updated individually; anything else is stored as a single JSON value.
+    """
+
+    DB_PATH = os.path.join("user_data", "storage.db")
+
+    # Record fields mapped to indexed columns
+    DATE_FIELDS = ('date', 'due_date', 'upload_date', 'created_date', 'created_at')
+    MATTER_FIELDS = ('matter_id', 'matter')
+
+    _local = threading.local()
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS records (
+            owner TEXT NOT NULL,
+            data_type TEXT NOT NULL,
+            record_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            record_date TEXT,
+            matter_id TEXT,
+            body TEXT NOT NULL,
+            PRIMARY KEY (owner, data_type, record_id)
+        );
+        CREATE INDEX IF NOT EXISTS idx_records_position ON records (owner, data_type, position);
+        CREATE INDEX IF NOT EXISTS idx_records_date ON records (owner, data_type, record_date);
+        CREATE INDEX IF NOT EXISTS idx_records_matter ON records (owner, data_type, matter_id);
+        CREATE TABLE IF NOT EXISTS collections (
+            owner TEXT NOT NULL,
+            data_type TEXT NOT NULL,
+            last_modified TEXT NOT NULL,
+            body TEXT NOT NULL,
+            PRIMARY KEY (owner, data_type)
+        );
+    """
+
+    @staticmethod
+    def get_connection():
+        """Get this thread's connection, creating the schema on first use"""
+        conn = getattr(SQLiteStorage._local, 'conn', None)
+        if conn is not None and SQLiteStorage._local.path == SQLiteStorage.DB_PATH:
+            return conn
+
+        db_dir = os.path.dirname(SQLiteStorage.DB_PATH)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+
+        conn = sqlite3.connect(SQLiteStorage.DB_PATH, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SQLiteStorage.SCHEMA)
+
+        SQLiteStorage._local.conn = conn
+        SQLiteStorage._local.path = SQLiteStorage.DB_PATH
+        return conn
+
+    @staticmethod
+    def close():
+        """Close this thread's connection"""
+        conn = getattr(SQLiteStorage._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            SQLiteStorage._local.conn = None
+
+    @staticmethod
+    def _row_for(record, position):
+        """Build a records row from a record dict"""
+        record_date = None
+        for field in SQLiteStorage.DATE_FIELDS:
+            if record.get(field):
+                record_date = str(record[field])[:10]
+                break
+
+        matter_id = None
+        for field in SQLiteStorage.MATTER_FIELDS:
+            if record.get(field):
+                matter_id = str(record[field])
+                break
+
+        return (
+            json.dumps(record['id']),
+            position,
+            record_date,
+            matter_id,
+            json.dumps(record, default=JsonCodec._default)
+        )
+
+    @staticmethod
+    def save_user_data(user_email, data_type, data, base=None):
+        """
+        Save user data, touching only rows that changed
+
+        With base, concurrent edits made since base was loaded are merged
+        record by record (see LocalStorage.save_user_data). Returns the data
+        actually stored.
+        """
+        conn = SQLiteStorage.get_connection()
+
+        with conn:
+            if base is not None:
+                # Take the write lock before reading so check + write are atomic
+                conn.execute("BEGIN IMMEDIATE")
+                found, current = SQLiteStorage._read_collection(conn, user_email, data_type)
+                if found and current != base:
+                    merged = RecordJournal.merge(base, data, current)
+                    if merged is not None:
+                        data = merged[0]
+
+            if not RecordJournal.is_journalable(data):
+                conn.execute("DELETE FROM records WHERE owner = ? AND data_type = ?", (user_email, data_type))
+                conn.execute(
+                    "INSERT OR REPLACE INTO collections (owner, data_type, last_modified, body) VALUES (?, ?, ?, ?)",
+                    (user_email, data_type, datetime.now().isoformat(), json.dumps(data, default=JsonCodec._default))
+                )
+                return data
+
+            conn.execute("DELETE FROM collections WHERE owner = ? AND data_type = ?", (user_email, data_type))
+
+            existing = {
+                record_id: (position, body)
+                for record_id, position, body in conn.execute(
+                    "SELECT record_id, position, body FROM records WHERE owner = ? AND data_type = ?",
+                    (user_email, data_type)
+                )
+            }
+
+            # Keep stored positions while the relative order is unchanged,
+            # otherwise renumber everything
+            next_position = max((p for p, _ in existing.values()), default=-1) + 1
+            last_position = -1
+            rows = []
+            for record in data:
+                record_id = json.dumps(record['id'])
+                stored = existing.get(record_id)
+                if stored is not None:
+                    position = stored[0]
+                else:
+                    position = next_position
+                    next_position += 1
+
+                if position <= last_position:
+                    rows = None
+                    break
+                last_position = position
+                rows.append((record, position, stored))
+
+            if rows is None:
+                rows = [(record, index, existing.get(json.dumps(record['id']))) for index, record in enumerate(data)]
+
+            changed = []
+            seen = set()
+            for record, position, stored in rows:
+                row = SQLiteStorage._row_for(record, position)
+                seen.add(row[0])
+                if stored is None or stored != (position, row[4]):
+                    changed.append((user_email, data_type) + row)
+
+            removed = [(user_email, data_type, record_id) for record_id in existing if record_id not in seen]
+
+            if removed:
+                conn.executemany(
+                    "DELETE FROM records WHERE owner = ? AND data_type = ? AND record_id = ?",
+                    removed
+                )
+            if changed:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO records "
+                    "(owner, data_type, record_id, position, record_date, matter_id, body) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    changed
+                )
+
+        return data
+
+    @staticmethod
+    def _read_collection(conn, user_email, data_type):
+        """Read a collection; returns (found, data)"""
+        row = conn.execute(
+            "SELECT body FROM collections WHERE owner = ? AND data_type = ?",
+            (user_email, data_type)
+        ).fetchone()
+        if row is not None:
+            return True, json.loads(row[0])
+
+        rows = conn.execute(
+            "SELECT body FROM records WHERE owner = ? AND data_type = ? ORDER BY position",
+            (user_email, data_type)
+        ).fetchall()
+        if not rows:
+            return False, None
+
+        return True, [json.loads(body) for body, in rows]
+
+    @staticmethod
+    def load_user_data(user_email, data_type, default=None):
+        """Load user data"""
+        empty = default if default is not None else []
+
+        try:
+            found, data = SQLiteStorage._read_collection(SQLiteStorage.get_connection(), user_email, data_type)
+            return data if found else empty
+
+        except Exception as e:
+            st.error(f"Error loading data: {e}")
+            return empty
+
+    @staticmethod
+    def list_collections(user_email):
+        """Data types stored for a user (record tables and whole-body collections)"""
+        rows = SQLiteStorage.get_connection().execute(
+            "SELECT DISTINCT data_type FROM records WHERE owner = ? "
+            "UNION SELECT data_type FROM collections WHERE owner = ? ORDER BY data_type",
+            (user_email, user_email)
+        ).fetchall()
+        return [data_type for data_type, in rows]
+
+    @staticmethod
+    def load_range(user_email, data_type, start=None, end=None):
+        """Load records dated within [start, end] using the record_date index"""
+        try:
+            return SQLiteStorage.query_records(user_email, data_type, start_date=start, end_date=end)
+        except Exception as e:
+            st.error(f"Error loading data: {e}")
+            return []
+
+    @staticmethod
+    def query_records(user_email, data_type, matter_id=None, start_date=None, end_date=None):
+        """Query records by matter and/or date range (YYYY-MM-DD, inclusive)"""
+        sql = "SELECT body FROM records WHERE owner = ? AND data_type = ?"
+        params = [user_email, data_type]
+
+        if matter_id is not None:
+            sql += " AND matter_id = ?"
+            params.append(str(matter_id))
+        if start_date is not None:
+            sql += " AND record_date >= ?"
+            params.append(str(start_date)[:10])
+        if end_date is not None:
+            sql += " AND record_date <= ?"
+            params.append(str(end_date)[:10])
+
+        sql += " ORDER BY position"
+        conn = SQLiteStorage.get_connection()
+        return [json.loads(body) for body, in conn.execute(sql, params)]
+
+    @staticmethod
+    def get_record(user_email, data_type, record_id):
+        """Get a single record by id"""
+        row = SQLiteStorage.get_connection().execute(
+            "SELECT body FROM records WHERE owner = ? AND data_type = ? AND record_id = ?",
+            (user_email, data_type, json.dumps(record_id))
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def upsert_record(user_email, data_type, record):
+        """Insert or update a single record in place"""
+        conn = SQLiteStorage.get_connection()
+        record_id = json.dumps(record['id'])
+
+        with conn:
+            row = conn.execute(
+                "SELECT position FROM records WHERE owner = ? AND data_type = ? AND record_id = ?",
+                (user_email, data_type, record_id)
+            ).fetchone()
+            if row is not None:
+                position = row[0]
+            else:
+                position = conn.execute(
+                    "SELECT COALESCE(MAX(position), -1) + 1 FROM records WHERE owner = ? AND data_type = ?",
+                    (user_email, data_type)
+                ).fetchone()[0]
+
+            conn.execute(
+                "INSERT OR REPLACE INTO records "
+                "(owner, data_type, record_id, position, record_date, matter_id, body) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_email, data_type) + SQLiteStorage._row_for(record, position)
+            )
+
+    @staticmethod
+    def delete_record(user_email, data_type, record_id):
+        """Delete a single record"""
+        conn = SQLiteStorage.get_connection()
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM records WHERE owner = ? AND data_type = ? AND record_id = ?",
+                (user_email, data_type, json.dumps(record_id))
+            )
+        return cursor.rowcount > 0
+
+    @staticmethod
+    def migrate_from_json(data_dir=None):
+        """
+        Copy every collection of every tenant under data_dir into SQLite
+
+        Tenants are enumerated from the tenant registry and their
+        collections through LocalStorage, so partitioned collections
+        (<data_type>/ segment directories) and journals are read the same
+        way the app reads them. Returns (users, collections) migrated.
+        """
+        from services.local_storage import LocalStorage
+        from services.tenant_registry import TenantRegistry
+
+        original = LocalStorage.DATA_DIR
+        LocalStorage.DATA_DIR = data_dir or original
+        users = set()
+        collections = 0
+
+        try:
+            for owner in TenantRegistry.emails(LocalStorage.DATA_DIR):
+                for data_type in LocalStorage.list_collections(owner):
+                    found, data = LocalStorage._load_user_data(owner, data_type)
+                    if not found:
+                        continue
+                    SQLiteStorage.save_user_data(owner, data_type, data)
+                    users.add(owner)
+                    collections += 1
+        finally:
+            LocalStorage.DATA_DIR = original
+
+        return len(users), collections
+
+
+def benchmark(sizes=(1000, 10000, 100000)):
+    """Compare JSON and SQLite load/save latency; returns result rows"""
+    import shutil
+    import tempfile
+    import time
+    from services.local_storage import LocalStorage
+
+    def make_entry(i):
+        return {
+            'id': i,
+            'date': f"2024-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
+            'matter': f"MAT-{i % 50}",
+            'activity': 'Research',
+            'description': f"Time entry number {i}",
+            'hours': 1.5,
+            'rate': 250.0,
+            'amount': 375.0,
+            'billable': True,
+            'billed': False
+        }
+
+    def timed(fn):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) * 1000
+
+    original_dirs = (LocalStorage.DATA_DIR, SQLiteStorage.DB_PATH)
+    tmp_dir = tempfile.mkdtemp()
+    results = []
+
+    try:
+        LocalStorage.DATA_DIR = os.path.join(tmp_dir, 'user_data')
+        SQLiteStorage.DB_PATH = os.path.join(tmp_dir, 'user_data', 'storage.db')
+
+        for size in sizes:
+            entries = [make_entry(i) for i in range(size)]
+
+            for name, backend in (('json', LocalStorage), ('sqlite', SQLiteStorage)):
+                email = f"bench{size}@example.com"
+                data_type = 'time_entries'
+                full_save = timed(lambda: backend.save_user_data(email, data_type, entries))
+                entries.append(make_entry(size))
+                append_save = timed(lambda: backend.save_user_data(email, data_type, entries))
+                entries.pop()
+                backend.save_user_data(email, data_type, entries)
+                load = timed(lambda: backend.load_user_data(email, data_type))
+                results.append((name, size, full_save, append_save, load))
+    finally:
+        SQLiteStorage.close()
+        LocalStorage.DATA_DIR, SQLiteStorage.DB_PATH = original_dirs
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SQLite storage backend tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    migrate_parser = subparsers.add_parser('migrate', help="Convert an existing user_data tree into SQLite")
+    migrate_parser.add_argument('--data-dir', default="user_data")
+    migrate_parser.add_argument('--db', default=SQLiteStorage.DB_PATH)
+
+    bench_parser = subparsers.add_parser('benchmark', help="Compare JSON vs SQLite load/save latency")
+    bench_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        SQLiteStorage.DB_PATH = args.db
+        user_count, collection_count = SQLiteStorage.migrate_from_json(args.data_dir)
+        print(f"Migrated {collection_count} collections for {user_count} users into {args.db}")
+    else:
+        print(f"{'backend':<8} {'records':>8} {'full save ms':>13} {'append ms':>10} {'load ms':>9}")
+        for name, size, full_save, append_save, load in benchmark(args.sizes):
+            print(f"{name:<8} {size:>8} {full_save:>13.1f} {append_save:>10.1f} {load:>9.1f}")
@@ -0,0 +1,90 @@
+import os
+
+
+class StorageBackend:
+    """
+    Interface every user-data backend implements
+
+    Backends are stateless classes with static methods so they can be
+    swapped without touching DataSecurity callers:
+
+        save_user_data(user_email, data_type, data, base=None)
+        load_user_data(user_email, data_type, default=None)
+        load_range(user_email, data_type, start=None, end=None)
+        list_collections(user_email)
+
+    Callers record what a save stored with record_usage(), which works the
+    same for every backend.
+    """
+
+    @staticmethod
+    def save_user_data(user_email, data_type, data, base=None):
+        """
+        Persist one data_type collection for a user and return what was stored
+
+        base is the collection as the caller loaded it; when given, edits
+        made by other writers since then must be merged, not overwritten.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def load_user_data(user_email, data_type, default=None):
+        """Load one data_type collection for a user"""
+        raise NotImplementedError
+
+    @staticmethod
+    def load_range(user_email, data_type, start=None, end=None):
+        """Load records whose date falls within [start, end]; backends override to avoid full loads"""
+        raise NotImplementedError
+
+    @staticmethod
+    def list_collections(user_email):
+        """Data types stored for a user"""
+        raise NotImplementedError
+
+    @staticmethod
+    def record_usage(user_email, data_type, data):
+        """Copy a saved collection's record count into the tenant's usage ledger (and its organization's)"""
+        if not isinstance(data, list):
+            return
+        from services.local_storage import LocalStorage
+        from services.usage_ledger import UsageLedger
+
+        UsageLedger.record_collection(user_email, LocalStorage.get_user_directory(user_email), data_type, len(data))
+
+    @staticmethod
+    def filter_range(records, field, start=None, end=None):
+        """Keep records whose field (date, datetime or ISO string) is within [start, end]"""
+        start = str(start)[:10] if start is not None else None
+        end = str(end)[:10] if end is not None else None
+
+        selected = []
+        for record in records:
+            value = record.get(field) if isinstance(record, dict) else None
+            if value is None:
+                continue
+            value = value.strftime('%Y-%m-%d') if hasattr(value, 'strftime') else str(value)[:10]
+            if (start and value < start) or (end and value > end):
+                continue
+            selected.append(record)
+        return selected
+
+
+# Backend name → "module:Class" (imported lazily so the JSON default has no sqlite cost)
+STORAGE_BACKENDS = {
+    'json': 'services.local_storage:LocalStorage',
+    'sqlite': 'services.sqlite_storage:SQLiteStorage',
+}
+
+DEFAULT_STORAGE_BACKEND = 'json'
+
+
+def get_storage_backend(name=None):
+    """Get the configured user-data backend (STORAGE_BACKEND env var, default json)"""
+    name = (name or os.getenv('STORAGE_BACKEND', DEFAULT_STORAGE_BACKEND)).lower()
+    if name not in STORAGE_BACKENDS:
+        raise ValueError(f"Unknown storage backend: {name}")
+
+    module_name, class_name = STORAGE_BACKENDS[name].split(':')
+    module = __import__(module_name, fromlist=[class_name])
+    return getattr(module, class_name)
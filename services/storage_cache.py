@@ -0,0 +1,107 @@
+import os
+import threading
+from collections import OrderedDict
+
+from services.storage_journal import RecordJournal
+
+
+class UserDataCache:
+    """
+    Process-wide LRU cache of parsed user data collections
+
+    Entries are keyed by (user_email, data_type) and validated against the
+    files' mtime/size plus a version counter bumped on every local save, so
+    writes from this process and from other processes both invalidate.
+    Callers always receive a private deep copy and may mutate it freely.
+    """
+
+    MAX_ENTRIES = 256
+
+    _entries = OrderedDict()
+    _versions = {}
+    _lock = threading.Lock()
+    _stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def file_state(paths):
+        """(mtime_ns, size, inode) for each path, None for missing files"""
+        state = []
+        for path in paths:
+            try:
+                st_result = os.stat(path)
+                state.append((st_result.st_mtime_ns, st_result.st_size, st_result.st_ino))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    @staticmethod
+    def get(key, paths):
+        """Get a private copy of cached data, or None on a miss"""
+        state = UserDataCache.file_state(paths)
+
+        with UserDataCache._lock:
+            entry = UserDataCache._entries.get(key)
+            if entry is not None and entry[0] == (UserDataCache._versions.get(key, 0), state):
+                UserDataCache._entries.move_to_end(key)
+                UserDataCache._stats['hits'] += 1
+                data = entry[1]
+            else:
+                UserDataCache._stats['misses'] += 1
+                return None
+
+        return RecordJournal.deep_copy(data)
+
+    @staticmethod
+    def put(key, paths, data, version=None):
+        """
+        Cache data as read from disk
+
+        Pass the version observed before reading so a save racing with the
+        read leaves the entry stale instead of caching outdated data.
+        """
+        state = UserDataCache.file_state(paths)
+        data = RecordJournal.deep_copy(data)
+
+        with UserDataCache._lock:
+            current_version = UserDataCache._versions.get(key, 0)
+            if version is not None and version != current_version:
+                return
+
+            UserDataCache._entries[key] = ((current_version, state), data)
+            UserDataCache._entries.move_to_end(key)
+            while len(UserDataCache._entries) > UserDataCache.MAX_ENTRIES:
+                UserDataCache._entries.popitem(last=False)
+                UserDataCache._stats['evictions'] += 1
+
+    @staticmethod
+    def version(key):
+        """Current save version for a key"""
+        with UserDataCache._lock:
+            return UserDataCache._versions.get(key, 0)
+
+    @staticmethod
+    def invalidate(key):
+        """Drop a key and bump its version (call on every save)"""
+        with UserDataCache._lock:
+            UserDataCache._versions[key] = UserDataCache._versions.get(key, 0) + 1
+            if UserDataCache._entries.pop(key, None) is not None:
+                UserDataCache._stats['invalidations'] += 1
+
+    @staticmethod
+    def clear():
+        """Drop every cached entry"""
+        with UserDataCache._lock:
+            for key in UserDataCache._entries:
+                UserDataCache._versions[key] = UserDataCache._versions.get(key, 0) + 1
+            UserDataCache._entries.clear()
+
+    @staticmethod
+    def stats():
+        """Hit/miss counters and current size"""
+        with UserDataCache._lock:
+            stats = dict(UserDataCache._stats)
+            stats['entries'] = len(UserDataCache._entries)
+
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,287 @@
+import os
+import json
+import base64
+import marshal
+from enum import Enum
+from decimal import Decimal
+from datetime import date, datetime, time, timedelta, timezone
+
+
+class JsonCodec:
+    """Indented JSON (the original format); dates and Decimals become strings, Enums their value"""
+
+    NAME = 'json'
+
+    @staticmethod
+    def _default(value):
+        # str/int Enums never get here: json writes them as their value already
+        if isinstance(value, Enum):
+            return value.value
+        return str(value)
+
+    @staticmethod
+    def encode(value):
+        return json.dumps(value, default=JsonCodec._default, indent=2).encode('utf-8')
+
+    @staticmethod
+    def decode(payload):
+        return json.loads(payload)
+
+    @staticmethod
+    def encode_line(value):
+        """Single-line form used for journal entries"""
+        return json.dumps(value, default=JsonCodec._default)
+
+
+class BinaryCodec:
+    """
+    Compact binary encoding that keeps native types
+
+    Layout:
+        MAGIC (4) | format version (1) | marshal body
+
+    Values are packed into marshal-friendly primitives. Tuples are reserved
+    as tags in the packed form:
+        ('T', y, m, d, H, M, S, us, utc_offset_s|None)  datetime
+        ('D', ordinal)                                 date
+        ('t', H, M, S, us)                             time
+        ('N', text)                                    Decimal
+        ('U', [items])                                 tuple
+        ('R', (keys, ...), (packed, ...), [(schema, v1, v2, ...)])
+                                                       list of records
+
+    Record lists are schema-tagged: each distinct key set is stored once and
+    rows carry only a schema number and their values, so field names are
+    not repeated per record. Enums are stored as their value and other
+    str subclasses as plain str, as the JSON codec writes them; anything
+    else unsupported is stored as str(), like the JSON codec's default. Only decode files this app wrote -
+    marshal is not meant for untrusted input.
+    """
+
+    NAME = 'binary'
+    MAGIC = b"\x89LDB"
+    VERSION = 1
+    MARSHAL_VERSION = 4
+
+    # Journal lines carrying a base64 binary op start with this marker
+    LINE_PREFIX = '~'
+
+    @staticmethod
+    def _pack(value):
+        kind = type(value)
+        if kind is str or kind is int or kind is float or kind is bool or value is None:
+            return value
+        if kind is dict:
+            pack = BinaryCodec._pack
+            return {k: pack(v) for k, v in value.items()}
+        if kind is list:
+            if value and all(type(item) is dict for item in value):
+                return BinaryCodec._pack_records(value)
+            pack = BinaryCodec._pack
+            return [pack(item) for item in value]
+        if kind is datetime:
+            offset = value.utcoffset()
+            return ('T', value.year, value.month, value.day, value.hour, value.minute,
+                    value.second, value.microsecond, int(offset.total_seconds()) if offset is not None else None)
+        if kind is date:
+            return ('D', value.toordinal())
+        if kind is time:
+            return ('t', value.hour, value.minute, value.second, value.microsecond)
+        if kind is Decimal:
+            return ('N', str(value))
+        if kind is tuple:
+            return ('U', [BinaryCodec._pack(item) for item in value])
+        if kind is bytes:
+            return value
+        if isinstance(value, Enum):
+            return BinaryCodec._pack(value.value)
+        if isinstance(value, str):
+            return str.__str__(value)
+        return str(value)
+
+    @staticmethod
+    def _pack_records(records):
+        pack = BinaryCodec._pack
+        schemas = {}
+        packed_columns = []
+        rows = []
+        for record in records:
+            keys = tuple(record)
+            schema = schemas.get(keys)
+            if schema is None:
+                schema = schemas[keys] = len(schemas)
+                packed_columns.append(set())
+
+            row = [schema]
+            for value in record.values():
+                kind = type(value)
+                if not (kind is str or kind is int or kind is float or kind is bool or value is None):
+                    packed_columns[schema].add(len(row))
+                    value = pack(value)
+                row.append(value)
+            rows.append(tuple(row))
+
+        # Per schema, the row positions holding packed values the decoder must visit
+        return ('R', tuple(schemas), tuple(tuple(sorted(c)) for c in packed_columns), rows)
+
+    @staticmethod
+    def _unpack(value):
+        kind = type(value)
+        if kind is dict:
+            unpack = BinaryCodec._unpack
+            return {k: unpack(v) for k, v in value.items()}
+        if kind is list:
+            unpack = BinaryCodec._unpack
+            return [unpack(item) for item in value]
+        if kind is not tuple:
+            return value
+
+        tag = value[0]
+        if tag == 'R':
+            return BinaryCodec._unpack_records(value[1], value[2], value[3])
+        if tag == 'T':
+            tz = timezone(timedelta(seconds=value[8])) if value[8] is not None else None
+            return datetime(*value[1:8], tzinfo=tz)
+        if tag == 'D':
+            return date.fromordinal(value[1])
+        if tag == 't':
+            return time(*value[1:5])
+        if tag == 'N':
+            return Decimal(value[1])
+        if tag == 'U':
+            return tuple(BinaryCodec._unpack(item) for item in value[1])
+        raise ValueError(f"Unknown binary tag: {tag!r}")
+
+    @staticmethod
+    def _unpack_records(schemas, packed_columns, rows):
+        unpack = BinaryCodec._unpack
+        records = []
+        for row in rows:
+            schema = row[0]
+            columns = packed_columns[schema]
+            if columns:
+                row = list(row)
+                for i in columns:
+                    row[i] = unpack(row[i])
+            records.append(dict(zip(schemas[schema], row[1:])))
+        return records
+
+    @staticmethod
+    def encode(value):
+        body = marshal.dumps(BinaryCodec._pack(value), BinaryCodec.MARSHAL_VERSION)
+        return BinaryCodec.MAGIC + bytes([BinaryCodec.VERSION]) + body
+
+    @staticmethod
+    def decode(payload):
+        if not StorageCodecs.is_binary(payload):
+            raise ValueError("Not a binary-encoded payload")
+        if payload[len(BinaryCodec.MAGIC)] != BinaryCodec.VERSION:
+            raise ValueError(f"Unsupported binary format version: {payload[len(BinaryCodec.MAGIC)]}")
+        return BinaryCodec._unpack(marshal.loads(payload[len(BinaryCodec.MAGIC) + 1:]))
+
+    @staticmethod
+    def encode_line(value):
+        return BinaryCodec.LINE_PREFIX + base64.b64encode(BinaryCodec.encode(value)).decode('ascii')
+
+
+class StorageCodecs:
+    """
+    Codec selection for stored collections
+
+    STORAGE_CODEC sets the default (json|binary) and STORAGE_CODECS picks
+    per data_type, e.g. STORAGE_CODECS="time_entries=binary,invoices=binary".
+    Reads detect the format from the payload, so collections can switch
+    codec without a migration: the next save rewrites them.
+    """
+
+    CODECS = {JsonCodec.NAME: JsonCodec, BinaryCodec.NAME: BinaryCodec}
+
+    DEFAULT_CODEC = os.getenv('STORAGE_CODEC', JsonCodec.NAME).lower()
+    DATA_TYPE_CODECS = dict(
+        (item.split('=', 1)[0].strip(), item.split('=', 1)[1].strip().lower())
+        for item in os.getenv('STORAGE_CODECS', '').split(',') if '=' in item
+    )
+
+    @staticmethod
+    def get(name):
+        """Get a codec by name"""
+        if name not in StorageCodecs.CODECS:
+            raise ValueError(f"Unknown storage codec: {name}")
+        return StorageCodecs.CODECS[name]
+
+    @staticmethod
+    def for_data_type(data_type):
+        """Codec used when writing a data_type"""
+        return StorageCodecs.get(StorageCodecs.DATA_TYPE_CODECS.get(data_type, StorageCodecs.DEFAULT_CODEC))
+
+    @staticmethod
+    def is_binary(payload):
+        return payload[:len(BinaryCodec.MAGIC)] == BinaryCodec.MAGIC
+
+    @staticmethod
+    def decode(payload):
+        """Decode a stored (already decompressed) payload in whichever format it was written"""
+        if StorageCodecs.is_binary(payload):
+            return BinaryCodec.decode(payload)
+        return JsonCodec.decode(payload)
+
+    @staticmethod
+    def decode_line(line):
+        """Decode one journal line in whichever format it was written"""
+        if line.startswith(BinaryCodec.LINE_PREFIX):
+            return BinaryCodec.decode(base64.b64decode(line[len(BinaryCodec.LINE_PREFIX):]))
+        return json.loads(line)
+
+
+def benchmark(record_counts, repeat=3):
+    """Encode/decode throughput and size of each codec on synthetic time entries"""
+    import time as timer
+    from services.compression import Compression
+
+    results = []
+    for count in record_counts:
+        start_date = datetime(2024, 1, 1, 9, 0)
+        records = [{
+            'id': f"TE{i:06d}",
+            'matter_id': f"M{i % 40:04d}",
+            'date': (start_date + timedelta(hours=i * 5)).date(),
+            'created_at': start_date + timedelta(hours=i * 5, minutes=i % 60),
+            'hours': Decimal(f"{(i % 16) * 0.25 + 0.25:.2f}"),
+            'rate': Decimal('350.00'),
+            'description': f"Drafted correspondence and reviewed file notes #{i}",
+            'billable': i % 5 != 0,
+            'tags': ['research', 'drafting'] if i % 3 else [],
+        } for i in range(count)]
+        value = {'owner': 'bench@example.com', 'last_modified': datetime.now().isoformat(), 'data': records}
+
+        for codec in (JsonCodec, BinaryCodec):
+            encode_s = decode_s = float('inf')
+            for _ in range(repeat):
+                began = timer.perf_counter()
+                payload = codec.encode(value)
+                encode_s = min(encode_s, timer.perf_counter() - began)
+
+                began = timer.perf_counter()
+                codec.decode(payload)
+                decode_s = min(decode_s, timer.perf_counter() - began)
+
+            results.append({
+                'records': count,
+                'codec': codec.NAME,
+                'bytes': len(payload),
+                'compressed_bytes': len(Compression.compress_bytes(payload)),
+                'encode_s': encode_s,
+                'decode_s': decode_s
+            })
+
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 50000]
+    print(f"{'records':>8} {'codec':<7} {'KB':>9} {'zlib KB':>9} {'encode ms':>10} {'decode ms':>10}")
+    for row in benchmark(counts):
+        print(f"{row['records']:>8} {row['codec']:<7} {row['bytes'] / 1024:>9.1f} "
+              f"{row['compressed_bytes'] / 1024:>9.1f} {row['encode_s'] * 1000:>10.1f} {row['decode_s'] * 1000:>10.1f}")
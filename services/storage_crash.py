@@ -0,0 +1,262 @@
+import os
+import shutil
+import tempfile
+import multiprocessing
+
+CRASH_EMAIL = "crash@example.com"
+
+# Exit status of a save killed at its crash point
+CRASH_EXIT = 86
+
+
+class _CrashPoints:
+    """
+    Count the I/O steps of a save and kill the process at one of them
+
+    Steps are the calls that change what is on disk: os.replace, os.rename,
+    os.remove, os.fsync and journal appends. At step crash_at the process
+    exits immediately (os._exit, no cleanup); an append hit there first
+    writes half of its text, like a write torn by the kill.
+    """
+
+    def __init__(self, crash_at):
+        self.crash_at = crash_at
+        self.steps = 0
+
+    def _hit(self):
+        self.steps += 1
+        return self.steps == self.crash_at
+
+    def _wrap(self, original):
+        def step(*args, **kwargs):
+            if self._hit():
+                os._exit(CRASH_EXIT)
+            return original(*args, **kwargs)
+        return step
+
+    def install(self):
+        from services.atomic_io import AtomicFile
+
+        for name in ('replace', 'rename', 'remove', 'fsync'):
+            setattr(os, name, self._wrap(getattr(os, name)))
+
+        original_append = AtomicFile.append_text
+
+        def append_text(path, text, encoding='utf-8'):
+            if self._hit():
+                with open(path, 'a', encoding=encoding) as f:
+                    f.write(text[:len(text) // 2])
+                os._exit(CRASH_EXIT)
+            return original_append(path, text, encoding)
+
+        AtomicFile.append_text = staticmethod(append_text)
+
+
+def _records(count, version=0):
+    return [
+        {
+            'id': f"R{i:05d}",
+            'date': f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+            'title': f"Record {i}",
+            'version': version
+        }
+        for i in range(count)
+    ]
+
+
+def _scenario(name, before):
+    """The collection a save of the given kind writes over before"""
+    after = [dict(record) for record in before]
+    if name == 'append':
+        # A few edits, a delete and two inserts: journaled as a short append
+        for record in after[:3]:
+            record['version'] = 1
+        del after[-1]
+        after.extend(dict(record, id=f"N{i}", version=1) for i, record in enumerate(before[:2]))
+    elif name == 'snapshot':
+        # Every record changed, saved with compaction forced (see _save):
+        # a full snapshot, then the old journal removed
+        for record in after:
+            record['version'] = 1
+    elif name == 'move':
+        # Records whose date moves them to another month (another segment when partitioned)
+        for record in after[:5]:
+            record['date'] = "2025-06-15"
+            record['version'] = 1
+    return after
+
+
+def _prepare(data_dir, data_type, records):
+    """Save the starting collection, then one small change so a journal exists"""
+    from services.local_storage import LocalStorage
+
+    LocalStorage.DATA_DIR = data_dir
+    LocalStorage.save_user_data(CRASH_EMAIL, data_type, records)
+    changed = [dict(record) for record in records]
+    changed[-1]['title'] += " (edited)"
+    LocalStorage.save_user_data(CRASH_EMAIL, data_type, changed, base=records)
+
+
+def _save(data_dir, data_type, scenario, after, crash_at):
+    """Save after over the stored collection, killed at step crash_at (0 = never)"""
+    from services.local_storage import LocalStorage
+    from services.storage_journal import RecordJournal
+
+    LocalStorage.DATA_DIR = data_dir
+    if scenario == 'snapshot':
+        RecordJournal.COMPACT_MIN_OPS = 0
+        RecordJournal.COMPACT_RATIO = 0
+    before = LocalStorage.load_user_data(CRASH_EMAIL, data_type)
+
+    crash_points = _CrashPoints(crash_at)
+    crash_points.install()
+    LocalStorage.save_user_data(CRASH_EMAIL, data_type, after, base=before)
+    os._exit(0 if crash_at else min(crash_points.steps, 255))
+
+
+def _load(data_dir, data_type, results):
+    """Load the collection the way a new process would; puts ('ok', records) or ('error', message)"""
+    from services.local_storage import LocalStorage
+
+    LocalStorage.DATA_DIR = data_dir
+    try:
+        results.put(('ok', LocalStorage.load_user_data(CRASH_EMAIL, data_type)))
+    except Exception as e:
+        results.put(('error', f"{type(e).__name__}: {e}"))
+
+
+def _recover(data_dir, data_type, after, results):
+    """Save after again over whatever the crash left and load it back"""
+    from services.local_storage import LocalStorage
+
+    LocalStorage.DATA_DIR = data_dir
+    try:
+        current = LocalStorage.load_user_data(CRASH_EMAIL, data_type)
+        LocalStorage.save_user_data(CRASH_EMAIL, data_type, after, base=current)
+        LocalStorage.forget_directories()
+        results.put(('ok', LocalStorage.load_user_data(CRASH_EMAIL, data_type)))
+    except Exception as e:
+        results.put(('error', f"{type(e).__name__}: {e}"))
+
+
+def _in_process(target, *args):
+    """Run target in a fresh process; returns its exit code"""
+    process = multiprocessing.Process(target=target, args=args)
+    process.start()
+    process.join()
+    return process.exitcode
+
+
+def _collect(target, *args):
+    """Run target in a fresh process and return what it put on the queue"""
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=target, args=args + (results,))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def classify(loaded, before, after):
+    """
+    'old' / 'new' when loaded is exactly one side of the save; 'partial'
+    when every record is an old or new version but the mix is neither;
+    'torn' for anything else (unknown, duplicated or lost records)
+    """
+    old = {record['id']: record for record in before}
+    new = {record['id']: record for record in after}
+    found = {}
+    for record in loaded:
+        record_id = record.get('id')
+        if record_id in found or (old.get(record_id) != record and new.get(record_id) != record):
+            return 'torn'
+        found[record_id] = record
+
+    if found == old:
+        return 'old'
+    if found == new:
+        return 'new'
+    # Records unchanged by the save must never go missing
+    if any(record_id not in found for record_id in old.keys() & new.keys() if old[record_id] == new[record_id]):
+        return 'torn'
+    return 'partial'
+
+
+def run(data_types=('matters', 'clients', 'time_entries'), scenarios=('append', 'snapshot', 'move'), records=200):
+    """
+    Kill a save at every one of its I/O steps and check what survives
+
+    For each data type and kind of save, a prepared tenant is copied, the
+    save is run in a child process that exits at step 1, 2, ... until it
+    completes, and after every crash a fresh process loads the collection
+    (classified as old, new, partial or torn, see classify) and saves the
+    new version again, which must then load back exactly. Process kills
+    only: data not yet fsynced is not lost, as it would be on power
+    failure. Returns one result dict per pair.
+    """
+    tmp_dir = tempfile.mkdtemp()
+    report = []
+
+    try:
+        for data_type in data_types:
+            before = _records(records)
+            prepared_dir = os.path.join(tmp_dir, f"prepared-{data_type}")
+            _in_process(_prepare, prepared_dir, data_type, before)
+            before = _collect(_load, prepared_dir, data_type)[1]
+
+            for scenario in scenarios:
+                after = _scenario(scenario, before)
+                data_dir = os.path.join(tmp_dir, 'user_data')
+
+                shutil.copytree(prepared_dir, data_dir)
+                steps = _in_process(_save, data_dir, data_type, scenario, after, 0)
+                shutil.rmtree(data_dir)
+
+                row = {'data_type': data_type, 'scenario': scenario, 'steps': steps,
+                       'old': 0, 'new': 0, 'partial': 0, 'torn': 0, 'unrecovered': 0, 'failures': []}
+                for crash_at in range(1, steps + 1):
+                    shutil.copytree(prepared_dir, data_dir)
+                    try:
+                        if _in_process(_save, data_dir, data_type, scenario, after, crash_at) != CRASH_EXIT:
+                            raise RuntimeError(f"Save did not stop at step {crash_at}")
+
+                        status, loaded = _collect(_load, data_dir, data_type)
+                        outcome = classify(loaded, before, after) if status == 'ok' else 'torn'
+                        row[outcome] += 1
+                        if outcome == 'torn':
+                            row['failures'].append((crash_at, loaded if status != 'ok' else 'records mixed up'))
+
+                        status, recovered = _collect(_recover, data_dir, data_type, after)
+                        if status != 'ok' or classify(recovered, before, after) != 'new':
+                            row['unrecovered'] += 1
+                            row['failures'].append((crash_at, f"after recovery: {recovered if status != 'ok' else 'not the saved data'}"))
+                    finally:
+                        shutil.rmtree(data_dir, ignore_errors=True)
+
+                report.append(row)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Crash-point fault injection for LocalStorage saves")
+    parser.add_argument('--data-types', nargs='+', default=['matters', 'clients', 'time_entries'])
+    parser.add_argument('--scenarios', nargs='+', default=['append', 'snapshot', 'move'])
+    parser.add_argument('--records', type=int, default=200)
+    parser.add_argument('--allow-partial', action='store_true', help="Accept a mix of whole old/new records after a crash")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'data_type':<13} {'scenario':<9} {'steps':>5} {'old':>4} {'new':>4} {'partial':>7} {'torn':>5} {'unrecovered':>11}")
+    for row in run(args.data_types, args.scenarios, args.records):
+        failed = failed or row['torn'] > 0 or row['unrecovered'] > 0 or (row['partial'] > 0 and not args.allow_partial)
+        print(f"{row['data_type']:<13} {row['scenario']:<9} {row['steps']:>5} {row['old']:>4} {row['new']:>4} "
+              f"{row['partial']:>7} {row['torn']:>5} {row['unrecovered']:>11}")
+        for crash_at, failure in row['failures']:
+            print(f"    step {crash_at}: {failure}")
+
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,376 @@
+import os
+import json
+import copy
+import uuid
+import pickle
+import threading
+from collections import OrderedDict
+
+from services.atomic_io import AtomicFile
+from services.storage_codecs import JsonCodec, StorageCodecs
+
+
+class RecordJournal:
+    """
+    Append-only record journal for list-of-record collections
+
+    Layout next to each snapshot:
+    user_data/
+    └── user_at_email_com/
+        ├── matters.json            ← Snapshot (same format as before)
+        └── matters.journal         ← One line per save since the snapshot
+
+    Ops are idempotent puts/deletes keyed by record 'id'. A save that
+    changes several records is written as one 'batch' line, so a save torn
+    by a crash is dropped whole (the torn tail is trimmed before the next
+    append) rather than leaving some of its records applied. Every snapshot
+    gets a new generation id, and a journal starts with a header line
+    naming the generation it extends. Ops under any other generation are
+    skipped, so an old journal left behind when a crash hit between
+    writing a snapshot and removing the journal is never replayed over
+    the newer snapshot. A snapshot and journal written before generations
+    existed both have none, so they still go together.
+    """
+
+    JOURNAL_SUFFIX = ".journal"
+
+    # Compact once the journal holds more ops than this many, or more ops
+    # than COMPACT_RATIO x the number of live records (whichever is larger)
+    COMPACT_MIN_OPS = 500
+    COMPACT_RATIO = 0.5
+
+    # Last known on-disk state per snapshot path, used to diff new saves
+    # (readers holding only a shared file lock update it concurrently: guard with _lock)
+    MAX_BASELINES = 64
+    _baselines = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def journal_path(snapshot_path):
+        """Get journal file path for a snapshot file"""
+        base, _ = os.path.splitext(snapshot_path)
+        return base + RecordJournal.JOURNAL_SUFFIX
+
+    @staticmethod
+    def is_journalable(data):
+        """Journal only lists of dicts with unique, hashable 'id' values"""
+        if not isinstance(data, list):
+            return False
+
+        seen = set()
+        for record in data:
+            if not isinstance(record, dict):
+                return False
+            record_id = record.get('id')
+            if not isinstance(record_id, (str, int)) or isinstance(record_id, bool):
+                return False
+            if record_id in seen:
+                return False
+            seen.add(record_id)
+
+        return True
+
+    @staticmethod
+    def _disk_state(snapshot_path):
+        """Cheap fingerprint of snapshot + journal used to detect outside writes (atomic replaces change the inode)"""
+        state = []
+        for path in (snapshot_path, RecordJournal.journal_path(snapshot_path)):
+            try:
+                st_result = os.stat(path)
+                state.append((st_result.st_mtime_ns, st_result.st_size, st_result.st_ino))
+            except FileNotFoundError:
+                state.append(None)
+        return tuple(state)
+
+    @staticmethod
+    def new_generation():
+        """Generation id for a new snapshot"""
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def read_journal(journal_file):
+        """Read a journal: (generation it extends, put/delete ops); (None, []) when there is none"""
+        lines = RecordJournal.read_ops(journal_file)
+        generation = None
+        if lines and lines[0].get('op') == 'generation':
+            generation = lines.pop(0).get('generation')
+
+        ops = []
+        for op in lines:
+            if op.get('op') == 'batch':
+                ops.extend(op['ops'])
+            else:
+                ops.append(op)
+        return generation, ops
+
+    @staticmethod
+    def read_ops(journal_file):
+        """Read journal lines (header included), ignoring a torn trailing line from an interrupted append"""
+        ops = []
+        if not os.path.exists(journal_file):
+            return ops
+
+        with open(journal_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    ops.append(StorageCodecs.decode_line(line))
+                except (ValueError, TypeError, EOFError):
+                    break
+
+        return ops
+
+    @staticmethod
+    def replay(records, ops):
+        """Apply journal ops on top of the snapshot records of the generation they extend (see read_journal)"""
+        if not ops:
+            return records
+
+        by_id = OrderedDict()
+        for record in records:
+            by_id[record.get('id') if isinstance(record, dict) else id(record)] = record
+
+        for op in ops:
+            if op.get('op') == 'put':
+                by_id[op['id']] = op['record']
+            elif op.get('op') == 'delete':
+                by_id.pop(op['id'], None)
+
+        return list(by_id.values())
+
+    @staticmethod
+    def remember(snapshot_path, records, op_count, generation=None, journal_generation=None):
+        """
+        Record the on-disk state of a collection after a load or save
+
+        generation is the snapshot's; journal_generation the one the journal
+        on disk extends (they differ when there is no journal or a stale one).
+        """
+        if not RecordJournal.is_journalable(records):
+            RecordJournal.forget(snapshot_path)
+            return
+
+        baseline = {
+            'disk_state': RecordJournal._disk_state(snapshot_path),
+            'records': OrderedDict((r['id'], r) for r in RecordJournal.deep_copy(records)),
+            'op_count': op_count,
+            'generation': generation,
+            'journal_generation': journal_generation
+        }
+        with RecordJournal._lock:
+            RecordJournal._baselines[snapshot_path] = baseline
+            RecordJournal._baselines.move_to_end(snapshot_path)
+            while len(RecordJournal._baselines) > RecordJournal.MAX_BASELINES:
+                RecordJournal._baselines.popitem(last=False)
+
+    @staticmethod
+    def deep_copy(obj):
+        """Deep copy plain data (a pickle round trip is much faster than copy.deepcopy)"""
+        try:
+            return pickle.loads(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return copy.deepcopy(obj)
+
+    @staticmethod
+    def forget(snapshot_path):
+        """Drop the cached baseline for a collection"""
+        with RecordJournal._lock:
+            RecordJournal._baselines.pop(snapshot_path, None)
+
+    @staticmethod
+    def forget_all():
+        """Drop every cached baseline (e.g. after a tenant directory was replaced)"""
+        with RecordJournal._lock:
+            RecordJournal._baselines.clear()
+
+    @staticmethod
+    def get_baseline(snapshot_path):
+        """Get baseline if it still matches what is on disk"""
+        with RecordJournal._lock:
+            baseline = RecordJournal._baselines.get(snapshot_path)
+        if baseline is None:
+            return None
+
+        if baseline['disk_state'] != RecordJournal._disk_state(snapshot_path):
+            with RecordJournal._lock:
+                if RecordJournal._baselines.get(snapshot_path) is baseline:
+                    del RecordJournal._baselines[snapshot_path]
+            return None
+
+        return baseline
+
+    @staticmethod
+    def diff(baseline, data):
+        """
+        Compute put/delete ops turning the baseline into data
+
+        Returns None when the change cannot be expressed as a journal
+        (records were reordered), meaning a full snapshot is required.
+        """
+        old_records = baseline['records']
+        new_ids = [record['id'] for record in data]
+        new_id_set = set(new_ids)
+
+        # Replay appends new ids at the end, so the surviving old ids must
+        # keep their order and come first
+        expected_order = [i for i in old_records if i in new_id_set]
+        expected_order.extend(i for i in new_ids if i not in old_records)
+        if expected_order != new_ids:
+            return None
+
+        ops = []
+        for record_id in old_records:
+            if record_id not in new_id_set:
+                ops.append({'op': 'delete', 'id': record_id})
+
+        for record in data:
+            old = old_records.get(record['id'])
+            if old is None or old != record:
+                ops.append({'op': 'put', 'id': record['id'], 'record': record})
+
+        return ops
+
+    @staticmethod
+    def merge(base, ours, theirs):
+        """
+        Three-way, record-level merge of concurrent edits to one collection
+
+        ours and theirs were both derived from base. Records added, changed
+        or deleted on only one side keep that side's edit; when both sides
+        changed the same record ours wins, and an edit always beats a
+        concurrent delete. A record both sides added under the same id (pages
+        number new records len(collection) + 1) with different contents is a
+        conflict too: both are kept, ours under a fresh id (see _free_id).
+        Returns (merged, conflicts), or None when the collections are not
+        lists of records with unique ids.
+        """
+        if not all(RecordJournal.is_journalable(records) for records in (base, ours, theirs)):
+            return None
+
+        same = RecordJournal._same_record
+        base_by_id = {record['id']: record for record in base}
+        ours_ids = {record['id'] for record in ours}
+        merged = OrderedDict((record['id'], record) for record in theirs)
+        conflicts = 0
+
+        for record_id, record in base_by_id.items():
+            if record_id in ours_ids:
+                continue
+            # Deleted on our side: keep it only if they changed it meanwhile
+            if record_id in merged and not same(merged[record_id], record):
+                conflicts += 1
+            else:
+                merged.pop(record_id, None)
+
+        for record in ours:
+            record_id = record['id']
+            old = base_by_id.get(record_id)
+            if old is not None and same(old, record):
+                continue
+            theirs_record = merged.get(record_id)
+            if old is None and theirs_record is not None and not same(theirs_record, record):
+                # Both sides added a record with this id: keep theirs, re-key ours
+                conflicts += 1
+                taken = set(merged) | ours_ids | set(base_by_id)
+                record = dict(record, id=RecordJournal._free_id(record_id, taken))
+                ours_ids.add(record['id'])
+                record_id = record['id']
+            elif old is not None and theirs_record is not None and not same(theirs_record, old) and not same(theirs_record, record):
+                conflicts += 1
+            merged[record_id] = record
+
+        return list(merged.values()), conflicts
+
+    @staticmethod
+    def _free_id(record_id, taken):
+        """An id not in taken: the next integer above all integer ids for int ids, else record_id-2, -3, ..."""
+        if isinstance(record_id, int) and not isinstance(record_id, bool):
+            return max([value for value in taken if isinstance(value, int) and not isinstance(value, bool)] + [record_id]) + 1
+        suffix = 2
+        while f"{record_id}-{suffix}" in taken:
+            suffix += 1
+        return f"{record_id}-{suffix}"
+
+    @staticmethod
+    def _same_record(a, b):
+        """Equal, or equal once stored (a date and its JSON string count as the same value)"""
+        if a == b:
+            return True
+        return json.dumps(a, sort_keys=True, default=JsonCodec._default) == json.dumps(b, sort_keys=True, default=JsonCodec._default)
+
+    @staticmethod
+    def needs_compaction(baseline, record_count, new_ops):
+        """Decide whether to fold the journal into a fresh snapshot"""
+        total_ops = baseline['op_count'] + new_ops
+        limit = max(RecordJournal.COMPACT_MIN_OPS, int(record_count * RecordJournal.COMPACT_RATIO))
+        return total_ops > limit
+
+    @staticmethod
+    def append(snapshot_path, baseline, ops, codec=None):
+        """
+        Append ops to the journal (one line in the codec's format) and advance the baseline
+
+        A journal that does not extend the current snapshot (none yet, or a
+        stale one) is replaced by a new one headed with its generation.
+        """
+        codec = codec or JsonCodec
+        lines = codec.encode_line(ops[0] if len(ops) == 1 else {'op': 'batch', 'ops': ops}) + '\n'
+
+        journal_file = RecordJournal.journal_path(snapshot_path)
+        if baseline['journal_generation'] == baseline['generation'] and os.path.exists(journal_file):
+            RecordJournal._trim_torn_tail(journal_file)
+            AtomicFile.append_text(journal_file, lines)
+        else:
+            header = codec.encode_line({'op': 'generation', 'generation': baseline['generation']}) + '\n'
+            AtomicFile.write_text(journal_file, header + lines)
+            baseline['journal_generation'] = baseline['generation']
+
+        records = baseline['records']
+        for op in ops:
+            if op['op'] == 'put':
+                records[op['id']] = RecordJournal.deep_copy(op['record'])
+            else:
+                records.pop(op['id'], None)
+
+        baseline['op_count'] += len(ops)
+        baseline['disk_state'] = RecordJournal._disk_state(snapshot_path)
+
+    @staticmethod
+    def _trim_torn_tail(journal_file):
+        """Cut off a partial last line left by an interrupted append, so the next line starts clean"""
+        with open(journal_file, 'r+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end == 0:
+                return
+            f.seek(end - 1)
+            if f.read(1) == b'\n':
+                return
+
+            # Torn: find the end of the last complete line
+            position = end
+            while position > 0:
+                start = max(position - 64 * 1024, 0)
+                f.seek(start)
+                block = f.read(position - start)
+                newline = block.rfind(b'\n')
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            f.truncate(position)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def clear(snapshot_path):
+        """
+        Remove the journal after its ops were folded into a snapshot
+
+        Only tidies up: the new snapshot's generation already makes the old
+        journal stale, so a crash before this runs loses nothing.
+        """
+        journal_file = RecordJournal.journal_path(snapshot_path)
+        if os.path.exists(journal_file):
+            os.remove(journal_file)
@@ -0,0 +1,328 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+
+from services.storage_cache import UserDataCache
+from services.storage_codecs import StorageCodecs
+from services.storage_journal import RecordJournal
+
+
+class PartitionedCollection:
+    """
+    Time-partitioned storage for date-keyed record collections
+
+    Structure:
+    user_data/
+    └── user_at_email_com/
+        └── time_entries/
+            ├── index.json          ← Segment files with date bounds and counts, record order
+            ├── 2023.4.json         ← Compacted year (written by index version 4)
+            ├── 2024-11.7.json      ← One segment per month
+            ├── 2024-12.9.json
+            └── undated.3.json      ← Records without a parseable date
+
+    Saves rewrite only the segments whose records changed and range loads
+    read only the segments overlapping the requested dates. Changed
+    segments are written to new files and the index, rewritten atomically
+    after them, is the commit point: a crash before it leaves the previous
+    index pointing at the previous files, a crash after it only leaves
+    unreferenced files that the next save removes. The index also records
+    the saved order as runs of segment names, so load() returns records
+    in the order they were saved, not grouped by month.
+    """
+
+    INDEX_FILE = "index.json"
+    UNDATED = "undated"
+
+    _MONTH = re.compile(r'^(\d{4})-(\d{2})')
+
+    # Last known segment contents per collection directory, used to skip
+    # rewriting unchanged segments
+    MAX_BASELINES = 64
+    _baselines = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def directory(user_dir, data_type):
+        return os.path.join(user_dir, data_type)
+
+    @staticmethod
+    def index_path(user_dir, data_type):
+        return os.path.join(user_dir, data_type, PartitionedCollection.INDEX_FILE)
+
+    @staticmethod
+    def exists(user_dir, data_type):
+        return os.path.exists(PartitionedCollection.index_path(user_dir, data_type))
+
+    @staticmethod
+    def _month_of(value):
+        """'YYYY-MM' for a date-like value, or None"""
+        if isinstance(value, (datetime, date)):
+            return value.strftime('%Y-%m')
+        if isinstance(value, str):
+            match = PartitionedCollection._MONTH.match(value)
+            if match and 1 <= int(match.group(2)) <= 12:
+                return f"{match.group(1)}-{match.group(2)}"
+        return None
+
+    @staticmethod
+    def _date_string(value):
+        """'YYYY-MM-DD' for a date-like value, or None"""
+        if isinstance(value, (datetime, date)):
+            return value.strftime('%Y-%m-%d')
+        if isinstance(value, str) and PartitionedCollection._month_of(value):
+            return value[:10]
+        return None
+
+    @staticmethod
+    def _segment_bounds(name):
+        """Inclusive (start, end) date strings covered by a segment name"""
+        if name == PartitionedCollection.UNDATED:
+            return None, None
+        if len(name) == 4:
+            return f"{name}-01-01", f"{name}-12-31"
+        return f"{name}-01", f"{name}-31"
+
+    @staticmethod
+    def _segment_for(record, field, compacted_years):
+        month = PartitionedCollection._month_of(record.get(field)) if isinstance(record, dict) else None
+        if month is None:
+            return PartitionedCollection.UNDATED
+        return month[:4] if month[:4] in compacted_years else month
+
+    @staticmethod
+    def _sort_key(name):
+        # Chronological, compacted years before their months, undated last
+        if name == PartitionedCollection.UNDATED:
+            return ('9999-99', 1)
+        return (name if len(name) > 4 else f"{name}-00", 0)
+
+    @staticmethod
+    def _read_index(user_dir, data_type, user_email):
+        from services.local_storage import LocalStorage
+
+        index = LocalStorage.read_json_file(PartitionedCollection.index_path(user_dir, data_type))
+        if index.get('owner') != user_email:
+            raise PermissionError("Data owner mismatch")
+        return index
+
+    @staticmethod
+    def _segment_file(index, name):
+        """File of a segment (collections saved before versioned files use <name>.json)"""
+        return index['segments'].get(name, {}).get('file') or f"{name}.json"
+
+    @staticmethod
+    def _in_saved_order(index, segments):
+        """Records of the given segments (name -> records) in saved order"""
+        order = index.get('order')
+        if order is None:
+            # Saved before the order was recorded: chronological
+            records = []
+            for name in sorted(segments, key=PartitionedCollection._sort_key):
+                records.extend(segments[name])
+            return records
+
+        positions = dict.fromkeys(segments, 0)
+        records = []
+        for name, count in order:
+            if name in positions:
+                start = positions[name]
+                records.extend(segments[name][start:start + count])
+                positions[name] = start + count
+        return records
+
+    @staticmethod
+    def _saved_order(data, field, compacted_years):
+        """Runs of [segment name, record count] in the order of data"""
+        order = []
+        for record in data:
+            name = PartitionedCollection._segment_for(record, field, compacted_years)
+            if order and order[-1][0] == name:
+                order[-1][1] += 1
+            else:
+                order.append([name, 1])
+        return order
+
+    @staticmethod
+    def _read_segment(user_dir, data_type, user_email, index, name):
+        from services.local_storage import LocalStorage
+
+        path = os.path.join(user_dir, data_type, PartitionedCollection._segment_file(index, name))
+        if not os.path.exists(path):
+            return []
+
+        secure_data = LocalStorage.read_json_file(path)
+        if secure_data.get('owner') != user_email:
+            raise PermissionError("Data owner mismatch")
+        return secure_data.get('data', [])
+
+    @staticmethod
+    def _get_baseline(user_dir, data_type):
+        key = PartitionedCollection.directory(user_dir, data_type)
+        index_state = UserDataCache.file_state([PartitionedCollection.index_path(user_dir, data_type)])
+
+        with PartitionedCollection._lock:
+            baseline = PartitionedCollection._baselines.get(key)
+            if baseline is None or baseline['index_state'] != index_state:
+                return None
+            return baseline
+
+    @staticmethod
+    def _remember(user_dir, data_type, segments):
+        key = PartitionedCollection.directory(user_dir, data_type)
+        index_state = UserDataCache.file_state([PartitionedCollection.index_path(user_dir, data_type)])
+
+        with PartitionedCollection._lock:
+            PartitionedCollection._baselines[key] = {
+                'index_state': index_state,
+                'segments': RecordJournal.deep_copy(segments)
+            }
+            PartitionedCollection._baselines.move_to_end(key)
+            while len(PartitionedCollection._baselines) > PartitionedCollection.MAX_BASELINES:
+                PartitionedCollection._baselines.popitem(last=False)
+
+    @staticmethod
+    def load(user_email, user_dir, data_type):
+        """Load every segment; records come back in the order they were saved"""
+        index = PartitionedCollection._read_index(user_dir, data_type, user_email)
+
+        segments = {}
+        for name in index['segments']:
+            segments[name] = PartitionedCollection._read_segment(user_dir, data_type, user_email, index, name)
+
+        PartitionedCollection._remember(user_dir, data_type, segments)
+        return PartitionedCollection._in_saved_order(index, segments)
+
+    @staticmethod
+    def load_range(user_email, user_dir, data_type, field, start=None, end=None):
+        """
+        Load records whose date field falls within [start, end] (inclusive)
+
+        Only segments overlapping the range are read; undated records are
+        never included. Records keep their saved order.
+        """
+        start = PartitionedCollection._date_string(start) if start is not None else None
+        end = PartitionedCollection._date_string(end) if end is not None else None
+        index = PartitionedCollection._read_index(user_dir, data_type, user_email)
+
+        segments = {}
+        for name in index['segments']:
+            seg_start, seg_end = PartitionedCollection._segment_bounds(name)
+            if seg_start is None:
+                continue
+            if (start and seg_end < start) or (end and seg_start > end):
+                continue
+            segments[name] = PartitionedCollection._read_segment(user_dir, data_type, user_email, index, name)
+
+        records = []
+        for record in PartitionedCollection._in_saved_order(index, segments):
+            record_date = PartitionedCollection._date_string(record.get(field))
+            if record_date is None:
+                continue
+            if (start and record_date < start) or (end and record_date > end):
+                continue
+            records.append(record)
+
+        return records
+
+    @staticmethod
+    def save(user_email, user_dir, data_type, field, data):
+        """
+        Split records into segments and rewrite only the ones that changed
+
+        Changed segments go to new files, then the index is replaced (the
+        commit point), then files the index no longer references are
+        removed. Call with the collection's exclusive lock held.
+        """
+        from services.local_storage import LocalStorage
+
+        collection_dir = PartitionedCollection.directory(user_dir, data_type)
+        os.makedirs(collection_dir, exist_ok=True)
+
+        index = {'owner': user_email, 'version': 0, 'segments': {}}
+        if PartitionedCollection.exists(user_dir, data_type):
+            index = PartitionedCollection._read_index(user_dir, data_type, user_email)
+
+        compacted_years = {name for name in index['segments'] if len(name) == 4}
+        segments = OrderedDict()
+        for record in data:
+            name = PartitionedCollection._segment_for(record, field, compacted_years)
+            segments.setdefault(name, []).append(record)
+
+        baseline = PartitionedCollection._get_baseline(user_dir, data_type)
+        if baseline is None and index['segments']:
+            PartitionedCollection.load(user_email, user_dir, data_type)
+            baseline = PartitionedCollection._get_baseline(user_dir, data_type)
+        previous = baseline['segments'] if baseline else {}
+        codec = StorageCodecs.for_data_type(data_type)
+
+        order = PartitionedCollection._saved_order(data, field, compacted_years)
+        version = index.get('version', 0) + 1
+
+        files = {}
+        written = 0
+        for name, records in segments.items():
+            if previous.get(name) != records or name not in index['segments']:
+                files[name] = f"{name}.{version}.json"
+                LocalStorage._write_snapshot(user_email, os.path.join(collection_dir, files[name]), records, codec)
+                written += 1
+            else:
+                files[name] = PartitionedCollection._segment_file(index, name)
+
+        removed = [name for name in index['segments'] if name not in segments]
+
+        # The index is rewritten on every change so its mtime/size version the collection
+        if written or removed or index.get('order') != order or not PartitionedCollection.exists(user_dir, data_type):
+            index['version'] = version
+            index['segments'] = {}
+            for name, records in segments.items():
+                dates = [d for d in (PartitionedCollection._date_string(r.get(field)) for r in records if isinstance(r, dict)) if d]
+                index['segments'][name] = {
+                    'file': files[name],
+                    'count': len(records),
+                    'start': min(dates) if dates else None,
+                    'end': max(dates) if dates else None
+                }
+            index['order'] = order
+            LocalStorage._write_data_file(PartitionedCollection.index_path(user_dir, data_type), index)
+
+            PartitionedCollection._remove_unreferenced(collection_dir, index)
+
+        PartitionedCollection._remember(user_dir, data_type, segments)
+        return written
+
+    @staticmethod
+    def _remove_unreferenced(collection_dir, index):
+        """Delete segment files the committed index does not list (replaced, removed, or left by a crashed save)"""
+        referenced = {entry['file'] for entry in index['segments'].values()}
+        referenced.add(PartitionedCollection.INDEX_FILE)
+        for entry in os.scandir(collection_dir):
+            if entry.name.endswith('.json') and not entry.name.startswith('.') and entry.name not in referenced:
+                os.remove(entry.path)
+
+    @staticmethod
+    def compact(user_email, user_dir, data_type, field, before_year):
+        """Merge monthly segments of years before before_year into one segment per year"""
+        data = PartitionedCollection.load(user_email, user_dir, data_type)
+        index = PartitionedCollection._read_index(user_dir, data_type, user_email)
+
+        years = {name[:4] for name in index['segments']
+                 if name != PartitionedCollection.UNDATED and int(name[:4]) < int(before_year)}
+        if not years:
+            return 0
+
+        # Register the yearly segments, then a save regroups records into them
+        for year in years:
+            index['segments'].setdefault(year, {'count': 0, 'start': None, 'end': None})
+
+        from services.local_storage import LocalStorage
+        LocalStorage._write_data_file(PartitionedCollection.index_path(user_dir, data_type), index)
+        PartitionedCollection.save(user_email, user_dir, data_type, field, data)
+        return len(years)
+
+    @staticmethod
+    def data_files(user_dir, data_type):
+        """Files whose state versions a partitioned collection"""
+        return (PartitionedCollection.index_path(user_dir, data_type),)
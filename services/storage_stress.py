@@ -0,0 +1,119 @@
+import os
+import time
+import random
+import shutil
+import tempfile
+import multiprocessing
+
+STRESS_EMAIL = "stress@example.com"
+
+
+def _worker(worker_id, data_dir, data_type, saves, merge, results):
+    """
+    Repeatedly load, append one record and save, like an auto-saving tab
+
+    New records are numbered len(collection) + 1 as the pages do, so
+    concurrent workers keep adding records with the same id; each record
+    also carries (worker, seq) so run() can tell them apart.
+    """
+    from services.local_storage import LocalStorage
+
+    LocalStorage.DATA_DIR = data_dir
+    rng = random.Random(worker_id)
+    save_times = []
+
+    for n in range(saves):
+        base = LocalStorage.load_user_data(STRESS_EMAIL, data_type)
+        data = list(base)
+        data.append({
+            'id': len(data) + 1,
+            'worker': worker_id,
+            'seq': n,
+            'date': f"2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}",
+            'title': f"Worker {worker_id} record {n}"
+        })
+
+        # Simulate the user editing between the load and the auto-save
+        time.sleep(rng.uniform(0, 0.002))
+
+        start = time.monotonic()
+        LocalStorage.save_user_data(STRESS_EMAIL, data_type, data, base=base if merge else None)
+        save_times.append(time.monotonic() - start)
+
+    results.put((worker_id, LocalStorage.concurrency_stats(), max(save_times)))
+
+
+def run(processes=8, saves=50, data_types=('tasks', 'events'), merge=True):
+    """
+    Hammer one tenant from many processes and count lost updates
+
+    Each worker appends `saves` records numbered the way the pages number
+    them (clashing with the other workers' ids); afterwards every one of
+    them must be present, under unique ids. Returns one result dict per
+    data_type.
+    """
+    from services.local_storage import LocalStorage
+
+    tmp_dir = tempfile.mkdtemp()
+    data_dir = os.path.join(tmp_dir, 'user_data')
+    report = []
+
+    try:
+        for data_type in data_types:
+            results = multiprocessing.Queue()
+            workers = [
+                multiprocessing.Process(target=_worker, args=(i, data_dir, data_type, saves, merge, results))
+                for i in range(processes)
+            ]
+
+            start = time.monotonic()
+            for worker in workers:
+                worker.start()
+            stats = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            elapsed = time.monotonic() - start
+
+            LocalStorage.DATA_DIR = data_dir
+            stored = LocalStorage.load_user_data(STRESS_EMAIL, data_type)
+            stored_keys = {(record['worker'], record['seq']) for record in stored}
+            expected = {(i, n) for i in range(processes) for n in range(saves)}
+
+            report.append({
+                'data_type': data_type,
+                'expected': len(expected),
+                'stored': len(stored_keys),
+                'lost': len(expected - stored_keys),
+                'duplicate_ids': len(stored) - len({record['id'] for record in stored}),
+                'merges': sum(s['merges'] for _, s, _ in stats),
+                'record_conflicts': sum(s['record_conflicts'] for _, s, _ in stats),
+                'lock_wait_max_ms': max(s['wait_max'] for _, s, _ in stats) * 1000,
+                'lock_wait_avg_ms': sum(s['wait_total'] for _, s, _ in stats) * 1000 / max(sum(s['acquired'] for _, s, _ in stats), 1),
+                'save_max_ms': max(m for _, _, m in stats) * 1000,
+                'saves_per_s': processes * saves / elapsed
+            })
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Multi-process lost-update stress test for LocalStorage")
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--saves', type=int, default=50)
+    parser.add_argument('--data-types', nargs='+', default=['tasks', 'events'])
+    parser.add_argument('--no-merge', action='store_true', help="Save without a base (plain last-writer-wins)")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'data_type':<10} {'expected':>8} {'stored':>7} {'lost':>5} {'merges':>7} {'conflicts':>9} "
+          f"{'wait max ms':>12} {'wait avg ms':>12} {'save max ms':>12} {'saves/s':>8}")
+    for row in run(args.processes, args.saves, args.data_types, merge=not args.no_merge):
+        failed = failed or row['lost'] > 0 or row['duplicate_ids'] > 0
+        print(f"{row['data_type']:<10} {row['expected']:>8} {row['stored']:>7} {row['lost']:>5} {row['merges']:>7} {row['record_conflicts']:>9} "
+              f"{row['lock_wait_max_ms']:>12.1f} {row['lock_wait_avg_ms']:>12.2f} {row['save_max_ms']:>12.1f} {row['saves_per_s']:>8.0f}")
+
+    raise SystemExit(1 if failed else 0)
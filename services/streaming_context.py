@@ -0,0 +1,376 @@
+import os
+import hashlib
+import tempfile
+import weakref
+from itertools import chain
+from typing import Dict, List, Any
+
+from services.analysis_context import AnalysisContext
+from services.term_matcher import TermMatcher, TermHits
+from services.text_patterns import TextPatterns
+
+
+def _remove_spool(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _findall_item(match):
+    """What re.findall reports for a match"""
+    groups = match.re.groups
+    if groups == 0:
+        return match.group()
+    if groups == 1:
+        return match.group(1) or ''
+    return match.groups('')
+
+
+def _whole_text(name):
+    def view(self):
+        raise TypeError(f"StreamingContext has no '{name}' view: it needs the whole text in memory (use AnalysisContext)")
+    return property(view)
+
+
+class StreamingContext(AnalysisContext):
+    """
+    AnalysisContext for a document too large to hold in memory
+
+    The text arrives as an iterable of pieces (TextExtractor.iter_text) and
+    is spooled once to a temporary file, which also counts the words,
+    hashes the text and keeps its first HEAD characters. Every other view
+    is a pass over the spool in windows of WINDOW characters. A window is
+    scanned together with the OVERLAP characters after it and CONTEXT
+    characters before it, so a match starting in the window (and any
+    lookaround or word boundary around it) is seen whole; each match is
+    reported by the window it starts in, so none is counted twice. A match
+    running to the end of the scanned text, a greedy run that may go on,
+    is held back until more text has been read.
+
+    Results equal AnalysisContext's on the same text as long as no match
+    attempt reads more than OVERLAP characters ahead and then fails; the
+    DocumentProcessor patterns look at most about 1000 characters ahead
+    outside greedy runs. Memory is a few windows plus the results, and the
+    longest match or sentence: a document without sentence punctuation is
+    one sentence, which iter_sentences holds whole.
+
+    Covers the views used by DocumentProcessor. Views of the whole text
+    (lower, words, sentences, count() and the other AIAnalysisSystem
+    lookups) raise TypeError. Close the context (or use it in a with
+    block) to delete the spool file.
+    """
+
+    # ANALYSIS_STREAM_WINDOW_KB / ANALYSIS_STREAM_OVERLAP_KB, in thousands of characters
+    WINDOW = int(float(os.getenv('ANALYSIS_STREAM_WINDOW_KB', '1024')) * 1024)
+    OVERLAP = int(float(os.getenv('ANALYSIS_STREAM_OVERLAP_KB', '64')) * 1024)
+    CONTEXT = 256       # Characters kept before a window for lookbehinds and \b
+    HEAD = 4096         # Leading characters kept in memory (classification, language, summary fallback)
+
+    lower = _whole_text('lower')
+    compact_lower = _whole_text('compact_lower')
+    words = _whole_text('words')
+    sentences = _whole_text('sentences')
+    sentence_spans = _whole_text('sentence_spans')
+    paragraph_offsets = _whole_text('paragraph_offsets')
+
+    def __init__(self, pieces):
+        super().__init__(None)
+        handle, self._path = tempfile.mkstemp(prefix='analysis-', suffix='.txt')
+        self._cleanup = weakref.finalize(self, _remove_spool, self._path)
+        try:
+            self._spool(handle, pieces)
+        except BaseException:
+            self.close()
+            raise
+
+    def _spool(self, handle, pieces):
+        digest = hashlib.sha256()
+        length = 0
+        word_count = 0
+        in_word = False     # Whether the text so far ends inside a word
+        head = []
+        head_length = 0
+        with open(handle, 'w', encoding='utf-8', errors='surrogatepass', newline='') as f:
+            for piece in pieces:
+                if not piece:
+                    continue
+                f.write(piece)
+                digest.update(piece.encode('utf-8', 'surrogatepass'))
+                length += len(piece)
+                word_count += len(piece.split())
+                if in_word and not piece[0].isspace():
+                    word_count -= 1     # A word split between two pieces
+                in_word = not piece[-1].isspace()
+                if head_length < self.HEAD:
+                    head.append(piece[:self.HEAD - head_length])
+                    head_length += len(head[-1])
+
+        # The views AnalysisContext computes from the text
+        self.content_hash = digest.hexdigest()
+        self.length = length
+        self.word_count = word_count
+        self._head = ''.join(head)
+
+    def close(self):
+        """Delete the spool file"""
+        self._cleanup()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _pieces(self, lower: bool = False):
+        """The spooled text, WINDOW characters at a time"""
+        with open(self._path, 'r', encoding='utf-8', errors='surrogatepass', newline='') as f:
+            while True:
+                piece = f.read(self.WINDOW)
+                if not piece:
+                    return
+                yield piece.lower() if lower else piece
+
+    def _finditer(self, compiled, lower: bool = False):
+        """(offset, match) for each match of a compiled pattern; offset is where the match's string starts in the document"""
+        pieces = self._pieces(lower)
+        buffer, offset, start = '', 0, 0
+        wanted = self.WINDOW + self.OVERLAP
+        final = False
+        while not final:
+            more = []
+            size = len(buffer) - start
+            for piece in pieces:
+                more.append(piece)
+                size += len(piece)
+                if size >= wanted:
+                    break
+            else:
+                final = True
+            buffer += ''.join(more)
+
+            # Matches starting before limit belong to this window, the rest are found again in the next one
+            limit = len(buffer) - self.OVERLAP
+            resume = max(start, limit)
+            for match in compiled.finditer(buffer, start):
+                if not final and (match.start() >= limit or match.end() == len(buffer)):
+                    resume = match.start()
+                    break
+                yield offset, match
+                resume = max(limit, match.end())
+
+            cut = max(0, resume - self.CONTEXT)
+            buffer, offset, start = buffer[cut:], offset + cut, resume - cut
+            # A held-back match leaves more than OVERLAP unscanned: read as much again before the next try
+            wanted = max(self.WINDOW + self.OVERLAP, 2 * (len(buffer) - start))
+
+    def head(self, size: int, lower: bool = False) -> str:
+        text = self._head if size < len(self._head) or len(self._head) == self.length else self.slice(0, size)
+        return (text.lower() if lower else text)[:size]
+
+    def slice(self, start: int, end: int) -> str:
+        start, end, _ = slice(start, end).indices(self.length)
+        if end <= len(self._head):
+            return self._head[start:end]
+        parts = []
+        offset = 0
+        for piece in self._pieces():
+            if offset >= end:
+                break
+            if offset + len(piece) > start:
+                parts.append(piece[max(0, start - offset):end - offset])
+            offset += len(piece)
+        return ''.join(parts)
+
+    def rfind(self, sub: str) -> int:
+        if not sub:
+            return self.length
+        found = -1
+        offset = 0      # Document offset of the end of the text read so far
+        tail = ''       # Last len(sub) - 1 characters, for an occurrence split between pieces
+        for piece in self._pieces():
+            buffer = tail + piece
+            index = buffer.rfind(sub)
+            if index != -1:
+                found = offset - len(tail) + index
+            offset += len(piece)
+            tail = buffer[len(buffer) - len(sub) + 1:] if len(sub) > 1 else ''
+        return found
+
+    def search_span(self, pattern, flags: int = 0):
+        for offset, match in self._finditer(TextPatterns.compile(pattern, flags)):
+            return offset + match.start(), offset + match.end()
+        return None
+
+    def iter_sentences(self):
+        # A run of . ! ? reaching the end of a piece may go on in the next one, so it is split there later
+        carry = ''
+        for piece in self._pieces():
+            buffer = carry + piece
+            last = 0
+            for match in self.SENTENCE_SPLIT.finditer(buffer):
+                if match.end() == len(buffer):
+                    break
+                sentence = buffer[last:match.start()].strip()
+                if sentence:
+                    yield sentence
+                last = match.end()
+            carry = buffer[last:]
+        for sentence in self.SENTENCE_SPLIT.split(carry):
+            sentence = sentence.strip()
+            if sentence:
+                yield sentence
+
+    def findall(self, pattern, flags: int = 0, lower: bool = False) -> List[Any]:
+        key = (pattern, flags, lower)
+        matches = self._matches.get(key)
+        if matches is None:
+            if self._over_budget():
+                return []
+            compiled = TextPatterns.compile(pattern, flags)
+            matches = self._matches[key] = [_findall_item(match) for _, match in self._finditer(compiled, lower)]
+        return matches
+
+    def search(self, pattern, flags: int = 0, lower: bool = False) -> bool:
+        matches = self._matches.get((pattern, flags, lower))
+        if matches is not None:
+            return bool(matches)
+        if self._over_budget():
+            return False
+        return next(self._finditer(TextPatterns.compile(pattern, flags), lower), None) is not None
+
+    def in_sequence(self, patterns, flags: int = 0, lower: bool = False) -> bool:
+        raise TypeError("StreamingContext does not support in_sequence (use AnalysisContext)")
+
+    def scan(self, pattern) -> Dict[str, List[str]]:
+        key = ('scan', pattern)
+        found = self._matches.get(key)
+        if found is None:
+            if self._over_budget():
+                return {kind: [] for kind in TextPatterns.kinds(pattern)}
+            found = {kind: [] for kind in TextPatterns.kinds(pattern)}
+            for _, match in self._finditer(pattern):
+                found[match.lastgroup].append(match.group())
+            self._matches[key] = found
+        return found
+
+    def terms(self, matcher: TermMatcher) -> TermHits:
+        """Term occurrences over the lowercased windows (TermHits without text: whole_words is not available)"""
+        key = ('terms', matcher)
+        hits = self._matches.get(key)
+        if hits is None:
+            longest = max((len(term) for term in matcher.terms), default=1)
+            positions = {}
+            offset = 0
+            carry = ''      # Text where an occurrence may run into the next piece
+            for piece in chain(self._pieces(lower=True), [None]):
+                buffer = carry + (piece or '')
+                limit = len(buffer) if piece is None else max(0, len(buffer) - longest + 1)
+                window = matcher.scan(buffer)
+                for term in matcher.terms:
+                    for start in window.positions(term):
+                        if start < limit:
+                            positions.setdefault(term, []).append(offset + start)
+                carry = buffer[limit:]
+                offset += limit
+            hits = self._matches[key] = TermHits(matcher, None, positions)
+        return hits
+
+
+def _verify_corpus(size):
+    from services.analysis_context import sample_contract
+    from services.text_patterns import adversarial_inputs
+
+    corpus = {f'sample_{n}': sample_contract(n, seed=n) for n in (0, 50, 300, 5000, size)}
+    corpus.update(adversarial_inputs(size))
+    return corpus
+
+
+def verify(size=256 * 1024, window=8 * 1024, overlap=2 * 1024) -> List[Dict[str, Any]]:
+    """
+    Compare process_document_stream with process_document_complete
+
+    Runs both on the sample contracts and the adversarial inputs, with
+    small windows so matches and sentences cross window edges. Returns
+    one row per document with the result keys that differ (processing
+    time aside); the extractors run without time budgets.
+    """
+    from services.document_processor import DocumentProcessor
+
+    processor = DocumentProcessor()
+    saved = (StreamingContext.WINDOW, StreamingContext.OVERLAP, AnalysisContext.TIME_BUDGET)
+    StreamingContext.WINDOW, StreamingContext.OVERLAP, AnalysisContext.TIME_BUDGET = window, overlap, float('inf')
+    try:
+        rows = []
+        for name, text in _verify_corpus(size).items():
+            expected = processor.process_document_complete(f"{name}.txt", text)
+            pieces = (text[i:i + 1000] for i in range(0, len(text), 1000))
+            streamed = processor.process_document_stream(f"{name}.txt", pieces)
+            differing = [key for key in expected if key != 'processing_date' and expected[key] != streamed.get(key)]
+            rows.append({'name': name, 'size': len(text), 'differing': differing})
+        return rows
+    finally:
+        StreamingContext.WINDOW, StreamingContext.OVERLAP, AnalysisContext.TIME_BUDGET = saved
+
+
+def benchmark(sizes=(1024 * 1024, 16 * 1024 * 1024)) -> List[Dict[str, Any]]:
+    """
+    Time and peak Python memory of process_document_complete on the whole
+    text against process_document_stream fed by TextExtractor.iter_plain
+    """
+    import time
+    import tracemalloc
+    from services.analysis_context import sample_contract
+    from services.document_processor import DocumentProcessor
+    from services.text_extraction import TextExtractor
+
+    processor = DocumentProcessor()
+
+    def measured(fn):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak
+
+    rows = []
+    for size in sizes:
+        data = sample_contract(size).encode('utf-8')
+        in_memory_s, in_memory_peak = measured(
+            lambda: processor.process_document_complete("contract.txt", str(data, 'utf-8'))
+        )
+        streaming_s, streaming_peak = measured(
+            lambda: processor.process_document_stream("contract.txt", TextExtractor.iter_plain(data))
+        )
+        rows.append({
+            'size': size,
+            'in_memory_s': in_memory_s,
+            'in_memory_peak_mb': in_memory_peak / (1024 * 1024),
+            'streaming_s': streaming_s,
+            'streaming_peak_mb': streaming_peak / (1024 * 1024)
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark or verify windowed streaming analysis")
+    parser.add_argument('--sizes-kb', type=int, nargs='+', default=[1024, 16 * 1024])
+    parser.add_argument('--verify', action='store_true', help="compare streaming and in-memory results instead")
+    args = parser.parse_args()
+
+    if args.verify:
+        failures = 0
+        for row in verify():
+            failures += bool(row['differing'])
+            print(f"{row['name']:<22} {row['size']:>9} {'ok' if not row['differing'] else 'DIFFERS: ' + ', '.join(row['differing'])}")
+        raise SystemExit(1 if failures else 0)
+
+    print(f"window {StreamingContext.WINDOW // 1024}K, overlap {StreamingContext.OVERLAP // 1024}K characters")
+    print(f"{'size':>10} {'in-memory s':>12} {'peak MB':>8} {'streaming s':>12} {'peak MB':>8}")
+    for row in benchmark([kb * 1024 for kb in args.sizes_kb]):
+        print(f"{row['size'] // 1024:>8}KB {row['in_memory_s']:>12.2f} {row['in_memory_peak_mb']:>8.1f} "
+              f"{row['streaming_s']:>12.2f} {row['streaming_peak_mb']:>8.1f}")
@@ -91,6 +91,56 @@ class SubscriptionManager:
         plan_details = self.get_plan_details(plan_name)
         return plan_details.get('limits', {})
     
+    # Stored resources limited per plan → usage ledger counter
+    RESOURCE_LIMITS = {
+        'documents': 'max_documents',
+        'matters': 'max_matters'
+    }
+    
+    def get_storage_usage(self, user_email):
+        """Stored documents, bytes and matters from the usage ledger (no collection loads)"""
+        from services.local_storage import LocalStorage
+        return LocalStorage.get_usage(user_email)
+    
+    def get_organization_members(self, org_code):
+        """Emails of the users whose organization_code is org_code"""
+        from services.local_storage import LocalStorage
+        users = LocalStorage.load_all_users()
+        return sorted(email for email, user in users.items() if user.get('organization_code') == org_code)
+    
+    def get_organization_usage(self, org_code, user_email=None):
+        """Usage counters summed over an organization's members (plus user_email), from the organization ledger"""
+        from services.local_storage import LocalStorage
+        from services.usage_ledger import UsageLedger
+        
+        usage = LocalStorage.get_organization_usage(org_code, lambda: self.get_organization_members(org_code))
+        totals = {key: usage[key] for key in UsageLedger.ORG_COUNTERS}
+        
+        # A user not (yet) recorded as a member still counts their own data
+        if user_email and user_email not in usage['members'] and user_email in LocalStorage.list_tenants():
+            own = self.get_storage_usage(user_email)
+            for key in UsageLedger.ORG_COUNTERS:
+                totals[key] += own.get(key, 0)
+        return totals
+    
+    def can_add_resource(self, org_code, user_email, resource, count=1):
+        """Check if count more documents/matters fit the plan's max_documents/max_matters (counted across the organization)"""
+        subscription = self.get_organization_subscription(org_code)
+        limits = self.get_plan_limits(subscription.get('plan', 'basic'))
+        limit = limits.get(SubscriptionManager.RESOURCE_LIMITS[resource], -1)
+        
+        # -1 means unlimited
+        if limit == -1:
+            return True, "unlimited"
+        
+        # Limits are per organization: every member's documents/matters count
+        usage = self.get_organization_usage(org_code, user_email).get(resource, 0)
+        
+        if usage + count > limit:
+            return False, f"Plan limit reached ({usage}/{limit} {resource})"
+        
+        return True, f"{usage}/{limit} {resource} used"
+    
     def can_use_feature(self, org_code, feature_name):
         """Check if organization can use a specific feature"""
         subscription = self.get_organization_subscription(org_code)
@@ -294,7 +344,7 @@ class EnhancedAuthService:
         
         # Load existing users
         from services.local_storage import LocalStorage
-        existing_users = LocalStorage.load_all_users()
+        existing_users = LocalStorage.load_all_users(refresh=True)
         
         # Check if email already exists
         if email in existing_users:
@@ -342,7 +392,7 @@ class EnhancedAuthService:
                 'role': 'member',
                 'created_at': datetime.now().isoformat()
             }
-            LocalStorage.save_all_users(existing_users)
+            LocalStorage.save_user(email, existing_users[email])
             
             # Send welcome email
             try:
@@ -397,7 +447,7 @@ class EnhancedAuthService:
                 'role': 'subscription_owner',
                 'created_at': datetime.now().isoformat()
             }
-            LocalStorage.save_all_users(existing_users)
+            LocalStorage.save_user(email, existing_users[email])
             
             # Send welcome email
             try:
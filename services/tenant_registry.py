@@ -0,0 +1,268 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from services.atomic_io import AtomicFile
+from services.file_lock import FileLock
+
+
+class TenantRegistry:
+    """
+    Hash-sharded tenant directories plus a registry of every tenant
+
+    Structure:
+    user_data/
+    ├── tenants.json                ← email → {path, created, size}
+    ├── tenants.lock
+    └── tenants/
+        └── 3f/a2/                  ← First bytes of SHA-256(email)
+            └── user_at_email_com/  ← Tenant directory
+
+    No directory holds more than 256 entries below the root, so lookups
+    stay fast with tens of thousands of tenants, and batch jobs enumerate
+    tenants from the registry instead of listing directories. Tenant
+    directories from the flat layout (user_data/<safe_email>/) are moved
+    into their shard the first time the tenant is resolved, or all at
+    once with migrate(), which also re-keys the tenants' backup catalogs
+    (see BackupEngine.tenant_key).
+    """
+
+    REGISTRY_FILE = "tenants.json"
+    LOCK_FILE = "tenants.lock"
+    SHARDS_DIR = "tenants"
+
+    _resolved = {}      # (data_dir, email) -> tenant directory
+    _cache = {}         # registry path -> (disk state, tenants)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def safe_name(user_email):
+        """Directory name of a tenant"""
+        return user_email.replace('@', '_at_').replace('.', '_').replace('/', '_')
+
+    @staticmethod
+    def shard_path(data_dir, user_email):
+        """Two-level sharded directory of a tenant"""
+        digest = hashlib.sha256(user_email.encode('utf-8')).hexdigest()
+        return os.path.join(data_dir, TenantRegistry.SHARDS_DIR, digest[:2], digest[2:4], TenantRegistry.safe_name(user_email))
+
+    @staticmethod
+    def registry_path(data_dir):
+        return os.path.join(data_dir, TenantRegistry.REGISTRY_FILE)
+
+    @staticmethod
+    def _disk_state(path):
+        try:
+            st_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st_result.st_mtime_ns, st_result.st_size, st_result.st_ino)
+
+    @staticmethod
+    def _read(data_dir):
+        """Registry contents: {tenants, migrated} (shared with the cache; do not mutate)"""
+        path = TenantRegistry.registry_path(data_dir)
+        state = TenantRegistry._disk_state(path)
+        if state is None:
+            return {'tenants': {}, 'migrated': None}
+
+        with TenantRegistry._lock:
+            cached = TenantRegistry._cache.get(path)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+
+        with open(path, 'r') as f:
+            registry = json.load(f)
+
+        with TenantRegistry._lock:
+            TenantRegistry._cache[path] = (state, registry)
+        return registry
+
+    @staticmethod
+    def _write(data_dir, registry):
+        path = TenantRegistry.registry_path(data_dir)
+        registry['version'] = 1
+        registry['last_modified'] = datetime.now().isoformat()
+        AtomicFile.write_text(path, json.dumps(registry, indent=2, sort_keys=True))
+
+        with TenantRegistry._lock:
+            TenantRegistry._cache[path] = (TenantRegistry._disk_state(path), registry)
+
+    @staticmethod
+    def _update(data_dir, apply):
+        """Read-modify-write the registry under its lock; apply(tenants, registry) returns False to skip the write"""
+        with FileLock.exclusive(os.path.join(data_dir, TenantRegistry.LOCK_FILE)):
+            current = TenantRegistry._read(data_dir)
+            registry = dict(current, tenants=dict(current['tenants']))
+            if apply(registry['tenants'], registry) is not False:
+                TenantRegistry._write(data_dir, registry)
+            return registry['tenants']
+
+    @staticmethod
+    def _entry(data_dir, path, created=None):
+        return {
+            'path': os.path.relpath(path, data_dir).replace(os.sep, '/'),
+            'created': created or datetime.now().isoformat(),
+            'size': TenantRegistry.directory_size(path)
+        }
+
+    @staticmethod
+    def resolve(data_dir, user_email):
+        """
+        Get (and create) a tenant's directory
+
+        Registers tenants seen for the first time and moves a directory
+        left in the flat layout into its shard, if its data files name this
+        tenant as owner (safe names of different emails can collide, see
+        migrate). Resolved paths are cached for the life of the process.
+        """
+        key = (data_dir, user_email)
+        path = TenantRegistry._resolved.get(key)
+        if path is not None:
+            return path
+
+        path = TenantRegistry.shard_path(data_dir, user_email)
+        if not (os.path.isdir(path) and user_email in TenantRegistry._read(data_dir)['tenants']):
+            def apply(tenants, registry):
+                legacy_path = os.path.join(data_dir, TenantRegistry.safe_name(user_email))
+                created = None
+                if (os.path.isdir(legacy_path) and not os.path.isdir(path)
+                        and TenantRegistry._legacy_owner(legacy_path) == user_email):
+                    created = datetime.fromtimestamp(os.stat(legacy_path).st_mtime).isoformat()
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(legacy_path, path)
+                os.makedirs(path, exist_ok=True)
+
+                if user_email in tenants:
+                    return False
+                tenants[user_email] = TenantRegistry._entry(data_dir, path, created)
+
+            TenantRegistry._update(data_dir, apply)
+
+        TenantRegistry._resolved[key] = path
+        return path
+
+    @staticmethod
+    def forget():
+        """Forget resolved tenant directories (call after moving or deleting them)"""
+        TenantRegistry._resolved.clear()
+
+    @staticmethod
+    def tenants(data_dir):
+        """email → {path, created, size} for every tenant (migrates a flat layout first)"""
+        if not TenantRegistry._read(data_dir)['migrated']:
+            TenantRegistry.migrate(data_dir)
+        return {email: dict(entry) for email, entry in TenantRegistry._read(data_dir)['tenants'].items()}
+
+    @staticmethod
+    def emails(data_dir):
+        """Emails of every tenant, sorted"""
+        return sorted(TenantRegistry.tenants(data_dir))
+
+    @staticmethod
+    def directory_size(path):
+        """Bytes stored under a directory"""
+        size = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    size += os.path.getsize(os.path.join(root, name))
+                except FileNotFoundError:
+                    pass
+        return size
+
+    @staticmethod
+    def update_size(data_dir, user_email, size=None):
+        """Record a tenant's size in bytes (measured now when not given)"""
+        path = TenantRegistry.resolve(data_dir, user_email)
+        size = TenantRegistry.directory_size(path) if size is None else size
+
+        def apply(tenants, registry):
+            if user_email not in tenants or tenants[user_email].get('size') == size:
+                return False
+            tenants[user_email] = dict(tenants[user_email], size=size)
+
+        TenantRegistry._update(data_dir, apply)
+        return size
+
+    @staticmethod
+    def _legacy_owner(path):
+        """Owner recorded in a flat-layout tenant directory's data files, or None"""
+        from services.local_storage import LocalStorage
+
+        # Collection files first, then the index of segmented collections
+        names = sorted(os.listdir(path))
+        candidates = [os.path.join(path, name) for name in names if name.endswith('.json')]
+        candidates.extend(os.path.join(path, name, 'index.json') for name in names)
+
+        for candidate in candidates:
+            if not os.path.isfile(candidate) or os.path.basename(os.path.dirname(candidate)) == LocalStorage.DOCUMENTS_DIR:
+                continue
+            try:
+                owner = LocalStorage.read_json_file(candidate).get('owner')
+            except (OSError, ValueError, AttributeError):
+                continue
+            if owner:
+                return owner
+        return None
+
+    @staticmethod
+    def migrate(data_dir):
+        """
+        Move every flat-layout tenant directory into its shard and register it
+
+        The owner is read from the tenant's data files; directories without
+        any are left in place. Dot-directories (restore staging) and the
+        shard root are skipped. Backup catalogs still keyed by directory
+        name are moved to their tenant's key as well. Returns the number
+        of tenants moved.
+        """
+        from services.backup_engine import BackupEngine
+
+        if not os.path.isdir(data_dir):
+            return 0
+
+        legacy = []
+        for entry in os.scandir(data_dir):
+            if not entry.is_dir() or entry.name.startswith('.') or entry.name == TenantRegistry.SHARDS_DIR:
+                continue
+            owner = TenantRegistry._legacy_owner(entry.path)
+            if owner and TenantRegistry.safe_name(owner) == entry.name:
+                legacy.append(owner)
+
+        for user_email in legacy:
+            TenantRegistry.resolve(data_dir, user_email)
+
+        for user_email in TenantRegistry._read(data_dir)['tenants']:
+            BackupEngine.migrate_catalog(user_email)
+
+        def apply(tenants, registry):
+            registry['migrated'] = datetime.now().isoformat()
+
+        TenantRegistry._update(data_dir, apply)
+        return len(legacy)
+
+
+if __name__ == "__main__":
+    import argparse
+    from services.local_storage import LocalStorage
+
+    parser = argparse.ArgumentParser(description="Tenant directory sharding and registry")
+    parser.add_argument('--data-dir', default=LocalStorage.DATA_DIR)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('migrate', help="Move flat-layout tenant directories into shards")
+    subparsers.add_parser('list', help="List registered tenants")
+    subparsers.add_parser('refresh', help="Re-measure every tenant's size")
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        moved = TenantRegistry.migrate(args.data_dir)
+        print(f"Moved {moved} tenant directories into shards ({len(TenantRegistry.emails(args.data_dir))} tenants registered)")
+    elif args.command == 'list':
+        for email, entry in sorted(TenantRegistry.tenants(args.data_dir).items()):
+            print(f"{email:<40} {entry['created'][:19]}  {entry['size'] / (1024 * 1024):>10.2f} MB  {entry['path']}")
+    else:
+        total = sum(TenantRegistry.update_size(args.data_dir, email) for email in TenantRegistry.emails(args.data_dir))
+        print(f"{len(TenantRegistry.emails(args.data_dir))} tenants, {total / (1024 * 1024):.1f} MB")
@@ -0,0 +1,222 @@
+import re
+import threading
+from typing import Dict, List, Any
+
+# C implementation of the automaton (pyahocorasick); a compiled trie regex is used without it
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+
+class TermHits:
+    """
+    Every occurrence of every term of a TermMatcher in one text
+
+    count() follows str.count (non-overlapping occurrences), so it can
+    replace text.count(term) and `term in text` checks one for one.
+    whole_words=True only counts occurrences not joined to a letter,
+    digit or underscore on either side.
+    """
+
+    def __init__(self, matcher: 'TermMatcher', text: str, positions: Dict[str, List[int]]):
+        self.matcher = matcher
+        self.text = text
+        self._positions = positions
+
+    def positions(self, term: str, whole_words: bool = False) -> List[int]:
+        """Start offsets of a term, overlapping occurrences included"""
+        if term not in self.matcher.terms:
+            raise KeyError(f"'{term}' is not a term of this matcher")
+        starts = self._positions.get(term, [])
+        if whole_words:
+            starts = [start for start in starts if self._whole_word(start, len(term))]
+        return starts
+
+    def _whole_word(self, start: int, length: int) -> bool:
+        end = start + length
+        before = self.text[start - 1] if start > 0 else ' '
+        after = self.text[end] if end < len(self.text) else ' '
+        return not (before.isalnum() or before == '_' or after.isalnum() or after == '_')
+
+    def count(self, term: str, whole_words: bool = False) -> int:
+        """Non-overlapping occurrences of a term, as str.count"""
+        starts = self.positions(term, whole_words)
+        if term not in self.matcher.self_overlapping:
+            return len(starts)
+        hits = 0
+        next_free = 0
+        for start in starts:
+            if start >= next_free:
+                hits += 1
+                next_free = start + len(term)
+        return hits
+
+    def contains(self, term: str, whole_words: bool = False) -> bool:
+        return bool(self.positions(term, whole_words))
+
+    def count_any(self, terms, whole_words: bool = False) -> int:
+        """How many of the terms occur at least once"""
+        return sum(1 for term in terms if self.contains(term, whole_words))
+
+    def total(self, terms, whole_words: bool = False) -> int:
+        """Occurrences of all the terms together (sum of count())"""
+        return sum(self.count(term, whole_words) for term in terms)
+
+    def counts(self, whole_words: bool = False) -> Dict[str, int]:
+        """term -> count() for every term that occurs"""
+        found = {term: self.count(term, whole_words) for term in self._positions}
+        return {term: hits for term, hits in found.items() if hits}
+
+
+class TermMatcher:
+    """
+    Finds every occurrence of a fixed set of terms in one pass over a text
+
+    With pyahocorasick installed the terms are compiled into an
+    Aho-Corasick automaton that reports every (overlapping) occurrence in
+    one scan. Without it, the terms are arranged in a trie that is
+    compiled into a single regular expression tried once at each position:
+    each position follows one path through the trie to the longest term
+    starting there, and every shorter term on that path (its prefixes in
+    the term set) occurs there too. Either way the text is read once
+    whatever the number of terms, where a count per keyword rescans it once
+    per term.
+
+    Terms and scanned text are lowercase; scan the lowercased text (or use
+    AnalysisContext.terms(), which also keeps the result per document).
+    Matchers are cached by term set, so of() builds each one once per
+    process.
+    """
+
+    _built = {}     # sorted term tuple -> matcher
+    _lock = threading.Lock()
+
+    def __init__(self, terms):
+        self.terms = frozenset(term for term in terms if term)
+        self.self_overlapping = frozenset(term for term in self.terms if TermMatcher._has_border(term))
+        self._automaton = None
+        self._pattern = None
+        if not self.terms:
+            return
+
+        if AHOCORASICK_AVAILABLE:
+            self._automaton = ahocorasick.Automaton()
+            for term in self.terms:
+                self._automaton.add_word(term, term)
+            self._automaton.make_automaton()
+            return
+
+        # Terms found at a position when the longest one starting there is `term`
+        self._prefixes = {term: [other for other in self.terms if term.startswith(other)] for term in self.terms}
+        trie = {}
+        for term in self.terms:
+            node = trie
+            for char in term:
+                node = node.setdefault(char, {})
+            node[''] = True
+        self._pattern = re.compile(f'(?=({TermMatcher._compile_trie(trie)}))')
+
+    @staticmethod
+    def of(terms) -> 'TermMatcher':
+        """Matcher for a collection of terms, built on first use"""
+        key = tuple(sorted(set(terms)))
+        matcher = TermMatcher._built.get(key)
+        if matcher is None:
+            matcher = TermMatcher(key)
+            with TermMatcher._lock:
+                matcher = TermMatcher._built.setdefault(key, matcher)
+        return matcher
+
+    @staticmethod
+    def _has_border(term: str) -> bool:
+        """Whether two occurrences of the term can overlap (a proper prefix is also a suffix)"""
+        return any(term[:size] == term[-size:] for size in range(1, len(term)))
+
+    @staticmethod
+    def _compile_trie(node: Dict) -> str:
+        """Regex for the paths of a trie node; optional children are greedy, so the longest term wins"""
+        branches = [re.escape(char) + TermMatcher._compile_trie(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        return f'(?:{body})?' if '' in node else body
+
+    def scan(self, text: str) -> TermHits:
+        """Every occurrence of every term in a lowercase text"""
+        positions = {}
+        if self._automaton is not None:
+            for end, term in self._automaton.iter(text):
+                start = end - len(term) + 1
+                starts = positions.get(term)
+                if starts is None:
+                    positions[term] = [start]
+                else:
+                    starts.append(start)
+        elif self._pattern is not None:
+            prefixes = self._prefixes
+            for match in self._pattern.finditer(text):
+                start = match.start()
+                for term in prefixes[match.group(1)]:
+                    starts = positions.get(term)
+                    if starts is None:
+                        positions[term] = [start]
+                    else:
+                        starts.append(start)
+        return TermHits(self, text, positions)
+
+
+def benchmark(sizes=(10 * 1024, 1024 * 1024), repeat=3) -> List[Dict[str, Any]]:
+    """
+    One TermMatcher scan against a str.count per keyword
+
+    Uses the keyword dictionaries of AIAnalysisSystem and DocumentProcessor
+    on the lowercased sample contract. Times are the best of repeat runs,
+    in milliseconds.
+    """
+    import time
+    from services.ai_analysis import AIAnalysisSystem
+    from services.analysis_context import sample_contract
+    from services.document_processor import DocumentProcessor
+
+    matchers = {
+        'AIAnalysisSystem': AIAnalysisSystem().term_matcher,
+        'DocumentProcessor sentiment': DocumentProcessor.SENTIMENT_MATCHER,
+        'DocumentProcessor classification': DocumentProcessor.CLASSIFICATION_MATCHER
+    }
+
+    def best_ms(fn):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    rows = []
+    for size in sizes:
+        text = sample_contract(size).lower()
+        for name, matcher in matchers.items():
+            rows.append({
+                'size': size,
+                'name': f"{name} ({len(matcher.terms)} terms)",
+                'per_keyword_ms': best_ms(lambda: {term: text.count(term) for term in matcher.terms}),
+                'scan_ms': best_ms(lambda: matcher.scan(text).counts())
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the single-pass keyword matcher")
+    parser.add_argument('--sizes-kb', type=int, nargs='+', default=[10, 1024])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Automaton: {'pyahocorasick' if AHOCORASICK_AVAILABLE else 'compiled trie regex (pyahocorasick not installed)'}")
+    print(f"{'size':>10} {'dictionary':<44} {'per-keyword ms':>15} {'scan ms':>9}")
+    for row in benchmark([kb * 1024 for kb in args.sizes_kb], args.repeat):
+        print(f"{row['size'] // 1024:>8}KB {row['name']:<44} {row['per_keyword_ms']:>15.2f} {row['scan_ms']:>9.2f}")
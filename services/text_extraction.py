@@ -0,0 +1,151 @@
+import io
+import codecs
+
+# Optional format libraries; plain text needs none of them
+try:
+    import PyPDF2
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+
+try:
+    import docx
+    DOCX_AVAILABLE = True
+except ImportError:
+    DOCX_AVAILABLE = False
+
+try:
+    import pytesseract
+    from PIL import Image
+    OCR_AVAILABLE = True
+except ImportError:
+    OCR_AVAILABLE = False
+
+
+class TextExtractor:
+    """
+    Text of uploaded documents from their raw bytes
+
+    Works on bytes and a MIME type rather than on Streamlit upload objects,
+    so extraction can run in batch worker processes. Errors are raised
+    (ValueError for an unsupported type, RuntimeError for a missing
+    library); the page turns them into messages.
+
+    iter_text() yields the text in pieces (a page, a paragraph or table
+    row, a block of plain text) for StreamingContext, which analyzes very
+    large documents without holding their text; extract() joins the pieces.
+    """
+
+    PDF = "application/pdf"
+    DOCX = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    TEXT = "text/plain"
+
+    TEXT_BLOCK = 1024 * 1024    # Bytes of plain text decoded per piece
+
+    @staticmethod
+    def extract(data: bytes, mime_type: str) -> str:
+        """Text of a document of any supported type"""
+        return ''.join(TextExtractor.iter_text(data, mime_type))
+
+    @staticmethod
+    def iter_text(data: bytes, mime_type: str):
+        """Text of a document of any supported type, as an iterator of pieces"""
+        if mime_type == TextExtractor.PDF:
+            return TextExtractor.iter_pdf(data)
+        elif mime_type == TextExtractor.DOCX:
+            return TextExtractor.iter_docx(data)
+        elif mime_type == TextExtractor.TEXT:
+            return TextExtractor.iter_plain(data)
+        elif mime_type.startswith('image/'):
+            return TextExtractor.iter_image(data)
+        raise ValueError(f"Unsupported file type: {mime_type}")
+
+    @staticmethod
+    def _or_placeholder(pieces, placeholder: str):
+        """The pieces, or the placeholder alone when they are all blank (blank pieces wait for text)"""
+        blank = []
+        found = False
+        for piece in pieces:
+            if not piece.strip():
+                blank.append(piece)
+                continue
+            found = True
+            yield from blank
+            blank = []
+            yield piece
+        if found:
+            yield from blank
+        else:
+            yield placeholder
+
+    @staticmethod
+    def iter_plain(data: bytes):
+        """UTF-8 text decoded a block at a time (invalid UTF-8 raises UnicodeDecodeError, as str(data, 'utf-8'))"""
+        decoder = codecs.getincrementaldecoder('utf-8')()
+        view = memoryview(data)
+        for start in range(0, len(data), TextExtractor.TEXT_BLOCK):
+            piece = decoder.decode(view[start:start + TextExtractor.TEXT_BLOCK])
+            if piece:
+                yield piece
+        piece = decoder.decode(b'', final=True)
+        if piece:
+            yield piece
+
+    @staticmethod
+    def iter_pdf(data: bytes):
+        """Text of each page that has any"""
+        if not PDF_AVAILABLE:
+            raise RuntimeError("PDF support requires PyPDF2: pip install PyPDF2")
+
+        def pages():
+            pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+            for page in pdf_reader.pages:
+                page_text = page.extract_text()
+                if page_text:
+                    yield page_text + "\n"
+
+        return TextExtractor._or_placeholder(pages(), "PDF contains no extractable text. It may be scanned or image-based.")
+
+    @staticmethod
+    def iter_docx(data: bytes):
+        """Each non-empty paragraph, then each table row"""
+        if not DOCX_AVAILABLE:
+            raise RuntimeError("Word support requires python-docx: pip install python-docx")
+
+        def blocks():
+            doc = docx.Document(io.BytesIO(data))
+            for paragraph in doc.paragraphs:
+                if paragraph.text.strip():
+                    yield paragraph.text + "\n"
+
+            # Also extract text from tables if present
+            for table in doc.tables:
+                for row in table.rows:
+                    yield ''.join(cell.text + " " for cell in row.cells if cell.text.strip()) + "\n"
+
+        return TextExtractor._or_placeholder(blocks(), "Word document contains no text.")
+
+    @staticmethod
+    def iter_image(data: bytes):
+        """OCR text in one piece; raises pytesseract.TesseractNotFoundError without the tesseract binary"""
+        if not OCR_AVAILABLE:
+            raise RuntimeError("OCR requires pytesseract and pillow: pip install pytesseract pillow")
+
+        image = Image.open(io.BytesIO(data))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+
+        text = pytesseract.image_to_string(image, lang='eng')
+        return TextExtractor._or_placeholder([text], "No text detected in image. Image may be too low quality or contain no text.")
+
+    @staticmethod
+    def from_pdf(data: bytes) -> str:
+        return ''.join(TextExtractor.iter_pdf(data))
+
+    @staticmethod
+    def from_docx(data: bytes) -> str:
+        return ''.join(TextExtractor.iter_docx(data))
+
+    @staticmethod
+    def from_image(data: bytes) -> str:
+        return ''.join(TextExtractor.iter_image(data))
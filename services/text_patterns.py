@@ -0,0 +1,296 @@
+import re
+import threading
+from typing import Dict, List, Any
+
+
+def _combined(first_chars: str, formats: Dict[str, str], flags: int = 0):
+    """
+    One pattern matching any of formats (name -> pattern) at each position
+
+    An alternation of groups defeats re's prefix scan, so every position
+    would enter every alternative; the leading lookahead on first_chars (a
+    class covering the first character of every format) rejects most
+    positions with a single character test.
+    """
+    alternatives = '|'.join(f'(?P<{name}>{pattern})' for name, pattern in formats.items())
+    return re.compile(f'(?={first_chars})(?:{alternatives})', flags)
+
+
+class TextPatterns:
+    """
+    Compiled regular expressions shared by AIAnalysisSystem and DocumentProcessor
+
+    compile() keeps every (pattern, flags) pair it has seen for the life of
+    the process, so the analyzers never fall back to re's bounded module
+    cache. The combined patterns below find several formats of the same
+    kind of value in one scan; the name of the format that matched
+    (Match.lastgroup) says which one it was:
+
+        MONEY       dollar_sign | usd_prefix | dollars | usd_suffix
+        DATES       numeric | month_day_year | day_month_year | iso
+        PHONES      international | parenthesized | plain
+        SENSITIVE   ssn | tax_id | credit_card | bank_account
+
+    A combined scan reports each stretch of text once, as the leftmost
+    (then first-listed) format, where separate scans could report
+    overlapping values twice.
+    """
+
+    MONTHS = r'(?:January|February|March|April|May|June|July|August|September|October|November|December)'
+
+    MONEY_FORMATS = {
+        'dollar_sign': r'\$[\d,]+(?:\.\d{2})?',                  # $1,000.00
+        'usd_prefix': r'USD\s*[\d,]+(?:\.\d{2})?',               # USD 1000.00
+        'dollars': r'(?<![\d,])[\d,]+(?![\d,])\s*dollars?',     # 1000 dollars
+        'usd_suffix': r'(?<![\d,])[\d,]+(?![\d,])\s*USD'        # 1000 USD
+    }
+    MONEY = _combined(r'[$\d,Uu]', MONEY_FORMATS, re.IGNORECASE)
+
+    DATE_FORMATS = {
+        'numeric': r'\b\d{1,2}[/-]\d{1,2}[/-]\d{2,4}\b',                # MM/DD/YYYY, M/D/YY
+        'month_day_year': r'\b' + MONTHS + r'\s+\d{1,2},?\s+\d{4}\b',   # Month DD, YYYY
+        'day_month_year': r'\b\d{1,2}\s+' + MONTHS + r'\s+\d{4}\b',     # DD Month YYYY
+        'iso': r'\b\d{4}[-/]\d{1,2}[-/]\d{1,2}\b'                       # YYYY-MM-DD
+    }
+    DATES = _combined(r'[\dJFMASONDjfmasond]', DATE_FORMATS, re.IGNORECASE)
+
+    PHONE_FORMATS = {
+        'international': r'\+1[-.\s]?\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b',  # +1-123-456-7890
+        'parenthesized': r'\(\d{3}\)\s*\d{3}[-.\s]?\d{4}\b',           # (123) 456-7890
+        'plain': r'\b\d{3}[-.\s]?\d{3}[-.\s]?\d{4}\b'                  # 123-456-7890, 123.456.7890, 123 456 7890
+    }
+    PHONES = _combined(r'[+(\d]', PHONE_FORMATS)
+
+    SENSITIVE_FORMATS = {
+        'ssn': r'\b\d{3}-\d{2}-\d{4}\b',
+        'tax_id': r'\b\d{2}-\d{7}\b',
+        'credit_card': r'\b(?:\d{4}[-\s]?){3}\d{4}\b',    # basic
+        'bank_account': r'\b\d{8,17}\b'                     # basic
+    }
+    SENSITIVE = _combined(r'\d', SENSITIVE_FORMATS)
+
+    # The lookahead caps the local part at 64 characters (RFC 5321), so a long run of
+    # address characters is not rescanned from every word boundary inside it
+    EMAIL = re.compile(r'\b(?=[A-Za-z0-9._%+-]{1,64}@)[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]{1,253}\.[A-Z|a-z]{2,}\b')
+
+    _compiled = {}      # (pattern, flags) -> compiled pattern
+    _lock = threading.Lock()
+
+    @staticmethod
+    def compile(pattern, flags: int = 0):
+        """Compiled form of a pattern string (compiled patterns are returned as is)"""
+        if isinstance(pattern, re.Pattern):
+            return pattern
+        key = (pattern, flags)
+        compiled = TextPatterns._compiled.get(key)
+        if compiled is None:
+            compiled = re.compile(pattern, flags)
+            with TextPatterns._lock:
+                TextPatterns._compiled[key] = compiled
+        return compiled
+
+    @staticmethod
+    def findall(pattern, text: str, flags: int = 0) -> List[Any]:
+        return TextPatterns.compile(pattern, flags).findall(text)
+
+    @staticmethod
+    def search(pattern, text: str, flags: int = 0) -> bool:
+        return TextPatterns.compile(pattern, flags).search(text) is not None
+
+    @staticmethod
+    def in_sequence(patterns, text: str, flags: int = 0) -> bool:
+        """
+        Whether the patterns match one after another on one line
+
+        Gives the answer of re.search('A.*B.*C') for patterns that do not
+        span lines, in linear time: the regex retries the rest of the line
+        from every match of A, which is quadratic on long lines. Here only
+        the first match of A on each line is followed up, since any later
+        one leaves less of the line for B and C.
+        """
+        compiled = [TextPatterns.compile(pattern, flags) for pattern in patterns]
+        position = 0
+        while position <= len(text):
+            first = compiled[0].search(text, position)
+            if first is None:
+                return False
+            line_end = text.find('\n', first.end())
+            if line_end == -1:
+                line_end = len(text)
+            end = first.end()
+            for pattern in compiled[1:]:
+                match = pattern.search(text, end, line_end)
+                if match is None:
+                    break
+                end = match.end()
+            else:
+                return True
+            position = line_end + 1
+        return False
+
+    @staticmethod
+    def kinds(pattern) -> List[str]:
+        """Names of the alternatives of a combined pattern, in match priority order"""
+        return sorted(pattern.groupindex, key=pattern.groupindex.get)
+
+    @staticmethod
+    def scan(pattern, text: str) -> Dict[str, List[str]]:
+        """One pass of a combined pattern: alternative name -> matched texts in document order"""
+        found = {kind: [] for kind in TextPatterns.kinds(pattern)}
+        for match in pattern.finditer(text):
+            found[match.lastgroup].append(match.group())
+        return found
+
+
+def benchmark(size=32 * 1024, repeat=5) -> List[Dict[str, Any]]:
+    """
+    Micro-benchmark of every extractor plus the combined patterns
+
+    Extractor rows time one call on a fresh AnalysisContext (so nothing is
+    served from an earlier call's matches). Combined-pattern rows compare
+    one scan of the combined pattern with one scan per format. Times are
+    the best of repeat runs, in milliseconds.
+    """
+    import time
+    from services.ai_analysis import AIAnalysisSystem
+    from services.analysis_context import AnalysisContext, sample_contract
+    from services.document_processor import DocumentProcessor
+
+    text = sample_contract(size)
+    ai_system = AIAnalysisSystem()
+    processor = DocumentProcessor()
+
+    def best_ms(fn):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    extractors = {
+        'extract_key_information': processor.extract_key_information,
+        'extract_parties': processor.extract_parties,
+        'extract_contract_terms': processor.extract_contract_terms,
+        'extract_deadlines_and_dates': processor.extract_deadlines_and_dates,
+        'detect_sensitive_information': processor.detect_sensitive_information,
+        'generate_document_summary': processor.generate_document_summary,
+        '_assess_risk_level': ai_system._assess_risk_level,
+        '_identify_key_clauses': ai_system._identify_key_clauses,
+        '_extract_financial_terms': ai_system._extract_financial_terms,
+        '_analyze_timeline': ai_system._analyze_timeline,
+        '_extract_obligations': ai_system._extract_obligations,
+        '_identify_red_flags': ai_system._identify_red_flags,
+        '_identify_negotiation_points': ai_system._identify_negotiation_points
+    }
+
+    rows = []
+    for name, extractor in extractors.items():
+        rows.append({'name': name, 'ms': best_ms(lambda: extractor(AnalysisContext(text)))})
+
+    combined_patterns = [
+        ('MONEY', TextPatterns.MONEY, TextPatterns.MONEY_FORMATS),
+        ('DATES', TextPatterns.DATES, TextPatterns.DATE_FORMATS),
+        ('PHONES', TextPatterns.PHONES, TextPatterns.PHONE_FORMATS),
+        ('SENSITIVE', TextPatterns.SENSITIVE, TextPatterns.SENSITIVE_FORMATS)
+    ]
+    for name, combined, formats in combined_patterns:
+        alternatives = [re.compile(pattern, combined.flags) for pattern in formats.values()]
+        separate_ms = best_ms(lambda: [pattern.findall(text) for pattern in alternatives])
+        combined_ms = best_ms(lambda: TextPatterns.scan(combined, text))
+        rows.append({'name': f"{name} ({len(alternatives)} formats)", 'ms': combined_ms, 'separate_ms': separate_ms})
+
+    return rows
+
+
+def adversarial_inputs(size: int, seed: int = 3) -> Dict[str, str]:
+    """
+    Inputs of about size characters that drive backtracking regexes to their worst case
+
+    Long runs without sentence punctuation or line breaks, runs of digits,
+    words or pattern prefixes that almost match (addresses without a street
+    suffix, company names without Inc/LLC, e-mail local parts without @),
+    plus random mixtures of contract tokens.
+    """
+    import random
+    from services.analysis_context import sample_contract
+
+    contract = sample_contract(size)
+    rng = random.Random(seed)
+    tokens = ['terminate ', 'pay ', '30 days ', '$1,000 ', 'Inc ', 'Street ', 'between ', 'and ', ' ', '\n', '.',
+              ', ', 'shall ', 'all ', 'intellectual property ', 'Acme ', '12 ', 'end ', 'notice ', '-', 'Signed ']
+    return {
+        'no_periods': contract.replace('.', ' ').replace('!', ' ').replace('?', ' '),
+        'one_line_no_periods': contract.replace('.', ' ').replace('\n', ' '),
+        'long_word': 'a' * size,
+        'digits': '1' * size,
+        'digit_words': '1 ' * (size // 2),
+        'address_like': '12 ' + 'Main ' * (size // 5),
+        'entity_like': 'Acme ' * (size // 5),
+        'dotted': 'A.' * (size // 2),
+        'terminat_run': 'terminate ' * (size // 10),
+        'signed_run': 'Signed ' * (size // 7),
+        'spaces': ' ' * size,
+        'shall_run': 'shall all any ' * (size // 14),
+        'between_run': 'between ' * (size // 8),
+        'fuzz': ''.join(rng.choice(tokens) for _ in range(size // 6))
+    }
+
+
+def worst_case(size=256 * 1024) -> List[Dict[str, Any]]:
+    """
+    Time the full analysis of every adversarial input
+
+    Runs analyze_contract + process_document_complete on one shared
+    context, then extract_key_metrics and analyze_contract_lifecycle, as
+    the pages do. Returns one row per input with the seconds taken and the
+    extractors that ran out of time budget.
+    """
+    import time
+    from services.ai_analysis import AIAnalysisSystem
+    from services.analysis_context import AnalysisContext
+    from services.document_processor import DocumentProcessor
+
+    ai_system = AIAnalysisSystem()
+    processor = DocumentProcessor()
+
+    rows = []
+    for name, text in adversarial_inputs(size).items():
+        start = time.perf_counter()
+        context = AnalysisContext(text)
+        ai_system.analyze_contract(context)
+        processor.process_document_complete("adversarial.txt", context)
+        ai_system.extract_key_metrics(context)
+        ai_system.analyze_contract_lifecycle(context)
+        rows.append({'name': name, 'seconds': time.perf_counter() - start, 'degraded': list(context.degraded)})
+    return rows
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Micro-benchmark the regex extractors")
+    parser.add_argument('--size-kb', type=int, default=32)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--adversarial', action='store_true',
+                        help="Run the full analysis on worst-case inputs instead")
+    parser.add_argument('--limit', type=float, default=None,
+                        help="With --adversarial: exit with status 1 if any input takes longer (seconds)")
+    args = parser.parse_args()
+
+    if args.adversarial:
+        slowest = 0.0
+        print(f"{'input':<22} {'seconds':>8}  degraded")
+        for row in worst_case(args.size_kb * 1024):
+            slowest = max(slowest, row['seconds'])
+            print(f"{row['name']:<22} {row['seconds']:>8.2f}  {', '.join(row['degraded']) or '-'}")
+        if args.limit is not None and slowest > args.limit:
+            print(f"Slowest input took {slowest:.2f}s (limit {args.limit:.2f}s)")
+            sys.exit(1)
+    else:
+        print(f"{'extractor / pattern':<34} {'ms':>9} {'separate ms':>12}")
+        for row in benchmark(args.size_kb * 1024, args.repeat):
+            separate = f"{row['separate_ms']:>12.2f}" if 'separate_ms' in row else ''
+            print(f"{row['name']:<34} {row['ms']:>9.2f} {separate}")
@@ -0,0 +1,129 @@
+import streamlit as st
+from contextlib import contextmanager
+
+from services.storage_journal import RecordJournal
+
+
+class SessionUnitOfWork:
+    """
+    Session-level unit of work for auto-saved collections
+
+    Keeps a copy of each collection as last loaded/persisted for this
+    session and marks a collection dirty only when its current value
+    differs, so auto-saving an unchanged collection writes nothing.
+    Inside deferred_flush() (pages run in one, see DataSecurity.deferred_saves)
+    save() only marks collections dirty and they are written once when the
+    block exits, so repeated auto-saves within a rerun coalesce into a
+    single write per collection; outside it save() flushes right away. A
+    collection that could not be written stays dirty and is retried by the
+    next flush(). The copy is also passed as the save's base, so edits
+    other sessions made in the meantime are merged rather than lost.
+    """
+
+    SESSION_KEY = '_unit_of_work'
+
+    def __init__(self):
+        self.persisted = {}     # (email, data_type) -> copy as last written/loaded
+        self.dirty = {}         # (email, data_type) -> current value
+        self.deferred = 0       # Nesting depth of deferred_flush() blocks
+        self.stats = {'writes': 0, 'skipped': 0, 'flushes': 0, 'merged': 0}
+
+    @staticmethod
+    def current():
+        """Get this browser session's unit of work"""
+        if SessionUnitOfWork.SESSION_KEY not in st.session_state:
+            st.session_state[SessionUnitOfWork.SESSION_KEY] = SessionUnitOfWork()
+        return st.session_state[SessionUnitOfWork.SESSION_KEY]
+
+    def loaded(self, email, data_type, value):
+        """Remember the first load of a collection this session as its base"""
+        key = (email, data_type)
+        if key not in self.persisted:
+            self.persisted[key] = RecordJournal.deep_copy(value)
+
+    def track(self, data_type, value):
+        """Mark a collection dirty if it differs from what was last persisted"""
+        from services.data_security import DataSecurity
+
+        key = (DataSecurity.get_current_user_email(), data_type)
+
+        if key not in self.persisted:
+            # First sighting this session: compare against storage (a cache hit
+            # when the page just loaded it) so untouched data is not rewritten
+            stored = DataSecurity.load_user_data(data_type, None)
+            if stored is not None:
+                self.persisted[key] = stored
+
+        if key in self.persisted and self.persisted[key] == value:
+            self.dirty.pop(key, None)
+            self.stats['skipped'] += 1
+            return False
+
+        self.dirty[key] = value
+        return True
+
+    def flush(self):
+        """Write dirty collections; returns the number written"""
+        if not self.dirty:
+            return 0
+
+        from services.data_security import DataSecurity
+
+        current_email = DataSecurity.get_current_user_email()
+        written = 0
+        for key, value in list(self.dirty.items()):
+            email, data_type = key
+            if email != current_email:
+                # Never write one user's pending data under another login
+                del self.dirty[key]
+                continue
+
+            stored = DataSecurity.save_user_data(data_type, value, base=self.persisted.get(key))
+            if stored is not value and isinstance(value, list):
+                # Show records merged in from other sessions in this one too
+                value[:] = stored
+                self.stats['merged'] += 1
+            self.persisted[key] = RecordJournal.deep_copy(stored)
+            del self.dirty[key]
+            written += 1
+
+        self.stats['writes'] += written
+        self.stats['flushes'] += 1
+        return written
+
+    def save(self, data_types, source=None):
+        """Track the given collections from session state (or source dict) and flush unless deferred"""
+        source = st.session_state if source is None else source
+        for data_type in data_types:
+            if data_type in source:
+                self.track(data_type, source[data_type])
+        if self.deferred:
+            return 0
+        return self.flush()
+
+    @contextmanager
+    def deferred_flush(self):
+        """Hold save() writes until the block exits (also via st.rerun()/st.stop()), then flush once"""
+        self.deferred += 1
+        try:
+            yield self
+        finally:
+            self.deferred -= 1
+            if not self.deferred:
+                self.flush()
+
+    def discard(self, email, source=None):
+        """
+        Forget a user's collections after their stored data was replaced (e.g. a restore)
+
+        Pending changes are dropped and the collections removed from session
+        state (or source dict), so pages reload them instead of saving the
+        old copies back. Returns the data types removed.
+        """
+        source = st.session_state if source is None else source
+        data_types = sorted({data_type for owner, data_type in list(self.persisted) + list(self.dirty) if owner == email})
+        for data_type in data_types:
+            self.persisted.pop((email, data_type), None)
+            self.dirty.pop((email, data_type), None)
+            source.pop(data_type, None)
+        return data_types
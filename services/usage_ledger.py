@@ -0,0 +1,342 @@
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+from services.atomic_io import AtomicFile
+from services.file_lock import FileLock
+from services.tenant_registry import TenantRegistry
+
+
+class UsageLedger:
+    """
+    Per-tenant usage counters kept current on every save and delete
+
+    Structure:
+    user_data/
+    └── user_at_email_com/
+        ├── usage.json      ← {owner, last_modified, data: counters}
+        └── usage.lock      ← Serializes ledger updates across processes
+
+    Counters: documents / document_bytes / stored_bytes (mirroring the
+    blob store manifest totals), matters, and the record count of every
+    list collection. Plan checks read this one small file instead of
+    loading whole collections; reads are served from memory until the file
+    changes on disk. reconcile() rebuilds the counters from a full scan.
+
+    Plan limits are per organization, so every ledger write also updates
+    the organization's aggregate:
+
+    user_data/
+    └── organizations/
+        ├── 5d41402abc4b2a76.json   ← {org_code, data: ORG_COUNTERS totals + members}
+        └── 5d41402abc4b2a76.lock
+
+    It keeps each member's last recorded ORG_COUNTERS, so a member update
+    adds only the difference and a plan check is one cached file read.
+    The aggregate is built from the members' ledgers the first time it is
+    read (rebuild_organization); a user moving to another organization is
+    only reflected after a rebuild.
+    """
+
+    LEDGER_FILE = "usage.json"
+    LOCK_FILE = "usage.lock"
+    ORGS_DIR = "organizations"
+
+    # Counters summed per organization
+    ORG_COUNTERS = ('documents', 'document_bytes', 'stored_bytes', 'matters')
+
+    _cache = {}     # ledger path -> (disk state, counters)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def ledger_path(user_dir):
+        return os.path.join(user_dir, UsageLedger.LEDGER_FILE)
+
+    @staticmethod
+    def lock_path(user_dir):
+        return os.path.join(user_dir, UsageLedger.LOCK_FILE)
+
+    @staticmethod
+    def _empty():
+        return {
+            'documents': 0,
+            'document_bytes': 0,
+            'stored_bytes': 0,
+            'matters': 0,
+            'collections': {},
+            'reconciled': None
+        }
+
+    @staticmethod
+    def _disk_state(path):
+        try:
+            st_result = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st_result.st_mtime_ns, st_result.st_size, st_result.st_ino)
+
+    @staticmethod
+    def read(user_dir):
+        """Current counters for a tenant, or None if no ledger exists yet"""
+        return UsageLedger._read_cached(UsageLedger.ledger_path(user_dir))
+
+    @staticmethod
+    def _read_cached(path):
+        """'data' of a ledger file (a private copy), served from memory while the file is unchanged"""
+        state = UsageLedger._disk_state(path)
+        if state is None:
+            return None
+
+        with UsageLedger._lock:
+            cached = UsageLedger._cache.get(path)
+        if cached is not None and cached[0] == state:
+            return json.loads(json.dumps(cached[1]))
+
+        with open(path, 'r') as f:
+            usage = json.load(f)['data']
+
+        with UsageLedger._lock:
+            UsageLedger._cache[path] = (state, usage)
+        return json.loads(json.dumps(usage))
+
+    @staticmethod
+    def _write(user_email, user_dir, usage):
+        UsageLedger._write_file(UsageLedger.ledger_path(user_dir), {
+            'owner': user_email,
+            'last_modified': datetime.now().isoformat(),
+            'data': usage
+        })
+        UsageLedger._record_member(user_email, usage)
+
+    @staticmethod
+    def _write_file(path, secure_data):
+        AtomicFile.write_text(path, json.dumps(secure_data, indent=2))
+
+        with UsageLedger._lock:
+            UsageLedger._cache[path] = (UsageLedger._disk_state(path), secure_data['data'])
+
+    @staticmethod
+    def _update(user_email, user_dir, apply):
+        """Read-modify-write the ledger under its lock; apply returns False to skip the write"""
+        with FileLock.exclusive(UsageLedger.lock_path(user_dir)):
+            usage = UsageLedger.read(user_dir) or UsageLedger._empty()
+            if apply(usage) is not False:
+                UsageLedger._write(user_email, user_dir, usage)
+            return usage
+
+    @staticmethod
+    def record_collection(user_email, user_dir, data_type, count):
+        """Record the number of records now stored in a collection"""
+        def apply(usage):
+            if usage['collections'].get(data_type) == count:
+                return False
+            usage['collections'][data_type] = count
+            if data_type == 'matters':
+                usage['matters'] = count
+
+        return UsageLedger._update(user_email, user_dir, apply)
+
+    @staticmethod
+    def record_documents(user_email, user_dir, totals):
+        """Record the document manifest totals after a document was stored or deleted"""
+        def apply(usage):
+            usage['documents'] = totals['documents']
+            usage['document_bytes'] = totals['bytes']
+            usage['stored_bytes'] = totals['stored_bytes']
+
+        return UsageLedger._update(user_email, user_dir, apply)
+
+    @staticmethod
+    def organization_path(org_code):
+        from services.local_storage import LocalStorage
+
+        digest = hashlib.sha256(org_code.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(LocalStorage.DATA_DIR, UsageLedger.ORGS_DIR, f"{digest}.json")
+
+    @staticmethod
+    def _organization_lock(path):
+        return path[:-len('.json')] + '.lock'
+
+    @staticmethod
+    def organization_of(user_email):
+        """A user's organization_code from the (cached) user directory, or None"""
+        from services.user_directory import UserDirectory
+
+        try:
+            user = UserDirectory.get_user(user_email)
+        except Exception:
+            return None
+        return (user or {}).get('organization_code')
+
+    @staticmethod
+    def read_organization(org_code):
+        """An organization's aggregate (ORG_COUNTERS totals plus 'members'), or None if not built yet"""
+        return UsageLedger._read_cached(UsageLedger.organization_path(org_code))
+
+    @staticmethod
+    def _record_member(user_email, usage):
+        """Apply the change in one member's counters to its organization's aggregate"""
+        org_code = UsageLedger.organization_of(user_email)
+        if not org_code:
+            return
+
+        path = UsageLedger.organization_path(org_code)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        counters = {key: usage.get(key, 0) for key in UsageLedger.ORG_COUNTERS}
+        # Checked under the lock: a rebuild in progress either already read this ledger or applies after us
+        with FileLock.exclusive(UsageLedger._organization_lock(path)):
+            aggregate = UsageLedger._read_cached(path)
+            if aggregate is None:
+                return      # Built from every member's ledger on first read
+            previous = aggregate['members'].get(user_email, {})
+            if previous == counters:
+                return
+            for key in UsageLedger.ORG_COUNTERS:
+                aggregate[key] += counters[key] - previous.get(key, 0)
+            aggregate['members'][user_email] = counters
+            UsageLedger._write_file(path, {
+                'org_code': org_code,
+                'last_modified': datetime.now().isoformat(),
+                'data': aggregate
+            })
+
+    @staticmethod
+    def rebuild_organization(org_code, members):
+        """
+        Build an organization's aggregate from its members' ledgers
+
+        members are the emails whose organization_code is org_code; members
+        without a tenant directory have stored nothing and are skipped.
+        Returns the aggregate.
+        """
+        from services.local_storage import LocalStorage
+
+        path = UsageLedger.organization_path(org_code)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tenants = LocalStorage.list_tenants()
+        members = [email for email in members if email in tenants]
+
+        # Members without a ledger are scanned first: ledger locks are always taken before this one
+        for email in members:
+            LocalStorage.get_usage(email)
+
+        with FileLock.exclusive(UsageLedger._organization_lock(path)):
+            aggregate = {key: 0 for key in UsageLedger.ORG_COUNTERS}
+            aggregate['members'] = {}
+            for email in members:
+                usage = UsageLedger.read(LocalStorage.get_user_directory(email)) or UsageLedger._empty()
+                counters = {key: usage.get(key, 0) for key in UsageLedger.ORG_COUNTERS}
+                for key in UsageLedger.ORG_COUNTERS:
+                    aggregate[key] += counters[key]
+                aggregate['members'][email] = counters
+
+            UsageLedger._write_file(path, {
+                'org_code': org_code,
+                'last_modified': datetime.now().isoformat(),
+                'data': aggregate
+            })
+        return aggregate
+
+    @staticmethod
+    def _collection_names(user_dir):
+        """Data types stored in a tenant directory (flat files and segment directories)"""
+        from services.local_storage import LocalStorage
+        from services.storage_partitions import PartitionedCollection
+
+        names = set()
+        for entry in os.scandir(user_dir):
+            name = entry.name
+            if entry.is_file() and name.endswith('.json') and name != UsageLedger.LEDGER_FILE:
+                names.add(name[:-len('.json')])
+            elif entry.is_dir() and name != LocalStorage.DOCUMENTS_DIR and PartitionedCollection.exists(user_dir, name):
+                names.add(name)
+        return sorted(names)
+
+    @staticmethod
+    def reconcile(user_email):
+        """
+        Rebuild a tenant's counters from a full scan of its data
+
+        Collections are counted in the configured storage backend; with the
+        JSON backend each one under its own lock (the same lock order as a
+        save). The document manifest is rebuilt from disk and the tenant's
+        size in the tenant registry is refreshed too. Returns (usage, drift)
+        where drift maps each counter that was wrong to (ledger value,
+        actual value).
+        """
+        from services.blob_store import BlobStore
+        from services.local_storage import LocalStorage
+        from services.storage_backend import get_storage_backend
+
+        user_dir = LocalStorage.get_user_directory(user_email)
+        before = UsageLedger.read(user_dir) or UsageLedger._empty()
+
+        backend = get_storage_backend()
+        if backend is LocalStorage:
+            names = UsageLedger._collection_names(user_dir)
+            for data_type in names:
+                with FileLock.shared(LocalStorage.lock_path(user_email, data_type)):
+                    found, data = LocalStorage._load_user_data(user_email, data_type)
+                    if found and isinstance(data, list):
+                        UsageLedger.record_collection(user_email, user_dir, data_type, len(data))
+        else:
+            names = backend.list_collections(user_email)
+            for data_type in names:
+                data = backend.load_user_data(user_email, data_type, None)
+                if isinstance(data, list):
+                    UsageLedger.record_collection(user_email, user_dir, data_type, len(data))
+
+        with FileLock.exclusive(UsageLedger.lock_path(user_dir)):
+            docs_dir = LocalStorage.get_documents_directory(user_email)
+            totals = BlobStore.rebuild_index(docs_dir)['totals']
+            usage = UsageLedger.read(user_dir) or UsageLedger._empty()
+
+            usage['documents'] = totals['documents']
+            usage['document_bytes'] = totals['bytes']
+            usage['stored_bytes'] = totals['stored_bytes']
+            for data_type in list(usage['collections']):
+                if data_type not in names:
+                    del usage['collections'][data_type]
+            usage['matters'] = usage['collections'].get('matters', 0)
+            usage['reconciled'] = datetime.now().isoformat()
+            UsageLedger._write(user_email, user_dir, usage)
+
+        TenantRegistry.update_size(LocalStorage.DATA_DIR, user_email)
+
+        drift = {}
+        for key in ('documents', 'document_bytes', 'stored_bytes', 'matters'):
+            if before[key] != usage[key]:
+                drift[key] = (before[key], usage[key])
+        for data_type in set(before['collections']) | set(usage['collections']):
+            old = before['collections'].get(data_type)
+            new = usage['collections'].get(data_type)
+            if old != new:
+                drift[f"collections.{data_type}"] = (old, new)
+
+        return usage, drift
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild per-tenant usage ledgers from a full scan")
+    parser.add_argument('emails', nargs='*', help="Tenants to reconcile (default: every tenant)")
+    args = parser.parse_args()
+
+    from services.local_storage import LocalStorage
+
+    emails = args.emails or sorted(LocalStorage.list_tenants())
+
+    drifted = 0
+    for email in emails:
+        usage, drift = UsageLedger.reconcile(email)
+        drifted += bool(drift)
+        print(f"{email}: documents={usage['documents']} bytes={usage['document_bytes']} "
+              f"matters={usage['matters']} collections={len(usage['collections'])}")
+        for key, (old, new) in sorted(drift.items()):
+            print(f"  corrected {key}: {old} -> {new}")
+
+    print(f"{len(emails)} tenants reconciled, {drifted} had drifted")
@@ -0,0 +1,252 @@
+import os
+import time
+import copy
+import threading
+
+
+class UserDirectory:
+    """
+    Cached view of the registered users stored under Firebase 'users'
+
+    Writes are sent as per-user diffs (multi-path update, child set/delete)
+    instead of re-uploading the whole tree, and the last known remote state is
+    kept in-process so reads within CACHE_TTL seconds cost no network call.
+    Listeners registered with add_listener(callback) get callback(email, data)
+    for every change (data is None for deletions). While any listener is
+    registered the 'users' tree is subscribed to with listen(), so changes
+    written by other processes reach listeners (and the cache) as they
+    happen. If the database cannot stream, listeners only learn of other
+    processes' changes when the cache is next refreshed, up to CACHE_TTL
+    seconds later.
+    """
+
+    USERS_PATH = 'users'
+    CACHE_TTL = 30.0
+
+    _database = None
+    _users = None
+    _loaded_at = 0.0
+    _lock = threading.RLock()
+    _listeners = []
+    _subscription = None        # listen() registration while there are listeners
+
+    @staticmethod
+    def safe_key(email):
+        """Firebase keys cannot contain . $ # [ ] /"""
+        return email.replace('.', '_DOT_').replace('@', '_AT_').replace('$', '_').replace('#', '_').replace('[', '_').replace(']', '_').replace('/', '_')
+
+    @staticmethod
+    def set_database(database):
+        """Use a specific db module/object (e.g. LocalRealtimeDatabase) and drop the cache"""
+        with UserDirectory._lock:
+            if UserDirectory._subscription is not None:
+                UserDirectory._subscription.close()
+                UserDirectory._subscription = None
+            UserDirectory._database = database
+            UserDirectory._users = None
+            if UserDirectory._listeners:
+                UserDirectory._subscribe()
+
+    @staticmethod
+    def get_database():
+        """Firebase db, or the local stand-in when USE_LOCAL_FIREBASE=true"""
+        if UserDirectory._database is None:
+            if os.getenv('USE_LOCAL_FIREBASE', 'false').lower() == 'true':
+                from services.firebase_local import LocalRealtimeDatabase
+                UserDirectory._database = LocalRealtimeDatabase(os.getenv('LOCAL_FIREBASE_PATH'))
+            else:
+                from services.firebase_config import db
+                UserDirectory._database = db
+        return UserDirectory._database
+
+    @staticmethod
+    def _reference():
+        return UserDirectory.get_database().reference(UserDirectory.USERS_PATH)
+
+    @staticmethod
+    def _fetch():
+        """Download the users tree and key it by email"""
+        users = UserDirectory._reference().get() or {}
+
+        email_users = {}
+        for safe_key, user_data in users.items():
+            email_users[UserDirectory._email_for(safe_key, user_data)] = user_data
+        return email_users
+
+    @staticmethod
+    def _email_for(safe_key, user_data):
+        if isinstance(user_data, dict) and 'original_email' in user_data:
+            return user_data['original_email']
+        return safe_key.replace('_DOT_', '.').replace('_AT_', '@')
+
+    @staticmethod
+    def load(refresh=False):
+        """Get {email: user_data}; a private copy the caller may modify"""
+        with UserDirectory._lock:
+            return copy.deepcopy(UserDirectory._current(refresh))
+
+    @staticmethod
+    def get_user(email):
+        """One user's data (a private copy), or None; served from the same cache as load()"""
+        with UserDirectory._lock:
+            return copy.deepcopy(UserDirectory._current().get(email))
+
+    @staticmethod
+    def _current(refresh=False):
+        """The cached {email: user_data}, refetched when stale; caller holds _lock"""
+        expired = time.monotonic() - UserDirectory._loaded_at > UserDirectory.CACHE_TTL
+        if refresh or expired or UserDirectory._users is None:
+            fresh = UserDirectory._fetch()
+            previous = UserDirectory._users
+            UserDirectory._users = fresh
+            UserDirectory._loaded_at = time.monotonic()
+            if previous is not None:
+                UserDirectory._notify_diff(previous, fresh)
+        return UserDirectory._users
+
+    @staticmethod
+    def _stored(email, user_data):
+        return {**user_data, 'original_email': email}
+
+    @staticmethod
+    def save_all(users_dict):
+        """
+        Persist users_dict, sending only users that were added, changed or removed
+
+        Only users known to this process can be removed, so a stale caller
+        never deletes accounts registered elsewhere in the meantime.
+        Returns the number of changed users.
+        """
+        with UserDirectory._lock:
+            if UserDirectory._users is None:
+                UserDirectory.load()
+            current = UserDirectory._users
+
+            updates = {}
+            changes = []
+            for email, user_data in users_dict.items():
+                stored = UserDirectory._stored(email, user_data)
+                if current.get(email) != stored:
+                    updates[UserDirectory.safe_key(email)] = stored
+                    changes.append((email, stored))
+
+            for email in current:
+                if email not in users_dict:
+                    updates[UserDirectory.safe_key(email)] = None
+                    changes.append((email, None))
+
+            if updates:
+                UserDirectory._reference().update(updates)
+                UserDirectory._apply(changes)
+
+            return len(changes)
+
+    @staticmethod
+    def save_user(email, user_data):
+        """Create or replace one user"""
+        stored = UserDirectory._stored(email, user_data)
+        with UserDirectory._lock:
+            UserDirectory._reference().child(UserDirectory.safe_key(email)).set(stored)
+            UserDirectory._apply([(email, stored)])
+
+    @staticmethod
+    def delete_user(email):
+        """Delete one user"""
+        with UserDirectory._lock:
+            UserDirectory._reference().child(UserDirectory.safe_key(email)).delete()
+            UserDirectory._apply([(email, None)])
+
+    @staticmethod
+    def _apply(changes):
+        """Update the cache after a write (ours or a remote one) and notify listeners of real changes"""
+        with UserDirectory._lock:
+            changed = []
+            for email, stored in changes:
+                if UserDirectory._users is not None:
+                    if UserDirectory._users.get(email) == stored:
+                        continue        # Already applied (our own write echoed by the subscription)
+                    if stored is None:
+                        UserDirectory._users.pop(email, None)
+                    else:
+                        UserDirectory._users[email] = copy.deepcopy(stored)
+                changed.append((email, stored))
+
+        for email, stored in changed:
+            UserDirectory._notify(email, stored)
+
+    @staticmethod
+    def _on_remote_event(event):
+        """listen() callback: apply a put/patch under 'users' to the cache"""
+        parts = [part for part in (event.path or '/').split('/') if part]
+        if not parts:
+            if event.event_type == 'put':
+                # Whole tree (first event of a subscription, or a full replace)
+                fresh = {UserDirectory._email_for(key, value): value for key, value in (event.data or {}).items()}
+                with UserDirectory._lock:
+                    previous = UserDirectory._users
+                    UserDirectory._users = fresh
+                    UserDirectory._loaded_at = time.monotonic()
+                if previous is not None:
+                    UserDirectory._notify_diff(previous, fresh)
+            else:
+                UserDirectory._apply([
+                    (UserDirectory._email_for(key, value), value) for key, value in (event.data or {}).items()
+                ])
+            return
+
+        if len(parts) == 1 and event.event_type == 'put':
+            UserDirectory._apply([(UserDirectory._email_for(parts[0], event.data), event.data)])
+            return
+
+        # A field of one user changed: re-read that user
+        stored = UserDirectory._reference().child(parts[0]).get()
+        UserDirectory._apply([(UserDirectory._email_for(parts[0], stored), stored)])
+
+    @staticmethod
+    def _subscribe():
+        """Start listening to the users tree (no-op if already listening or unsupported)"""
+        if UserDirectory._subscription is not None:
+            return
+        try:
+            UserDirectory._subscription = UserDirectory._reference().listen(UserDirectory._on_remote_event)
+        except Exception:
+            UserDirectory._subscription = None     # Fall back to CACHE_TTL refreshes
+
+    @staticmethod
+    def _notify_diff(previous, fresh):
+        for email, stored in fresh.items():
+            if previous.get(email) != stored:
+                UserDirectory._notify(email, stored)
+        for email in previous:
+            if email not in fresh:
+                UserDirectory._notify(email, None)
+
+    @staticmethod
+    def _notify(email, stored):
+        for callback in list(UserDirectory._listeners):
+            try:
+                callback(email, copy.deepcopy(stored))
+            except Exception:
+                pass
+
+    @staticmethod
+    def add_listener(callback):
+        """Register callback(email, data_or_None); returns a function that unregisters it"""
+        with UserDirectory._lock:
+            UserDirectory._listeners.append(callback)
+            UserDirectory._subscribe()
+
+        def remove():
+            with UserDirectory._lock:
+                if callback in UserDirectory._listeners:
+                    UserDirectory._listeners.remove(callback)
+                if not UserDirectory._listeners and UserDirectory._subscription is not None:
+                    UserDirectory._subscription.close()
+                    UserDirectory._subscription = None
+        return remove
+
+    @staticmethod
+    def invalidate():
+        """Force the next load to fetch from Firebase"""
+        with UserDirectory._lock:
+            UserDirectory._loaded_at = 0.0